@@ -1,52 +1,211 @@
+import asyncio
+import importlib.util
 import logging
 import os
+import random
 import re
-import requests
+import time
+import httpx
+import json
+import math
 import uvicorn
 from datetime import datetime
-from typing import Optional, List, Dict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Optional, List, Dict, Tuple
+from urllib.parse import urlsplit
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import AliasChoices, BaseModel, Field, PrivateAttr
 from pydantic_settings import BaseSettings
 
-# Import search tools
-from langchain_community.tools import DuckDuckGoSearchRun
+from caching import AnswerCache, SearchCache, normalize_text
+from deadlines import HEDGE_WINNER_HEDGE, Deadline, DeadlineExceeded, LatencyWindow, hedged_call
+from context_builder import Section, compact_context, split_passages
+from knowledge_index import KnowledgeIndex
+from metrics import MetricsRegistry, render_gauge_family, timed
+from phrase_matcher import PhraseMatcher
+from prompt_engine import CompiledPrompt, PromptChain
+from response_encoding import (ENCODING_IDENTITY, compact_answer_payload, compress, compress_reused, dumps, etag_matches,
+                               make_etag, negotiate_encoding)
+from rate_limiting import AdmissionController, RateLimitExceeded, TokenBucket
+from record_writer import JsonlRecordWriter
+from refresh_ahead import REFRESH_FAILED, REFRESH_REFRESHED, REFRESH_SKIPPED, RefreshAheadScheduler, RefreshEntry
+from shared_cache import SharedCache
+from structured_logging import (CATEGORY_LLM, CATEGORY_PAYLOAD, CATEGORY_REQUEST, CATEGORY_SEARCH, TEXT_FORMAT, SampledQueueHandler,
+                                category_logger, configure_logging, parse_sample_rates, request_log_scope)
+from youtube_cache import (LOOKUP_FRESH, LOOKUP_MISS, LOOKUP_STALE, SEARCH_LIST_UNITS, VIDEOS_LIST_UNITS, QuotaTracker,
+                           VideoMetadataCache)
+from url_engine import SUGGESTED_URL_INDEX, classify_host, extract_urls, flatten_categorized_urls, generate_suggested_urls, merge_categorized_urls
+from search_decision import HEAD_SEARCH, HEAD_YOUTUBE, SearchDecisionModel, search_changed_answer, youtube_contributed
+
+# Heavy upstream SDKs (langchain, groq, the DDG tool) are imported on first use by load_upstream_modules,
+# so `import app` stays fast; tests and benchmarks may pre-assign stubs, which are then left alone.
+ChatGroq: Any = None
+DuckDuckGoSearchRun: Any = None
+groq: Any = None
+
+def load_upstream_modules() -> None:
+    global ChatGroq, DuckDuckGoSearchRun, groq
+    if groq is None:
+        import groq as groq_module
+        groq = groq_module
+    if ChatGroq is None:
+        from langchain_groq import ChatGroq as chat_groq_class
+        ChatGroq = chat_groq_class
+    if DuckDuckGoSearchRun is None:
+        from langchain_community.tools import DuckDuckGoSearchRun as ddg_tool_class
+        DuckDuckGoSearchRun = ddg_tool_class
 
 # --- Configuration ---
 load_dotenv()
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
     groq_api_key: Optional[str] = Field(None, env="GROQ_API_KEY")
     youtube_api_key: Optional[str] = Field(None, env="YOUTUBE_API_KEY")
     model_name: str = Field("llama3-8b-8192", env="GROQ_MODEL_NAME")
+    fast_boot: bool = Field(False, env="FAST_BOOT") # Accept connections first, build the LLM chains and search tools in the background
+    enable_async_logging: bool = Field(True, env="ENABLE_ASYNC_LOGGING") # Off: synchronous text logging to stderr, nothing sampled
+    log_level: str = Field("INFO", env="LOG_LEVEL")
+    log_format: str = Field("json", env="LOG_FORMAT") # "json" (one object per line) or "text"
+    log_sample_rates: str = Field("search=0.25,llm=0.25,payload=0.05", env="LOG_SAMPLE_RATES") # Share of requests whose logs are kept, per category
+    log_queue_size: int = Field(10000, env="LOG_QUEUE_SIZE") # Records beyond this are dropped, never waited for
+    log_payload_max_chars: int = Field(2000, env="LOG_PAYLOAD_MAX_CHARS")
+    startup_wait_timeout: float = Field(15.0, env="STARTUP_WAIT_TIMEOUT") # Max wait for background init before answering 503
+    fallback_model_name: Optional[str] = Field(None, validation_alias=AliasChoices("GROQ_FALLBACK_MODEL_NAME", "FALLBACK_MODEL_NAME")) # Hedge target; defaults to model_name
     model_temperature: float = Field(0.3, env="MODEL_TEMPERATURE")
     max_response_words: int = Field(200, env="MAX_RESPONSE_WORDS") # Base for direct, smaller
     enable_web_search: bool = Field(True, env="ENABLE_WEB_SEARCH")
     enable_youtube_search: bool = Field(True, env="ENABLE_YOUTUBE_SEARCH")
     max_search_results_chars: int = Field(3500, env="MAX_SEARCH_RESULTS_CHARS") # Increased slightly
     max_youtube_results: int = Field(3, env="MAX_YOUTUBE_RESULTS")
+    http_connect_timeout: float = Field(3.0, env="HTTP_CONNECT_TIMEOUT")
+    http_read_timeout: float = Field(8.0, env="HTTP_READ_TIMEOUT")
+    http_max_connections: int = Field(100, env="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(20, env="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry: float = Field(30.0, env="HTTP_KEEPALIVE_EXPIRY")
+    http_max_concurrency_per_host: int = Field(10, env="HTTP_MAX_CONCURRENCY_PER_HOST")
+    groq_http2: bool = Field(True, env="GROQ_HTTP2") # Used when the h2 package is installed
+    groq_max_connections: int = Field(20, env="GROQ_MAX_CONNECTIONS")
+    groq_max_keepalive_connections: int = Field(20, env="GROQ_MAX_KEEPALIVE_CONNECTIONS")
+    groq_keepalive_expiry: float = Field(120.0, env="GROQ_KEEPALIVE_EXPIRY")
+    groq_warm_connections: int = Field(2, env="GROQ_WARM_CONNECTIONS") # Connections opened at startup and kept warm
+    groq_keep_warm_interval: float = Field(30.0, env="GROQ_KEEP_WARM_INTERVAL") # Seconds between keep-warm pings; 0 disables
+    ask_deadline_seconds: float = Field(25.0, env="ASK_DEADLINE_SECONDS") # End-to-end budget per question; 0 disables
+    llm_answer_reserve_seconds: float = Field(6.0, env="LLM_ANSWER_RESERVE_SECONDS") # Kept back from search for the final LLM call
+    enable_llm_hedging: bool = Field(True, env="ENABLE_LLM_HEDGING")
+    llm_hedge_percentile: float = Field(0.95, env="LLM_HEDGE_PERCENTILE") # Hedge once a call outlives this share of recent calls
+    llm_hedge_min_delay: float = Field(0.5, env="LLM_HEDGE_MIN_DELAY")
+    llm_hedge_initial_delay: float = Field(3.0, env="LLM_HEDGE_INITIAL_DELAY") # Used until a stage has LLM_HEDGE_MIN_SAMPLES
+    llm_hedge_min_samples: int = Field(20, env="LLM_HEDGE_MIN_SAMPLES")
+    enable_speculative_search: bool = Field(True, env="ENABLE_SPECULATIVE_SEARCH")
+    web_search_timeout: float = Field(10.0, env="WEB_SEARCH_TIMEOUT")
+    youtube_search_timeout: float = Field(6.0, env="YOUTUBE_SEARCH_TIMEOUT")
+    enable_answer_cache: bool = Field(True, env="ENABLE_ANSWER_CACHE")
+    answer_cache_max_entries: int = Field(2048, env="ANSWER_CACHE_MAX_ENTRIES")
+    answer_cache_max_bytes: int = Field(32 * 1024 * 1024, env="ANSWER_CACHE_MAX_BYTES")
+    answer_cache_ttl_stale_seconds: int = Field(300, env="ANSWER_CACHE_TTL_STALE_SECONDS") # "latest/current" questions
+    answer_cache_ttl_evergreen_seconds: int = Field(86400, env="ANSWER_CACHE_TTL_EVERGREEN_SECONDS")
+    answer_cache_similarity_threshold: float = Field(0.85, env="ANSWER_CACHE_SIMILARITY_THRESHOLD")
+    enable_refresh_ahead: bool = Field(True, env="ENABLE_REFRESH_AHEAD") # Recompute hot time-sensitive answers before they expire
+    refresh_ahead_per_minute: float = Field(6, gt=0, env="REFRESH_AHEAD_PER_MINUTE") # Upstream budget: each refresh is a search plus one LLM call
+    refresh_ahead_burst: int = Field(3, env="REFRESH_AHEAD_BURST")
+    refresh_ahead_max_concurrent: int = Field(2, env="REFRESH_AHEAD_MAX_CONCURRENT")
+    refresh_ahead_interval_seconds: float = Field(5.0, env="REFRESH_AHEAD_INTERVAL_SECONDS")
+    refresh_ahead_before_seconds: float = Field(60.0, env="REFRESH_AHEAD_BEFORE_SECONDS") # How long before expiry an answer is refreshed
+    refresh_ahead_min_hotness: float = Field(3.0, env="REFRESH_AHEAD_MIN_HOTNESS") # Decayed request count a question needs
+    refresh_ahead_half_life_seconds: float = Field(600.0, env="REFRESH_AHEAD_HALF_LIFE_SECONDS")
+    refresh_ahead_max_tracked: int = Field(1000, env="REFRESH_AHEAD_MAX_TRACKED")
+    enable_search_cache: bool = Field(True, env="ENABLE_SEARCH_CACHE")
+    search_cache_ttl_seconds: int = Field(120, env="SEARCH_CACHE_TTL_SECONDS")
+    search_cache_max_entries: int = Field(1024, env="SEARCH_CACHE_MAX_ENTRIES")
+    enable_response_compression: bool = Field(True, env="ENABLE_RESPONSE_COMPRESSION")
+    response_compression_min_bytes: int = Field(1024, env="RESPONSE_COMPRESSION_MIN_BYTES") # Smaller bodies are sent as-is
+    response_gzip_level: int = Field(6, env="RESPONSE_GZIP_LEVEL")
+    response_brotli_quality: int = Field(4, env="RESPONSE_BROTLI_QUALITY") # Used when the brotli package is installed
+    batch_max_items: int = Field(1000, env="BATCH_MAX_ITEMS")
+    batch_max_concurrency: int = Field(4, env="BATCH_MAX_CONCURRENCY") # Shared by all in-flight batches
+    groq_requests_per_minute: float = Field(300, gt=0, env="GROQ_REQUESTS_PER_MINUTE")
+    groq_burst: int = Field(20, env="GROQ_BURST")
+    ddg_requests_per_minute: float = Field(60, gt=0, env="DDG_REQUESTS_PER_MINUTE")
+    ddg_burst: int = Field(10, env="DDG_BURST")
+    youtube_requests_per_minute: float = Field(120, gt=0, env="YOUTUBE_REQUESTS_PER_MINUTE") # Each search costs 2 calls
+    youtube_burst: int = Field(10, env="YOUTUBE_BURST")
+    youtube_daily_quota_units: int = Field(10000, env="YOUTUBE_DAILY_QUOTA_UNITS") # Google project quota, split across workers
+    youtube_quota_reserve_units: int = Field(300, env="YOUTUBE_QUOTA_RESERVE_UNITS") # Below this, YouTube search serves cached videos only
+    youtube_video_cache_path: Optional[str] = Field("youtube_videos.db", env="YOUTUBE_VIDEO_CACHE_PATH") # SQLite; empty keeps records in memory only
+    youtube_video_cache_max_entries: int = Field(5000, env="YOUTUBE_VIDEO_CACHE_MAX_ENTRIES")
+    youtube_video_fresh_seconds: int = Field(6 * 3600, env="YOUTUBE_VIDEO_FRESH_SECONDS") # Older records are refetched
+    youtube_video_max_age_seconds: int = Field(7 * 86400, env="YOUTUBE_VIDEO_MAX_AGE_SECONDS") # Stale records still stand in when quota is short
+    upstream_acquire_timeout: float = Field(2.0, env="UPSTREAM_ACQUIRE_TIMEOUT") # Max wait for an upstream token
+    enable_admission_control: bool = Field(True, env="ENABLE_ADMISSION_CONTROL")
+    ask_max_concurrent: int = Field(32, env="ASK_MAX_CONCURRENT")
+    ask_max_queue: int = Field(64, env="ASK_MAX_QUEUE")
+    ask_queue_timeout: float = Field(5.0, env="ASK_QUEUE_TIMEOUT")
+    enable_knowledge_index: bool = Field(True, env="ENABLE_KNOWLEDGE_INDEX")
+    knowledge_index_path: str = Field("knowledge.idx", env="KNOWLEDGE_INDEX_PATH") # Built by build_knowledge_index.py
+    knowledge_index_min_score: float = Field(0.85, env="KNOWLEDGE_INDEX_MIN_SCORE")
+    answer_record_path: Optional[str] = Field(None, env="ANSWER_RECORD_PATH") # JSONL input for the index build
+    answer_record_queue_size: int = Field(1000, env="ANSWER_RECORD_QUEUE_SIZE") # Records beyond this are dropped, never waited for
+    enable_context_compaction: bool = Field(True, env="ENABLE_CONTEXT_COMPACTION")
+    search_context_token_budget: int = Field(700, env="SEARCH_CONTEXT_TOKEN_BUDGET") # Replaces MAX_SEARCH_RESULTS_CHARS when compaction is on
+    search_passage_max_tokens: int = Field(60, env="SEARCH_PASSAGE_MAX_TOKENS")
+    search_decision_mode: str = Field("heuristic", env="SEARCH_DECISION_MODE") # heuristic, shadow or model
+    search_decision_model_path: str = Field("search_decision.json", env="SEARCH_DECISION_MODEL_PATH") # Built by train_search_decision.py
+    search_decision_explore_rate: float = Field(0.0, env="SEARCH_DECISION_EXPLORE_RATE") # Extra searches to collect training labels
+    enable_search_first: bool = Field(True, env="ENABLE_SEARCH_FIRST") # Skip the direct chain when search is certain
+    search_first_min_probability: float = Field(0.95, env="SEARCH_FIRST_MIN_PROBABILITY") # Model mode only
+    search_first_fallback_to_direct: bool = Field(True, env="SEARCH_FIRST_FALLBACK_TO_DIRECT")
+    workers: int = Field(1, env="WORKERS") # Uvicorn worker processes; 0 means one per CPU core
+    shared_cache_path: Optional[str] = Field(None, env="SHARED_CACHE_PATH") # SQLite file shared by all workers
+    shared_cache_max_entries: int = Field(20000, env="SHARED_CACHE_MAX_ENTRIES") # Per namespace (answers, each search source)
+    shared_cache_warm_entries: int = Field(2000, env="SHARED_CACHE_WARM_ENTRIES") # Loaded into each worker's memory on startup
 
     class Config:
         env_file = ".env"
         extra = "ignore"
         @classmethod
         def parse_env_var(cls, field_name: str, raw_val: str) -> any:
-            if field_name in ['enable_web_search', 'enable_youtube_search']:
+            if field_name in ['enable_web_search', 'enable_youtube_search', 'enable_speculative_search', 'enable_answer_cache', 'enable_search_cache', 'enable_admission_control', 'enable_knowledge_index', 'enable_context_compaction', 'enable_search_first', 'search_first_fallback_to_direct', 'groq_http2', 'enable_llm_hedging', 'fast_boot', 'enable_response_compression', 'enable_refresh_ahead', 'enable_async_logging']:
                 return raw_val.lower() in ('true', '1', 'yes')
             return raw_val
 
 settings = Settings()
 
+# Per-request logs go through category loggers: sampled, formatted and written on a background thread.
+# Handlers are installed by setup_logging when the server starts, not on import, so scripts and
+# benchmarks that import this module keep whatever logging they configured.
+log_handler: Optional[SampledQueueHandler] = None
+logging_configured = False
+
+def setup_logging() -> None:
+    global log_handler, logging_configured
+    if logging_configured:
+        return
+    logging_configured = True
+    if settings.enable_async_logging:
+        log_handler = configure_logging(settings.log_level, settings.log_format, parse_sample_rates(settings.log_sample_rates),
+                                        settings.log_queue_size, settings.log_payload_max_chars)
+    else:
+        logging.basicConfig(level=settings.log_level.upper(), format=TEXT_FORMAT)
+
+request_logger = category_logger(CATEGORY_REQUEST)
+search_logger = category_logger(CATEGORY_SEARCH)
+llm_logger = category_logger(CATEGORY_LLM)
+payload_logger = category_logger(CATEGORY_PAYLOAD)  # large values, passed as extra={"payload": ...}
+
+def worker_count() -> int:
+    return settings.workers if settings.workers > 0 else (os.cpu_count() or 1)
+
 # --- Constants ---
 MODEL_STATUS_UNINITIALIZED = "uninitialized"
+BOOT_PHASE_STARTING = "starting"
+BOOT_PHASE_READY = "ready"
+BOOT_PHASE_FAILED = "failed"
 MODEL_STATUS_CONNECTED = "connected"
 MODEL_STATUS_ERROR_PREFIX = "error: "
 MODEL_STATUS_API_KEY_MISSING = f"{MODEL_STATUS_ERROR_PREFIX}GROQ_API_KEY not set"
@@ -58,14 +217,72 @@ SOURCE_GROQ_AI_WITH_SEARCH = "SmartGenie (with Web Search)"
 SOURCE_GROQ_AI_WITH_YOUTUBE = "SmartGenie (with YouTube Search)"
 SOURCE_GROQ_AI_WITH_MIXED_SEARCH = "SmartGenie (with Web + YouTube Search)"
 SOURCE_SYSTEM = "SmartGenie System"
+SOURCE_LOCAL_KNOWLEDGE = "SmartGenie (Local Knowledge)"
+
+SEARCH_SOURCE_WEB = "web"
+WEB_RESULTS_HEADER = "Web Search Results (from DuckDuckGo):"
+YOUTUBE_RESULTS_HEADER = "Cool YouTube Videos Found:"
+SEARCH_SOURCE_YOUTUBE = "youtube"
+YOUTUBE_ENDPOINT_SEARCH = "search"
+YOUTUBE_ENDPOINT_VIDEOS = "videos"
+YOUTUBE_DURATION_RE = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+SHARED_NAMESPACE_ANSWERS = "answers"
+SHARED_NAMESPACE_SEARCH_PREFIX = "search:"
+RESPONSE_MODE_HEADER = "X-Response-Mode"
+RESPONSE_MODE_FULL = "full"
+RESPONSE_MODE_COMPACT = "compact"
+MIN_DDG_TEXT_CHARS = 20
 
 CONFIDENCE_HIGH = "high"
 CONFIDENCE_MEDIUM = "medium"
 CONFIDENCE_LOW = "low"
 
+SEARCH_DECISION_HEURISTIC = "heuristic"
+SEARCH_DECISION_SHADOW = "shadow"
+SEARCH_DECISION_MODEL = "model"
+
+# Answering paths counted per request
+ASK_PATH_ANSWER_CACHE = "answer_cache"
+ASK_PATH_LOCAL_KNOWLEDGE = "local_knowledge"
+ASK_PATH_DIRECT = "direct"
+ASK_PATH_DIRECT_THEN_SEARCH = "direct_then_search"
+ASK_PATH_SEARCH_FIRST = "search_first"
+ASK_PATH_SEARCH_FIRST_FALLBACK = "search_first_fallback"
+
+STAGE_DIRECT_ANSWER = "direct_answer"
+STAGE_SEARCH = "search"
+STAGE_RECONCILE = "reconcile"
+STAGE_AUGMENT = "augment"
+STAGE_STALENESS_CHECK = "staleness_check"
+STAGE_DDG = "ddg_search"
+STAGE_YOUTUBE_SEARCH = "youtube_search"
+STAGE_YOUTUBE_DETAILS = "youtube_details"
+STAGE_URL_EXTRACTION = "url_extraction"
+STAGE_CLEAN_RESPONSE = "clean_response"
+STAGE_LOCAL_KNOWLEDGE = "local_knowledge"
+STAGE_CONTEXT_COMPACTION = "context_compaction"
+TIMED_STAGES = [
+    STAGE_LOCAL_KNOWLEDGE, STAGE_DIRECT_ANSWER, STAGE_STALENESS_CHECK, STAGE_DDG, STAGE_YOUTUBE_SEARCH, STAGE_YOUTUBE_DETAILS,
+    STAGE_URL_EXTRACTION, STAGE_CONTEXT_COMPACTION, STAGE_RECONCILE, STAGE_AUGMENT, STAGE_CLEAN_RESPONSE,
+]
+
+SEARCH_OUTCOME_OK = "ok"
+SEARCH_OUTCOME_TIMEOUT = "timeout"
+SEARCH_OUTCOME_ERROR = "error"
+
+# Server-Sent Event names emitted by /ask/stream
+EVENT_DIRECT_TOKEN = "direct_token"
+EVENT_SEARCH_STARTED = "search_started"
+EVENT_SEARCH_SOURCES = "search_sources"
+EVENT_ANSWER_TOKEN = "answer_token"
+EVENT_DISCARD = "discard"
+EVENT_FINAL = "final"
+EVENT_ERROR = "error"
+
 ANSWER_UNKNOWN = "Hmm, I'm not sure about that one!"
 ANSWER_SERVICE_UNAVAILABLE = "Oops! I'm having some technical difficulties right now. Mind trying again in a bit?"
 ANSWER_PROCESSING_ERROR = "Something went wrong on my end! Give it another shot, would you?"
+ANSWER_DEADLINE_EXCEEDED = "That one took me too long to work out! Mind asking again?"
 
 YOUTUBE_TRIGGER_KEYWORDS = [
     "video", "tutorial", "how to", "demonstration", "show me", "watch", "visual",
@@ -85,6 +302,41 @@ COMMON_LLM_REFUSALS = [
     "my knowledge cutoff", "i am an ai language model", "i am a large language model",
     "i am an ai assistant", "i'm an ai assistant", "as a language model"
 ]
+RESPONSE_PREAMBLES = [
+    "answer:", "response:", "here is the answer:", "the answer is:",
+    "certainly, here's the information:", "okay, here's that:", "sure!", "absolutely!"
+]
+STALE_QUESTION_KEYWORDS = [
+    "current", "latest", "now", "today", "who is the president", "who is the ceo",
+    "what is the price of", "update on", "news about", "what's new", "currently",
+    "how many", "population of", "record for", "election", "winner of",
+    "stock price", "share price", "exchange rate", "live score", "breaking news", "weather forecast"
+]
+# Stale phrasings where an answer from model knowledge is certainly out of date, so those questions go
+# straight to search. Only unambiguous phrases: bare time words ("tonight", "this week") also show up in
+# questions that are not time-sensitive at all.
+SEARCH_CERTAIN_KEYWORDS = [
+    "latest news", "breaking news", "news today", "stock price", "share price", "exchange rate",
+    "live score", "weather forecast",
+]
+STALE_ROLE_PATTERN = re.compile(r"who is (the|current|new) (\w+ )*(president|ceo|minister|mayor|governor|chancellor|chairman|secretary|leader|winner|champion|monarch|king|queen|prime minister)")
+
+PHRASE_UNKNOWN = "unknown"
+PHRASE_REFUSAL = "refusal"
+PHRASE_FORBIDDEN = "forbidden"
+PHRASE_YOUTUBE_TRIGGER = "youtube_trigger"
+PHRASE_STALE = "stale"
+PHRASE_SEARCH_CERTAIN = "search_certain"
+RESPONSE_REJECTION_MATCHER = PhraseMatcher({
+    PHRASE_UNKNOWN: [ANSWER_UNKNOWN.lower()],
+    PHRASE_REFUSAL: COMMON_LLM_REFUSALS,
+    PHRASE_FORBIDDEN: FORBIDDEN_PHRASES_IN_RESPONSE,
+})
+QUESTION_TRIGGER_MATCHER = PhraseMatcher({
+    PHRASE_YOUTUBE_TRIGGER: YOUTUBE_TRIGGER_KEYWORDS,
+    PHRASE_STALE: STALE_QUESTION_KEYWORDS,
+    PHRASE_SEARCH_CERTAIN: SEARCH_CERTAIN_KEYWORDS,
+})
 
 # --- FastAPI Application Setup ---
 app = FastAPI(
@@ -92,16 +344,112 @@ app = FastAPI(
     description="Hey there! I'm SmartGenie, your friendly AI buddy who gives straight answers and finds cool stuff on the web and YouTube when needed!"
 )
 app.add_middleware(
-    CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
+    CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=["ETag"]
 )
 
 # --- Global LLM & Tool Variables ---
-groq_llm: Optional[ChatGroq] = None
-direct_llm_chain: Optional[LLMChain] = None
-search_augmented_llm_chain: Optional[LLMChain] = None
-reconciliation_llm_chain: Optional[LLMChain] = None
+groq_llm: Optional["ChatGroq"] = None
+fallback_llm: Optional["ChatGroq"] = None
+direct_llm_chain: Optional[PromptChain] = None
+search_augmented_llm_chain: Optional[PromptChain] = None
+reconciliation_llm_chain: Optional[PromptChain] = None
 model_status: str = MODEL_STATUS_UNINITIALIZED
-ddg_search: Optional[DuckDuckGoSearchRun] = None
+ddg_search: Optional["DuckDuckGoSearchRun"] = None
+upstream_init_task: Optional[asyncio.Task] = None
+boot_started_at: Optional[float] = None
+boot_timings: Dict[str, float] = {}
+http_client: Optional[httpx.AsyncClient] = None
+groq_http_client: Optional[httpx.AsyncClient] = None
+groq_client: Optional["groq.AsyncGroq"] = None
+groq_keep_warm_task: Optional[asyncio.Task] = None
+refresh_ahead_task: Optional[asyncio.Task] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+answer_cache = AnswerCache(
+    max_entries=settings.answer_cache_max_entries,
+    max_bytes=settings.answer_cache_max_bytes,
+    similarity_threshold=settings.answer_cache_similarity_threshold,
+)
+search_cache = SearchCache(max_entries=settings.search_cache_max_entries, ttl_seconds=settings.search_cache_ttl_seconds)
+batch_semaphore: Optional[asyncio.Semaphore] = None
+# Limits are configured for the whole node, so each worker process enforces its share of them.
+groq_rate_limiter = TokenBucket("Groq", settings.groq_requests_per_minute / worker_count(), max(1, settings.groq_burst // worker_count()))
+ddg_rate_limiter = TokenBucket("DuckDuckGo", settings.ddg_requests_per_minute / worker_count(), max(1, settings.ddg_burst // worker_count()))
+youtube_rate_limiter = TokenBucket("YouTube", settings.youtube_requests_per_minute / worker_count(), max(1, settings.youtube_burst // worker_count()))
+# Each worker gets its share of the quota until startup attaches the video store, which holds one node-wide count.
+youtube_quota = QuotaTracker(settings.youtube_daily_quota_units // worker_count(), settings.youtube_quota_reserve_units // worker_count())
+youtube_video_cache = VideoMetadataCache(settings.youtube_video_cache_max_entries, settings.youtube_video_fresh_seconds,
+                                         settings.youtube_video_max_age_seconds)
+# Budgets are per worker, like the upstream buckets; the lambda defers to refresh_stale_answer, defined below.
+refresh_scheduler = RefreshAheadScheduler(
+    lambda entry: refresh_stale_answer(entry), settings.refresh_ahead_per_minute / worker_count(),
+    max(1, settings.refresh_ahead_burst // worker_count()), settings.refresh_ahead_max_concurrent,
+    settings.refresh_ahead_interval_seconds, settings.refresh_ahead_before_seconds, settings.refresh_ahead_min_hotness,
+    settings.refresh_ahead_half_life_seconds, settings.refresh_ahead_max_tracked,
+)
+ask_admission: Optional[AdmissionController] = None
+knowledge_index: Optional[KnowledgeIndex] = None
+search_decision_model: Optional[SearchDecisionModel] = None
+shared_cache: Optional[SharedCache] = None
+answer_recorder: Optional[JsonlRecordWriter] = None
+
+# --- Metrics ---
+metrics_registry = MetricsRegistry()
+STAGE_LATENCY = metrics_registry.histogram(
+    "smartgenie_stage_duration_seconds", "Time spent in each /ask pipeline stage.", ["stage"],
+    known_labels=[(stage,) for stage in TIMED_STAGES],
+)
+REQUEST_LATENCY = metrics_registry.histogram(
+    "smartgenie_request_duration_seconds", "End-to-end time per answering endpoint.", ["endpoint"],
+)
+ASK_PATHS = metrics_registry.counter(
+    "smartgenie_ask_paths_total", "Answering path taken per /ask pipeline request.", ["path"],
+)
+ANSWER_PATHS = metrics_registry.counter(
+    "smartgenie_answers_total", "Answers produced by the pipeline, by final source and confidence.", ["source", "confidence"],
+)
+LLM_HEDGES = metrics_registry.counter(
+    "smartgenie_llm_hedges_total", "LLM calls that outlived the hedge delay, by stage and which call won.", ["stage", "winner"],
+)
+DEADLINE_DEGRADATIONS = metrics_registry.counter(
+    "smartgenie_deadline_degradations_total", "Stages cut short by the request deadline.", ["stage"],
+)
+ANSWER_CACHE_LOOKUPS = metrics_registry.counter(
+    "smartgenie_answer_cache_lookups_total", "Answer cache lookups by result.", ["result"],
+)
+SEARCH_SOURCE_OUTCOMES = metrics_registry.counter(
+    "smartgenie_search_source_outcomes_total", "Search fan-out results per source.", ["source", "outcome"],
+)
+SEARCH_DECISIONS = metrics_registry.counter(
+    "smartgenie_search_decisions_total", "Search decisions per decider and head (shadow and model modes).",
+    ["decider", "head", "decision"],
+)
+SEARCH_DECISION_SHADOW_CALLS = metrics_registry.counter(
+    "smartgenie_search_decision_shadow_calls_total",
+    "Upstream calls the model would have saved or added versus the keyword heuristic.", ["call", "effect"],
+)
+YOUTUBE_QUOTA_UNITS = metrics_registry.counter(
+    "smartgenie_youtube_quota_units_total", "YouTube Data API quota units spent, by endpoint.", ["endpoint"],
+)
+YOUTUBE_VIDEO_LOOKUPS = metrics_registry.counter(
+    "smartgenie_youtube_video_lookups_total", "YouTube video records by where they came from: fresh cache, stale cache or a details miss.", ["result"],
+)
+YOUTUBE_CACHE_ONLY_SEARCHES = metrics_registry.counter(
+    "smartgenie_youtube_cache_only_searches_total", "YouTube searches served from cached videos because the quota was nearly spent.", ["outcome"],
+)
+RESPONSE_BYTES = metrics_registry.counter(
+    "smartgenie_response_bytes_total", "Answer response body bytes as encoded and as sent after compression.", ["stage"],
+)
+ANSWER_RESPONSES = metrics_registry.counter(
+    "smartgenie_answer_responses_total", "Answer responses by endpoint, body mode, content encoding and status.",
+    ["endpoint", "mode", "encoding", "status"],
+)
+GROQ_WARMUPS = metrics_registry.counter(
+    "smartgenie_groq_warmups_total", "Groq connection warm-up pings by trigger and outcome.", ["trigger", "outcome"],
+)
+SEARCH_CONTEXT_TOKENS = metrics_registry.histogram(
+    "smartgenie_search_context_tokens", "Estimated search context tokens before and after compaction.", ["kind"],
+    buckets=(50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000),
+)
 
 # --- Prompt Templates ---
 STRICT_PROMPT_TEMPLATE_TEXT = """
@@ -195,51 +543,248 @@ class AnswerResponse(BaseModel):
     source_urls: Optional[List[str]] = None
     youtube_videos: Optional[List[YouTubeVideo]] = None
     additional_resources: Optional[Dict[str, List[str]]] = None
+    stages_overlapped: Optional[List[str]] = None
+    # Set when this exact body is served again for the same question (a cache or local-index answer),
+    # which is what makes an ETag on it worth revalidating against.
+    _reusable: bool = PrivateAttr(default=False)
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str
+
+class BatchAnswerItem(BaseModel):
+    index: int
+    response: Optional[AnswerResponse] = None
+    error: Optional[BatchItemError] = None
+
+class BatchAnswerResponse(BaseModel):
+    results: List[BatchAnswerItem]
+    unique_questions: int
 
 # --- Helper Functions ---
 def get_current_date() -> str:
     return datetime.now().strftime("%Y-%m-%d")
 
-def should_search_youtube(question: str) -> bool:
+@lru_cache(maxsize=4096)
+def classify_question(question: str) -> frozenset:
+    """Trigger categories for a question; memoized since each request checks the same question several times.
+
+    run_answer_pipeline times the first check of each request as the staleness-check stage, memo hits included.
+    """
     question_lower = question.lower()
-    return any(keyword in question_lower for keyword in YOUTUBE_TRIGGER_KEYWORDS)
+    categories = QUESTION_TRIGGER_MATCHER.categories(question_lower)
+    if PHRASE_STALE not in categories and STALE_ROLE_PATTERN.search(question_lower):
+        categories = categories | {PHRASE_STALE}
+    return categories
+
+def should_search_youtube(question: str) -> bool:
+    return PHRASE_YOUTUBE_TRIGGER in classify_question(question)
 
 def is_question_potentially_stale(question: str) -> bool:
-    question_lower = question.lower()
-    stale_keywords = [
-        "current", "latest", "now", "today", "who is the president", "who is the ceo",
-        "what is the price of", "update on", "news about", "what's new", "currently",
-        "how many", "population of", "record for", "election", "winner of"
-    ]
-    if re.search(r"who is (the|current|new) (\w+ )*(president|ceo|minister|mayor|governor|chancellor|chairman|secretary|leader|winner|champion|monarch|king|queen|prime minister)", question_lower):
-        return True
-    return any(keyword in question_lower for keyword in stale_keywords)
+    return PHRASE_STALE in classify_question(question)
+
+def decide_search(question: str, include_youtube: bool) -> Tuple[bool, bool]:
+    """(search even when the direct answer is known, query YouTube when searching) for this question.
+
+    The keyword heuristic decides unless a trained model is loaded in model mode. In shadow mode the model
+    runs alongside, and its decisions and the calls they would have saved or added are only counted.
+    """
+    heuristic = (is_question_potentially_stale(question), bool(include_youtube))
+    if search_decision_model is None or settings.search_decision_mode == SEARCH_DECISION_HEURISTIC:
+        return heuristic
+    predicted = search_decision_model.decide(question)
+    model = (predicted[HEAD_SEARCH], bool(include_youtube) and predicted[HEAD_YOUTUBE])
+    for decider, (search, youtube) in (("heuristic", heuristic), ("model", model)):
+        SEARCH_DECISIONS.inc(decider, HEAD_SEARCH, str(search).lower())
+        if include_youtube:
+            SEARCH_DECISIONS.inc(decider, HEAD_YOUTUBE, str(youtube).lower())
+    if settings.search_decision_mode == SEARCH_DECISION_SHADOW:
+        record_shadow_savings(heuristic, model)
+        if model != heuristic:
+            request_logger.info("Search decision (shadow): heuristic %s, model %s for %r", heuristic, model, question)
+        return heuristic
+    return model
+
+def record_shadow_savings(heuristic: Tuple[bool, bool], model: Tuple[bool, bool]) -> None:
+    """Count the reconcile call, web search and YouTube calls (search + details) each disagreement implies."""
+    if heuristic[0] != model[0]:
+        effect = "saved" if heuristic[0] else "added"
+        SEARCH_DECISION_SHADOW_CALLS.inc("llm", effect)
+        SEARCH_DECISION_SHADOW_CALLS.inc("web_search", effect)
+    # YouTube only runs alongside a search, so it only differs where both deciders would search.
+    if heuristic[0] and model[0] and heuristic[1] != model[1]:
+        SEARCH_DECISION_SHADOW_CALLS.inc("youtube_api", "saved" if heuristic[1] else "added", amount=2)
+
+def is_search_certain(question: str) -> bool:
+    """Whether the direct answer is sure to be superseded by search, so it is not worth asking for.
+
+    Uses the trained model's search probability in model mode, otherwise the search-certain phrase table.
+    """
+    if not settings.enable_search_first:
+        return False
+    if search_decision_model is not None and settings.search_decision_mode == SEARCH_DECISION_MODEL:
+        return search_decision_model.predict(question)[HEAD_SEARCH] >= settings.search_first_min_probability
+    return PHRASE_SEARCH_CERTAIN in classify_question(question)
+
+def should_speculate_search(question: str, include_youtube: bool, search_expected: bool) -> bool:
+    """Whether search is likely enough to be worth starting alongside the direct answer."""
+    if not settings.enable_speculative_search:
+        return False
+    return search_expected or (bool(include_youtube) and should_search_youtube(question))
+
+async def cancel_speculative_task(task: Optional[asyncio.Task]) -> None:
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        search_logger.debug("Speculative task raised while being cancelled: %s", e)
+
+def get_cached_answer(request: QuestionRequest) -> Optional[AnswerResponse]:
+    if not settings.enable_answer_cache:
+        return None
+    cached = answer_cache.get(request.question, request.include_youtube)
+    if cached is None:
+        shared_response = get_shared_answer(request)
+        ANSWER_CACHE_LOOKUPS.inc("miss" if shared_response is None else "shared")
+        return shared_response
+    response, level = cached
+    ANSWER_CACHE_LOOKUPS.inc(level)
+    request_logger.info("Answer cache hit (%s) for question: %r", level, request.question)
+    return response.model_copy(deep=True)
+
+def store_cached_answer(request: QuestionRequest, response: AnswerResponse) -> None:
+    if not settings.enable_answer_cache or response.answer == ANSWER_UNKNOWN:
+        return
+    ttl_seconds = settings.answer_cache_ttl_stale_seconds if is_question_potentially_stale(request.question) \
+        else settings.answer_cache_ttl_evergreen_seconds
+    response_json = response.model_dump_json()
+    answer_cache.put(request.question, request.include_youtube, response.model_copy(deep=True), ttl_seconds,
+                     size=len(response_json))
+    track_refresh_ahead(request, response, ttl_seconds)
+    if shared_cache is not None:
+        shared_cache.set(SHARED_NAMESPACE_ANSWERS, shared_answer_key(request.question, request.include_youtube),
+                         response_json, ttl_seconds)
+    response._reusable = True  # later hits serve this same body
+
+def track_refresh_ahead(request: QuestionRequest, response: AnswerResponse, ttl_seconds: float) -> None:
+    """Let the refresh-ahead scheduler know when a time-sensitive question's cached answer expires."""
+    if settings.enable_refresh_ahead and is_question_potentially_stale(request.question):
+        refresh_scheduler.track_answer(request.question, bool(request.include_youtube), response.answer, ttl_seconds)
+
+def shared_answer_key(question: str, include_youtube: bool) -> str:
+    return json.dumps(AnswerCache.make_key(question, include_youtube))
+
+def get_shared_answer(request: QuestionRequest) -> Optional[AnswerResponse]:
+    """Exact-match lookup in the cross-worker cache, promoted into this worker's answer cache on a hit."""
+    if shared_cache is None:
+        return None
+    hit = shared_cache.get(SHARED_NAMESPACE_ANSWERS, shared_answer_key(request.question, request.include_youtube))
+    if hit is None:
+        return None
+    response_json, ttl_remaining = hit
+    response = AnswerResponse.model_validate_json(response_json)
+    answer_cache.put(request.question, request.include_youtube, response.model_copy(deep=True), ttl_remaining,
+                     size=len(response_json))
+    track_refresh_ahead(request, response, ttl_remaining)
+    request_logger.info("Shared answer cache hit for question: %r", request.question)
+    return response
+
+def encode_search_result(source: str, result: Any) -> str:
+    if source == SEARCH_SOURCE_YOUTUBE:
+        videos, context_text = result
+        return json.dumps([[video.model_dump() for video in videos], context_text])
+    return json.dumps(list(result))
+
+def decode_search_result(source: str, encoded: str) -> Any:
+    first, second = json.loads(encoded)
+    if source == SEARCH_SOURCE_YOUTUBE:
+        return [YouTubeVideo(**video) for video in first], second
+    return first, second
+
+async def fetch_through_shared_cache(source: str, query: str, fetch: Callable[[], Any],
+                                     cacheable: Callable[[Any], bool]) -> Any:
+    """Check the cross-worker cache before calling an upstream search, and publish what it returns."""
+    if shared_cache is None:
+        return await fetch()
+    namespace, key = SHARED_NAMESPACE_SEARCH_PREFIX + source, normalize_text(query)
+    hit = shared_cache.get(namespace, key)
+    if hit is not None:
+        return decode_search_result(source, hit[0])
+    result = await fetch()
+    if result is not None and cacheable(result):
+        shared_cache.set(namespace, key, encode_search_result(source, result), settings.search_cache_ttl_seconds)
+    return result
 
+def invalidate_search_result(source: str, query: str) -> None:
+    """Forget a cached search result in this worker and in the cross-worker cache."""
+    search_cache.invalidate(source, query)
+    if shared_cache is not None:
+        shared_cache.delete(SHARED_NAMESPACE_SEARCH_PREFIX + source, normalize_text(query))
+
+def warm_from_shared_cache() -> None:
+    """Seed this worker's in-memory caches with the most recently used shared entries."""
+    warmed_answers = 0
+    if settings.enable_answer_cache:
+        for key, response_json, ttl_remaining in shared_cache.recent(SHARED_NAMESPACE_ANSWERS, settings.shared_cache_warm_entries):
+            question, include_youtube = json.loads(key)
+            answer_cache.put(question, include_youtube, AnswerResponse.model_validate_json(response_json), ttl_remaining,
+                             size=len(response_json))
+            warmed_answers += 1
+    warmed_searches = 0
+    if settings.enable_search_cache:
+        for source in (SEARCH_SOURCE_WEB, SEARCH_SOURCE_YOUTUBE):
+            for key, encoded, ttl_remaining in shared_cache.recent(SHARED_NAMESPACE_SEARCH_PREFIX + source, settings.shared_cache_warm_entries):
+                search_cache.put(source, key, decode_search_result(source, encoded), ttl_remaining)
+                warmed_searches += 1
+    logger.info(f"Warmed from shared cache: {warmed_answers} answers, {warmed_searches} search results")
+
+@timed(STAGE_LATENCY, STAGE_LOCAL_KNOWLEDGE)
+def get_local_answer(request: QuestionRequest) -> Optional[AnswerResponse]:
+    """Serve a stored answer from the local knowledge index; stale-looking questions always go to the LLM."""
+    if knowledge_index is None or is_question_potentially_stale(request.question):
+        return None
+    match = knowledge_index.search(request.question, settings.knowledge_index_min_score)
+    if match is None:
+        return None
+    document, score = match
+    request_logger.info("Local knowledge hit (score %.2f) for question: %r -> %r", score, request.question, document["question"])
+    return AnswerResponse(answer=document["answer"], source=SOURCE_LOCAL_KNOWLEDGE, confidence=CONFIDENCE_HIGH)
+
+def record_answer(request: QuestionRequest, response: AnswerResponse, labels: Optional[Dict[str, Optional[bool]]] = None) -> None:
+    """Queue a pipeline answer for the JSONL record file consumed by build_knowledge_index.py and
+    train_search_decision.py; labels are the observed search outcomes (None where search did not run)."""
+    if answer_recorder is None:
+        return
+    answer_recorder.write({"question": request.question, "include_youtube": request.include_youtube,
+                           "recorded_at": datetime.utcnow().isoformat(), "response": response.model_dump(exclude_none=True),
+                           "labels": dict(labels or {})})
+
+@timed(STAGE_LATENCY, STAGE_CLEAN_RESPONSE)
 def clean_response(response_text: str, is_from_search: bool = False) -> str:
     cleaned = response_text.strip()
     if not cleaned: return ANSWER_UNKNOWN
     lower_cleaned = cleaned.lower()
 
-    if "hmm, i'm not sure about that one!" in lower_cleaned or cleaned == ANSWER_UNKNOWN:
+    rejection = RESPONSE_REJECTION_MATCHER.search(lower_cleaned)
+    if rejection is not None:
+        phrase, categories = rejection
+        llm_logger.debug("%s phrase %r found in response: '%.100s...'", "/".join(sorted(categories)), phrase, cleaned)
         return ANSWER_UNKNOWN
-        
-    for refusal in COMMON_LLM_REFUSALS:
-        if refusal in lower_cleaned:
-            logger.debug(f"Refusal phrase '{refusal}' found in response: '{cleaned[:100]}...'")
-            return ANSWER_UNKNOWN
-    for phrase in FORBIDDEN_PHRASES_IN_RESPONSE:
-        if phrase in lower_cleaned:
-            logger.debug(f"Forbidden phrase '{phrase}' found in response: '{cleaned[:100]}...'")
-            return ANSWER_UNKNOWN
-            
-    preambles_to_remove = [
-        "answer:", "response:", "here is the answer:", "the answer is:",
-        "certainly, here's the information:", "okay, here's that:", "sure!", "absolutely!"
-    ]
-    for preamble in preambles_to_remove:
-        if cleaned.lower().startswith(preamble):
-            cleaned = cleaned[len(preamble):].lstrip()
-            logger.debug(f"Removed preamble '{preamble}' from response: '{cleaned[:100]}...'")
+
+    # Preambles are checked in order against one lowercased copy; only the offset moves.
+    offset = 0
+    for preamble in RESPONSE_PREAMBLES:
+        if lower_cleaned.startswith(preamble, offset):
+            offset += len(preamble)
+            while offset < len(lower_cleaned) and lower_cleaned[offset].isspace():
+                offset += 1
+            llm_logger.debug("Removed preamble %r from response: '%.100s...'", preamble, cleaned[offset:offset + 100])
+    if offset:
+        cleaned = cleaned[offset:]
 
     if is_from_search:
         target_max_words = settings.max_response_words + 150
@@ -251,7 +796,7 @@ def clean_response(response_text: str, is_from_search: bool = False) -> str:
     words = cleaned.split()
 
     if len(words) > absolute_max_words_limit:
-        logger.debug(f"Response too long: '{cleaned[:100]}...' ({len(words)} words, limit ~{int(absolute_max_words_limit)})")
+        llm_logger.debug("Response too long: '%.100s...' (%d words, limit ~%d)", cleaned, len(words), int(absolute_max_words_limit))
         sentences = re.split(r'(?<=[.!?])\s+', cleaned)
         truncated_response = ""
         word_count = 0
@@ -274,271 +819,515 @@ def clean_response(response_text: str, is_from_search: bool = False) -> str:
         
         cleaned = truncated_response.strip()
         if word_count >= target_max_words * 0.6:
-            logger.debug(f"Truncated to: '{cleaned[:100]}...' ({word_count} words)")
+            llm_logger.debug("Truncated to: '%.100s...' (%d words)", cleaned, word_count)
             return cleaned
         else:
-            logger.debug(f"Truncation resulted in too short response ({word_count} words vs target {target_max_words}). Returning UNKNOWN.")
+            llm_logger.debug("Truncation resulted in too short response (%d words vs target %d). Returning UNKNOWN.", word_count, target_max_words)
             return ANSWER_UNKNOWN
             
     return cleaned.strip()
 
-def extract_urls_from_search_results(search_results_text: str) -> Dict[str, List[str]]:
-    url_pattern = r'https?://[^\s<>"\'()\[\]{}|\\^`\n]+[^\s<>"\'()\[\]{}|\\^`.,;:!?\n]'
-    markdown_link_pattern = r'\[[^\]]+\]\((https?://[^\s<>"\'()\[\]{}|\\^`\n]+[^\s<>"\'()\[\]{}|\\^`.,;:!?\n])\)'
-    wrapped_url_pattern = r'[<"\']+(https?://[^\s<>"\'()\[\]{}|\\^`\n]+)[>"\']+'
-    
-    categorized_urls = {
-        'wikipedia': [], 'academic': [], 'news': [],
-        'government': [], 'educational': [], 'general': []
-    }
-    all_urls = set()
-    
-    for pattern in [url_pattern, markdown_link_pattern, wrapped_url_pattern]:
-        found_urls = re.findall(pattern, search_results_text, re.IGNORECASE)
-        for url_match in found_urls:
-            url = url_match if isinstance(url_match, str) else url_match[0] if isinstance(url_match, tuple) and url_match else None
-            if not url: continue
-            url_cleaned = url.strip().rstrip(').,!?:;"\'')
-            if not any(blocked_domain in url_cleaned.lower() for blocked_domain in ["duckduckgo.com", "google.com/search", "bing.com/search"]):
-                all_urls.add(url_cleaned)
-    
-    logger.debug(f"Extracted {len(all_urls)} unique URLs from search results text before categorization.")
-    
-    for url in all_urls:
-        url_lower = url.lower()
-        if 'wikipedia.org' in url_lower or 'wiki' in url_lower:
-            categorized_urls['wikipedia'].append(url)
-        elif any(domain in url_lower for domain in ['.edu', 'scholar.', 'academia.', 'researchgate.', 'pubmed.', 'arxiv.', 'jstor.', 'springer.', 'ieee.', 'acm.org']):
-            categorized_urls['academic'].append(url)
-        elif any(domain in url_lower for domain in ['.gov', '.mil', 'who.int', 'un.org', 'unesco.', 'worldbank.', 'imf.org', 'europa.eu']):
-            categorized_urls['government'].append(url)
-        elif any(domain in url_lower for domain in ['bbc.', 'cnn.', 'reuters.', 'ap.org', 'npr.', 'news', 'guardian.', 'nytimes.', 'wsj.', 'bloomberg.', 'espn.', 'cricinfo.', 'cricbuzz.', 'espncricinfo.']): # Added cricbuzz
-            categorized_urls['news'].append(url)
-        elif any(domain in url_lower for domain in ['coursera.', 'edx.', 'khanacademy.', 'udemy.', 'skillshare.', 'pluralsight.', 'lynda.', 'masterclass.']):
-            categorized_urls['educational'].append(url)
-        else:
-            categorized_urls['general'].append(url)
-            
-    result = {k: list(set(v)) for k, v in categorized_urls.items() if v} # Ensure unique URLs per category
-    logger.debug(f"Categorized URLs from text: {[(k, len(v)) for k, v in result.items()]}")
-    return result
-
-def get_legacy_urls_list(categorized_urls: Dict[str, List[str]]) -> List[str]:
-    all_urls = []
-    for category_urls in categorized_urls.values():
-        all_urls.extend(category_urls)
-    return list(set(all_urls))
+class ResponseStreamGuard:
+    """Incremental form of clean_response's checks for text streamed token by token.
+
+    Holds back the opening characters until a preamble can be stripped and a leading "not sure" answer
+    recognised, and flags the stream as soon as an unknown marker, refusal or forbidden phrase appears so
+    the caller can abort it. Only a tail as long as the longest phrase is kept between chunks. The final
+    answer is still produced by clean_response on the full text.
+    """
+    UNKNOWN_MARKER = ANSWER_UNKNOWN.lower()
+    MAX_PHRASE_LEN = max(len(p) for p in [UNKNOWN_MARKER] + COMMON_LLM_REFUSALS + FORBIDDEN_PHRASES_IN_RESPONSE)
+    HEAD_HOLD_CHARS = max(len(p) for p in RESPONSE_PREAMBLES) + len(UNKNOWN_MARKER) + 1
+
+    def __init__(self):
+        self.violation: Optional[str] = None
+        self._tail = ""
+        self._head: Optional[str] = ""
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that is safe to forward (empty once a violation is found)."""
+        if self.violation is not None:
+            return ""
+        window = self._tail + chunk.lower()
+        rejection = RESPONSE_REJECTION_MATCHER.search(window)
+        if rejection is not None:
+            self.violation = rejection[0]
+            return ""
+        self._tail = window[-(self.MAX_PHRASE_LEN - 1):]
+        if self._head is None:
+            return chunk
+        self._head += chunk
+        if len(self._head.lstrip()) < self.HEAD_HOLD_CHARS:
+            return ""
+        return self._release_head()
+
+    def finish(self) -> str:
+        if self.violation is not None or self._head is None:
+            return ""
+        return self._release_head()
+
+    def _release_head(self) -> str:
+        head = self._head.lstrip()
+        self._head = None
+        for preamble in RESPONSE_PREAMBLES:
+            if head.lower().startswith(preamble):
+                head = head[len(preamble):].lstrip()
+        return head
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.http_max_concurrency_per_host)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+async def http_get_json(url: str, params: Dict[str, object]) -> dict:
+    """GET a JSON document through the shared pooled client, bounded per upstream host."""
+    if http_client is None:
+        raise RuntimeError("Shared HTTP client is not initialized")
+    async with _host_semaphore(url):
+        response = await http_client.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def youtube_result_cacheable(result: tuple[List[YouTubeVideo], str]) -> bool:
+    # Cache-only results stand in while the quota is short; don't keep them once it recovers.
+    return bool(result[0]) and youtube_quota.can_spend(SEARCH_LIST_UNITS)
 
 async def search_youtube(query: str) -> tuple[List[YouTubeVideo], str]:
-    youtube_videos_data = []
-    youtube_context_text = ""
     if not settings.youtube_api_key:
         logger.warning("YouTube API key not provided. YouTube search will be skipped.")
-        return youtube_videos_data, youtube_context_text
+        return [], ""
     if not settings.enable_youtube_search:
-        logger.info("YouTube search is disabled by configuration.")
-        return youtube_videos_data, youtube_context_text
+        search_logger.info("YouTube search is disabled by configuration.")
+        return [], ""
+    if not settings.enable_search_cache:
+        return await fetch_youtube_videos(query)
+    return await search_cache.get_or_fetch(
+        SEARCH_SOURCE_YOUTUBE, query,
+        lambda: fetch_through_shared_cache(SEARCH_SOURCE_YOUTUBE, query, lambda: fetch_youtube_videos(query),
+                                           youtube_result_cacheable),
+        cacheable=youtube_result_cacheable,
+    )
+
+def parse_youtube_video(item: Dict[str, Any]) -> YouTubeVideo:
+    """Build a video record from one videos.list item; durations and view counts are formatted once, here."""
+    snippet, content_details, statistics = item.get('snippet',{}), item.get('contentDetails',{}), item.get('statistics',{})
+    duration_str = None
+    match = YOUTUBE_DURATION_RE.match(content_details.get('duration', ''))
+    if match:
+        parts = [f"{x}{l}" for x, l in zip(match.groups(), ['h', 'm', 's']) if x]
+        duration_str = " ".join(parts) if parts else "N/A"
+    view_count_str = None
+    if 'viewCount' in statistics:
+        vc = int(statistics['viewCount'])
+        if vc >= 1_000_000: view_count_str = f"{vc/1_000_000:.1f}M views"
+        elif vc >= 1_000: view_count_str = f"{vc/1_000:.1f}K views"
+        else: view_count_str = f"{vc} views"
+    return YouTubeVideo(title=snippet.get('title','N/A'),url=f"https://www.youtube.com/watch?v={item['id']}",channel=snippet.get('channelTitle','N/A'),
+                        description=snippet.get('description','')[:250]+"..." if snippet.get('description') else 'N/A',
+                        duration=duration_str,view_count=view_count_str,published_at=snippet.get('publishedAt',''))
+
+def format_youtube_context(videos: List[YouTubeVideo]) -> str:
+    blocks = []
+    for video in videos:
+        lines = [f"YouTube Video: {video.title}", f"Channel: {video.channel}"]
+        if video.duration: lines.append(f"Duration: {video.duration}")
+        if video.view_count: lines.append(f"Views: {video.view_count}")
+        lines.extend([f"Description Snippet: {video.description}", f"URL: {video.url}"])
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+async def fetch_youtube_details(video_ids: List[str]) -> Dict[str, YouTubeVideo]:
+    """Video records for the IDs, in one videos.list call for the ones not fresh in the metadata cache.
+
+    If the quota cannot cover the call (or it fails), stale cached records stand in for the misses.
+    """
+    cached = youtube_video_cache.get_many(video_ids)
+    misses = [video_id for video_id in video_ids if video_id not in cached]
+    YOUTUBE_VIDEO_LOOKUPS.inc(LOOKUP_FRESH, amount=len(cached))
+    videos = {video_id: YouTubeVideo(**record) for video_id, record in cached.items()}
+    if not misses:
+        return videos
+    YOUTUBE_VIDEO_LOOKUPS.inc(LOOKUP_MISS, amount=len(misses))
+    if youtube_quota.can_spend(VIDEOS_LIST_UNITS, use_reserve=True):
+        try:
+            videos_api_url = "https://www.googleapis.com/youtube/v3/videos"
+            videos_params = {'part':'snippet,contentDetails,statistics','id':','.join(misses),'key':settings.youtube_api_key}
+            await youtube_rate_limiter.acquire(settings.upstream_acquire_timeout)
+            youtube_quota.charge(YOUTUBE_ENDPOINT_VIDEOS, VIDEOS_LIST_UNITS)
+            YOUTUBE_QUOTA_UNITS.inc(YOUTUBE_ENDPOINT_VIDEOS, amount=VIDEOS_LIST_UNITS)
+            stage_start = time.perf_counter()
+            videos_data = await http_get_json(videos_api_url, videos_params)
+            STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_YOUTUBE_DETAILS)
+            fetched = {item['id']: parse_youtube_video(item) for item in videos_data.get('items', [])}
+            youtube_video_cache.put_many({video_id: video.model_dump() for video_id, video in fetched.items()})
+            videos.update(fetched)
+            return videos
+        except (httpx.HTTPError, RateLimitExceeded) as e:
+            logger.warning(f"YouTube details unavailable ({e}); using stale cached records for {len(misses)} videos.")
+    stale = youtube_video_cache.get_many(misses, allow_stale=True)
+    YOUTUBE_VIDEO_LOOKUPS.inc(LOOKUP_STALE, amount=len(stale))
+    videos.update((video_id, YouTubeVideo(**record)) for video_id, record in stale.items())
+    return videos
+
+async def fetch_youtube_videos(query: str) -> tuple[List[YouTubeVideo], str]:
+    youtube_videos_data: List[YouTubeVideo] = []
     try:
+        if not youtube_quota.can_spend(SEARCH_LIST_UNITS):
+            youtube_videos_data = [YouTubeVideo(**record) for record in youtube_video_cache.search(query, settings.max_youtube_results)]
+            YOUTUBE_CACHE_ONLY_SEARCHES.inc("hit" if youtube_videos_data else "empty")
+            logger.warning(f"YouTube quota nearly spent ({youtube_quota.remaining()} units left); "
+                           f"serving {len(youtube_videos_data)} cached videos for query: '{query}'")
+            return youtube_videos_data, format_youtube_context(youtube_videos_data)
         search_api_url = "https://www.googleapis.com/youtube/v3/search"
         search_params = {'part':'snippet','q':query,'type':'video','maxResults':settings.max_youtube_results,'key':settings.youtube_api_key,'order':'relevance','safeSearch':'moderate'}
-        logger.info(f"Searching YouTube with query: '{query}'")
-        response = requests.get(search_api_url, params=search_params, timeout=10)
-        response.raise_for_status()
-        search_data = response.json()
+        search_logger.info("Searching YouTube with query: '%s'", query)
+        await youtube_rate_limiter.acquire(settings.upstream_acquire_timeout)
+        youtube_quota.charge(YOUTUBE_ENDPOINT_SEARCH, SEARCH_LIST_UNITS)
+        YOUTUBE_QUOTA_UNITS.inc(YOUTUBE_ENDPOINT_SEARCH, amount=SEARCH_LIST_UNITS)
+        stage_start = time.perf_counter()
+        search_data = await http_get_json(search_api_url, search_params)
+        STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_YOUTUBE_SEARCH)
         video_ids = [item['id']['videoId'] for item in search_data.get('items', []) if item.get('id', {}).get('kind') == 'youtube#video']
         if not video_ids:
-            logger.info("No YouTube video IDs found from search.")
-            return youtube_videos_data, youtube_context_text
-        videos_api_url = "https://www.googleapis.com/youtube/v3/videos"
-        videos_params = {'part':'snippet,contentDetails,statistics','id':','.join(video_ids),'key':settings.youtube_api_key}
-        details_response = requests.get(videos_api_url, params=videos_params, timeout=10)
-        details_response.raise_for_status()
-        videos_data = details_response.json()
-        for item in videos_data.get('items', []):
-            snippet, content_details, statistics = item.get('snippet',{}), item.get('contentDetails',{}), item.get('statistics',{})
-            duration_iso = content_details.get('duration', '')
-            duration_str = None
-            if duration_iso:
-                match = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', duration_iso)
-                if match:
-                    h, m, s = match.groups()
-                    parts = [f"{x}{l}" for x, l in zip([h, m, s], ['h', 'm', 's']) if x]
-                    duration_str = " ".join(parts) if parts else "N/A"
-            view_count_str = None
-            if 'viewCount' in statistics:
-                vc = int(statistics['viewCount'])
-                if vc >= 1_000_000: view_count_str = f"{vc/1_000_000:.1f}M views"
-                elif vc >= 1_000: view_count_str = f"{vc/1_000:.1f}K views"
-                else: view_count_str = f"{vc} views"
-            video = YouTubeVideo(title=snippet.get('title','N/A'),url=f"https://www.youtube.com/watch?v={item['id']}",channel=snippet.get('channelTitle','N/A'),
-                                 description=snippet.get('description','')[:250]+"..." if snippet.get('description') else 'N/A',
-                                 duration=duration_str,view_count=view_count_str,published_at=snippet.get('publishedAt',''))
-            youtube_videos_data.append(video)
-            youtube_context_text += f"YouTube Video: {video.title}\nChannel: {video.channel}\n"
-            if video.duration: youtube_context_text += f"Duration: {video.duration}\n"
-            if video.view_count: youtube_context_text += f"Views: {video.view_count}\n"
-            youtube_context_text += f"Description Snippet: {video.description}\nURL: {video.url}\n\n"
-        logger.info(f"Found {len(youtube_videos_data)} YouTube videos for query: {query}")
-    except requests.exceptions.RequestException as e: logger.error(f"YouTube API request error: {e}")
+            search_logger.info("No YouTube video IDs found from search.")
+            return youtube_videos_data, ""
+        videos_by_id = await fetch_youtube_details(video_ids)
+        youtube_videos_data = [videos_by_id[video_id] for video_id in video_ids if video_id in videos_by_id]
+        search_logger.info("Found %d YouTube videos for query: %s", len(youtube_videos_data), query)
+    except httpx.HTTPError as e: logger.error(f"YouTube API request error: {e}")
+    except RateLimitExceeded as e: logger.warning(f"Skipping YouTube search: {e} (retry in ~{e.retry_after:.1f}s)")
     except Exception as e: logger.error(f"Error processing YouTube search: {e}", exc_info=True)
-    return youtube_videos_data, youtube_context_text.strip()
+    return youtube_videos_data, format_youtube_context(youtube_videos_data)
+
+async def fetch_ddg_results(query: str) -> tuple[str, Dict[str, List[str]]]:
+    """Raw DDG text plus its categorized URLs, extracted once so cached entries don't redo it."""
+    await ddg_rate_limiter.acquire(settings.upstream_acquire_timeout)
+    stage_start = time.perf_counter()
+    ddg_result_text_content = await ddg_search.arun(query) or ""
+    STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_DDG)
+    if len(ddg_result_text_content.strip()) <= MIN_DDG_TEXT_CHARS:
+        return ddg_result_text_content, {}
+    stage_start = time.perf_counter()
+    extracted_urls = extract_urls(ddg_result_text_content)
+    STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_URL_EXTRACTION)
+    search_logger.debug("Categorized URLs from DDG text: %s", [(k, len(v)) for k, v in extracted_urls.items()])
+    return ddg_result_text_content, extracted_urls
+
+def ddg_result_cacheable(result: tuple[str, Dict[str, List[str]]]) -> bool:
+    return len(result[0].strip()) > MIN_DDG_TEXT_CHARS
+
+async def search_ddg(query: str) -> tuple[str, Dict[str, List[str]]]:
+    if not settings.enable_search_cache:
+        return await fetch_ddg_results(query)
+    return await search_cache.get_or_fetch(
+        SEARCH_SOURCE_WEB, query,
+        lambda: fetch_through_shared_cache(SEARCH_SOURCE_WEB, query, lambda: fetch_ddg_results(query), ddg_result_cacheable),
+        cacheable=ddg_result_cacheable,
+    )
 
-async def perform_enhanced_web_search(query: str) -> tuple[str, Dict[str, List[str]]]:
-    web_search_text_context = ""
-    # categorized_urls will store ALL web URLs found, from DDG and suggestions
-    all_categorized_web_urls: Dict[str, List[str]] = {}
+async def perform_enhanced_web_search(query: str) -> tuple[List[Section], Dict[str, List[str]]]:
+    """Web context as (header, passages) sections, plus every web URL found, categorized."""
+    web_sections: List[Section] = []
+    # Ordered sets of ALL web URLs found, from DDG and suggestions, per category
+    all_categorized_web_urls: Dict[str, Dict[str, None]] = {}
     ddg_context_added = False
-    new_suggestions_added_to_context = False # Tracks if suggested URL text was added
 
     if ddg_search and settings.enable_web_search:
         try:
-            logger.info(f"Attempting DuckDuckGo search for: '{query}'")
-            ddg_result_text_content = await ddg_search.arun(query)
-            logger.info(f"DDG result raw text length: {len(ddg_result_text_content) if ddg_result_text_content else 0}")
+            search_logger.info("Attempting DuckDuckGo search for: '%s'", query)
+            ddg_result_text_content, extracted_urls_from_ddg = await search_ddg(query)
+            payload_logger.info("DDG result text (%d chars)", len(ddg_result_text_content or ""), extra={"payload": ddg_result_text_content})
             
-            if ddg_result_text_content and len(ddg_result_text_content.strip()) > 20:
-                # Add DDG's textual results to the context
-                web_search_text_context += f"Web Search Results (from DuckDuckGo):\n{ddg_result_text_content.strip()}\n\n"
+            if ddg_result_text_content and len(ddg_result_text_content.strip()) > MIN_DDG_TEXT_CHARS:
+                # Add DDG's textual results to the context, one passage per few sentences
+                web_sections.append((WEB_RESULTS_HEADER, split_passages(ddg_result_text_content, settings.search_passage_max_tokens)))
                 ddg_context_added = True
                 
-                # Extract URLs from DDG's textual results and add to all_categorized_web_urls
-                extracted_urls_from_ddg = extract_urls_from_search_results(ddg_result_text_content)
-                for category, urls in extracted_urls_from_ddg.items():
-                    cat_list = all_categorized_web_urls.setdefault(category, [])
-                    for u in urls:
-                        if u not in cat_list:
-                            cat_list.append(u)
-                logger.info(f"DDG search text processed. URLs extracted for categories: {list(extracted_urls_from_ddg.keys())}")
+                # Merge URLs extracted from DDG's textual results into all_categorized_web_urls
+                merge_categorized_urls(all_categorized_web_urls, extracted_urls_from_ddg)
+                search_logger.info("DDG search text processed. URLs extracted for categories: %s", list(extracted_urls_from_ddg))
             else:
-                logger.warning(f"DDG search returned insufficient textual content: {ddg_result_text_content[:100] if ddg_result_text_content else 'None'}")
+                search_logger.warning("DDG search returned insufficient textual content (%d chars)", len(ddg_result_text_content or ""))
+        except RateLimitExceeded as e:
+            logger.warning(f"Skipping DDG search: {e} (retry in ~{e.retry_after:.1f}s)")
         except Exception as e:
             logger.error(f"DDG search failed: {e}", exc_info=True)
     else:
-        logger.info("DDG search tool not available or web search disabled for DDG part.")
+        search_logger.info("DDG search tool not available or web search disabled for DDG part.")
 
     if settings.enable_web_search:
-        logger.info("Attempting to generate/merge suggested URLs.")
+        search_logger.info("Attempting to generate/merge suggested URLs.")
         suggested_urls_map = generate_suggested_urls(query) # This returns Dict[str, List[str]]
         
         if suggested_urls_map:
-            temp_suggested_context_lines = []
-            any_new_suggestion_url_added_to_categorized = False
-
-            for category, urls_in_suggestion in suggested_urls_map.items():
-                if urls_in_suggestion:
-                    # Add these URLs to the main all_categorized_web_urls list
-                    cat_list_in_main_dict = all_categorized_web_urls.setdefault(category, [])
-                    new_urls_for_this_category_for_context_text = []
-
-                    for url in urls_in_suggestion:
-                        if url not in cat_list_in_main_dict:
-                            cat_list_in_main_dict.append(url)
-                            new_urls_for_this_category_for_context_text.append(url)
-                            any_new_suggestion_url_added_to_categorized = True # Mark that at least one new URL was added to the main list
-                    
-                    # If new URLs were identified for context text for this category
-                    if new_urls_for_this_category_for_context_text:
-                        if not temp_suggested_context_lines: # Add main header for suggested resources only once
-                             temp_suggested_context_lines.append(f"Suggested Web Resources for '{query}':")
-                        temp_suggested_context_lines.append(f"\n  {category.title()} Sources:")
-                        for url in new_urls_for_this_category_for_context_text: # Only list the NEW ones in context
-                            temp_suggested_context_lines.append(f"  - {url}")
-                        new_suggestions_added_to_context = True # Mark that text was added to context
-            
-            if new_suggestions_added_to_context: # If any text was actually prepared for suggested URLs
-                web_search_text_context += "\n" + "\n".join(temp_suggested_context_lines) + "\n\n"
-                logger.info("Text for suggested URLs added to context.")
-            
-            if any_new_suggestion_url_added_to_categorized:
-                 logger.info(f"Suggested URLs merged into categorized list. Final web URL categories: {list(all_categorized_web_urls.keys())}")
-            elif not new_suggestions_added_to_context: # No text added and no new URLs added to categorized list
-                 logger.info("No *new* suggested URLs were identified (they might have already been found by DDG or list was empty).")
+            # Only list the suggestions DDG did not already find in context, one passage per category
+            new_suggested_urls = merge_categorized_urls(all_categorized_web_urls, suggested_urls_map)
+            suggested_passages = ["\n".join([f"  {category.title()} Sources:"] + [f"  - {url}" for url in urls])
+                                  for category, urls in new_suggested_urls.items()]
+            if suggested_passages:
+                web_sections.append((f"Suggested Web Resources for '{query}':", suggested_passages))
+                search_logger.info("Suggested URLs merged into categorized list. Final web URL categories: %s", list(all_categorized_web_urls))
+            else:
+                search_logger.info("No *new* suggested URLs were identified (they were already found by DDG).")
         else:
-            logger.info("generate_suggested_urls returned no suggestions map.")
+            search_logger.info("No indexed reference topics in the query; no suggested URLs.")
             
-    if not web_search_text_context.strip() and all_categorized_web_urls and settings.enable_web_search:
-        logger.info("Web search found categorized URLs but no specific text snippets for context (this is okay).")
-    elif not web_search_text_context.strip() and not all_categorized_web_urls and settings.enable_web_search:
-        logger.info("Web search (DDG/Suggested) yielded no text context and no categorized URLs.")
+    if not web_sections and all_categorized_web_urls and settings.enable_web_search:
+        search_logger.info("Web search found categorized URLs but no specific text snippets for context (this is okay).")
+    elif not web_sections and not all_categorized_web_urls and settings.enable_web_search:
+        search_logger.info("Web search (DDG/Suggested) yielded no text context and no categorized URLs.")
 
-    return web_search_text_context.strip(), all_categorized_web_urls
+    return web_sections, {category: list(urls) for category, urls in all_categorized_web_urls.items()}
 
 
-async def perform_search(query: str, include_youtube_flag: bool) -> tuple[str, List[str], Dict[str, List[str]], List[YouTubeVideo]]:
-    combined_search_text_context = ""
+async def run_search_source(name: str, coro, timeout_seconds: float):
+    """Await one search source within its own budget; returns None if it timed out or failed."""
+    try:
+        result = await asyncio.wait_for(coro, timeout=timeout_seconds)
+        SEARCH_SOURCE_OUTCOMES.inc(name.lower(), SEARCH_OUTCOME_OK)
+        return result
+    except asyncio.TimeoutError:
+        SEARCH_SOURCE_OUTCOMES.inc(name.lower(), SEARCH_OUTCOME_TIMEOUT)
+        logger.warning(f"{name} search exceeded its {timeout_seconds}s budget; continuing without it.")
+    except Exception as e:
+        SEARCH_SOURCE_OUTCOMES.inc(name.lower(), SEARCH_OUTCOME_ERROR)
+        logger.error(f"Error during {name} search in perform_search: {e}", exc_info=True)
+    return None
+
+def build_search_context(sections: List[Section], query: str) -> str:
+    """Pack search sections into the prompt context, relevance-ranked within a token budget when enabled."""
+    if not settings.enable_context_compaction:
+        combined_search_text_context = "\n\n".join(header + "\n" + "\n".join(passages) for header, passages in sections)
+        if len(combined_search_text_context) > settings.max_search_results_chars:
+            combined_search_text_context = combined_search_text_context[:settings.max_search_results_chars] + "\n... [Search results truncated due to length]"
+            search_logger.info("Combined search results truncated to %d characters.", settings.max_search_results_chars)
+        return combined_search_text_context
+    stage_start = time.perf_counter()
+    combined_search_text_context, packed_tokens, raw_tokens = compact_context(sections, query, settings.search_context_token_budget)
+    STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_CONTEXT_COMPACTION)
+    SEARCH_CONTEXT_TOKENS.observe(raw_tokens, "raw")
+    SEARCH_CONTEXT_TOKENS.observe(packed_tokens, "packed")
+    search_logger.info("Search context compacted from ~%d to ~%d tokens (budget %d).", raw_tokens, packed_tokens, settings.search_context_token_budget)
+    return combined_search_text_context
+
+async def perform_search(query: str, include_youtube_flag: bool,
+                         deadline: Optional[Deadline] = None) -> tuple[str, List[str], Dict[str, List[str]], List[YouTubeVideo]]:
+    """Web and YouTube fan-out; with a deadline, sources are cut off early enough to leave time for the answer."""
+    search_sections: List[Section] = []
     queries_used = []
-    final_categorized_web_urls: Dict[str, List[str]] = {}
+    final_categorized_web_urls: Dict[str, Dict[str, None]] = {}
     youtube_videos_found: List[YouTubeVideo] = []
-    
-    web_search_did_run = False
-
-    if settings.enable_web_search:
-        web_search_did_run = True
-        try:
-            web_context_from_enhancer, categorized_urls_from_enhancer = await perform_enhanced_web_search(query)
-            
-            if web_context_from_enhancer.strip():
-                combined_search_text_context += web_context_from_enhancer.strip() + "\n\n"
-            
-            # Merge categorized URLs from enhancer
-            if isinstance(categorized_urls_from_enhancer, dict):
-                for category, urls_in_map in categorized_urls_from_enhancer.items():
-                    cat_list_in_main = final_categorized_web_urls.setdefault(category, [])
-                    for url in urls_in_map:
-                        if url not in cat_list_in_main:
-                            cat_list_in_main.append(url)
-            
-            # Add "Web: query" if web search produced text or categorized URLs
-            if web_context_from_enhancer.strip() or final_categorized_web_urls:
-                if f"Web: {query}" not in queries_used:
-                    queries_used.append(f"Web: {query}")
-                logger.info(f"Web search for '{query}' processed. Text context length: {len(web_context_from_enhancer)}. Categorized URLs: {bool(final_categorized_web_urls)}")
-            else:
-                logger.info(f"Web search for '{query}' yielded no text context and no categorized URLs.")
 
-        except Exception as e:
-            logger.error(f"Error during perform_enhanced_web_search call in perform_search: {e}", exc_info=True)
-    else:
-        logger.info("Web search is disabled by configuration.")
-
-    youtube_search_did_run = False
+    # Fan out web and YouTube concurrently, each bounded by its own timeout. Sections are
+    # assembled afterwards in a fixed order (web first, then YouTube) regardless of finish order.
     should_run_youtube_search = include_youtube_flag and settings.enable_youtube_search and settings.youtube_api_key
-    if should_run_youtube_search:
-        youtube_search_did_run = True
+    deadline = deadline or Deadline(None)
+    web_timeout = deadline.budget(settings.web_search_timeout, settings.llm_answer_reserve_seconds)
+    youtube_timeout = deadline.budget(settings.youtube_search_timeout, settings.llm_answer_reserve_seconds)
+    if (web_timeout < settings.web_search_timeout and settings.enable_web_search) or \
+            (youtube_timeout < settings.youtube_search_timeout and should_run_youtube_search):
+        DEADLINE_DEGRADATIONS.inc(STAGE_SEARCH)
+        search_logger.info("Search budget cut to web %.2fs / YouTube %.2fs by the request deadline.", web_timeout, youtube_timeout)
+    web_coro = run_search_source("Web", perform_enhanced_web_search(query), web_timeout) \
+        if settings.enable_web_search and web_timeout > 0 else None
+    youtube_coro = run_search_source("YouTube", search_youtube(query), youtube_timeout) \
+        if should_run_youtube_search and youtube_timeout > 0 else None
+    if web_coro is None:
+        search_logger.info("Web search is disabled by configuration.")
+    pending = [coro for coro in (web_coro, youtube_coro) if coro is not None]
+    results = await asyncio.gather(*pending) if pending else []
+    web_result = results.pop(0) if web_coro is not None else None
+    youtube_result = results.pop(0) if youtube_coro is not None else None
+
+    if web_result is not None:
+        web_sections_from_enhancer, categorized_urls_from_enhancer = web_result
+        search_sections.extend(web_sections_from_enhancer)
+
+        # Merge categorized URLs from enhancer
+        if isinstance(categorized_urls_from_enhancer, dict):
+            merge_categorized_urls(final_categorized_web_urls, categorized_urls_from_enhancer)
+
+        # Add "Web: query" if web search produced text or categorized URLs
+        if web_sections_from_enhancer or final_categorized_web_urls:
+            queries_used.append(f"Web: {query}")
+            search_logger.info("Web search for '%s' processed. Context sections: %d. Categorized URLs: %s", query, len(web_sections_from_enhancer), bool(final_categorized_web_urls))
+        else:
+            search_logger.info("Web search for '%s' yielded no text context and no categorized URLs.", query)
+
+    if youtube_result is not None:
+        youtube_vids, youtube_ctx_text = youtube_result
+        if youtube_ctx_text.strip():
+            # search_youtube separates videos with a blank line; each video is one passage.
+            search_sections.append((YOUTUBE_RESULTS_HEADER, [block.strip() for block in youtube_ctx_text.split("\n\n") if block.strip()]))
+            queries_used.append(f"YouTube: {query}")
+        if youtube_vids:
+            youtube_videos_found.extend(youtube_vids)
+        search_logger.debug("YouTube search for '%s' yielded %d videos. Context text length: %d.", query, len(youtube_videos_found), len(youtube_ctx_text))
+
+    combined_search_text_context = build_search_context(search_sections, query) if search_sections else ""
+    payload_logger.info("Search context for the LLM", extra={"payload": combined_search_text_context})
+    categorized_urls = {category: list(urls) for category, urls in final_categorized_web_urls.items()}
+    return combined_search_text_context.strip(), queries_used, categorized_urls, youtube_videos_found
+
+EventEmitter = Callable[[str, Dict[str, Any]], None]
+
+llm_latency_windows: Dict[str, LatencyWindow] = {}
+
+def hedge_delay(stage: str) -> float:
+    """Delay before hedging a stage's LLM call: the configured percentile of its recent latencies."""
+    window = llm_latency_windows.get(stage)
+    if window is None or len(window) < settings.llm_hedge_min_samples:
+        return settings.llm_hedge_initial_delay
+    return max(settings.llm_hedge_min_delay, window.percentile(settings.llm_hedge_percentile))
+
+async def run_llm_chain(chain: PromptChain, context: Dict[str, str], stage: str,
+                        emit: Optional[EventEmitter] = None, token_event: str = EVENT_ANSWER_TOKEN,
+                        deadline: Optional[Deadline] = None) -> str:
+    """Run a chain, streaming its tokens through emit when a stream consumer is attached.
+
+    Non-streamed calls that outlive the stage's hedge delay get a second request to the fallback model,
+    and whichever answers first wins. Raises DeadlineExceeded if the request deadline runs out first.
+    """
+    deadline = deadline or Deadline(None)
+    await groq_rate_limiter.acquire(min(settings.upstream_acquire_timeout, deadline.remaining()))
+    stage_start = time.perf_counter()
+    try:
+        if emit is not None:
+            return await asyncio.wait_for(stream_llm_chain(chain, context, stage, emit, token_event), deadline.remaining())
+        if not settings.enable_llm_hedging:
+            return await asyncio.wait_for(chain.arun(context), deadline.remaining())
+
+        async def hedge() -> Optional[str]:
+            try:
+                await groq_rate_limiter.acquire(0.0)  # only hedge with spare capacity
+            except RateLimitExceeded:
+                return None
+            message = await (fallback_llm or chain.llm).ainvoke(chain.prompt.format(**context))
+            return message.content if hasattr(message, "content") else str(message)
+
+        delay = hedge_delay(stage)
+        result, winner = await hedged_call(lambda: chain.arun(context), hedge, delay, deadline.remaining())
+        if winner == HEDGE_WINNER_HEDGE or time.perf_counter() - stage_start >= delay:
+            LLM_HEDGES.inc(stage, winner)
+        return result
+    except asyncio.TimeoutError:
+        DEADLINE_DEGRADATIONS.inc(stage)
+        raise DeadlineExceeded(stage)
+    finally:
+        elapsed = time.perf_counter() - stage_start
+        STAGE_LATENCY.observe(elapsed, stage)
+        llm_latency_windows.setdefault(stage, LatencyWindow()).observe(elapsed)
+
+async def stream_llm_chain(chain: PromptChain, context: Dict[str, str], stage: str,
+                           emit: EventEmitter, token_event: str) -> str:
+    guard = ResponseStreamGuard()
+    raw_parts: List[str] = []
+    async for chunk in chain.llm.astream(chain.prompt.format(**context)):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if not text:
+            continue
+        raw_parts.append(text)
+        safe_text = guard.feed(text)
+        if guard.violation is not None:
+            llm_logger.info("Aborting %s stream: found %r", stage, guard.violation)
+            emit(EVENT_DISCARD, {"stage": stage, "reason": guard.violation})
+            break
+        if safe_text:
+            emit(token_event, {"stage": stage, "text": safe_text})
+    remaining_text = guard.finish()
+    if remaining_text:
+        emit(token_event, {"stage": stage, "text": remaining_text})
+    return "".join(raw_parts)
+
+# --- Groq Connection Pool ---
+GROQ_WARMUP_PATH = "/openai/v1/models"
+
+def create_groq_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client for every Groq call, on HTTP/2 when the h2 package is available."""
+    use_http2 = settings.groq_http2 and importlib.util.find_spec("h2") is not None
+    if settings.groq_http2 and not use_http2:
+        logger.info("GROQ_HTTP2 is set but the h2 package is not installed; the Groq pool uses HTTP/1.1 keep-alive.")
+    limits = httpx.Limits(
+        max_connections=settings.groq_max_connections,
+        max_keepalive_connections=settings.groq_max_keepalive_connections,
+        keepalive_expiry=settings.groq_keepalive_expiry,
+    )
+    return httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(http2=use_http2, limits=limits), limits=limits)
+
+def connection_pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[str, Any]:
+    """Open, idle and waiting connection counts read from the client's httpcore pool."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return {"http2": False, "open": 0, "idle": 0, "active": 0, "waiting": 0}
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+    waiting = sum(1 for request in list(getattr(pool, "_requests", [])) if request.is_queued())
+    return {"http2": bool(getattr(pool, "_http2", False)), "open": len(connections), "idle": idle,
+            "active": len(connections) - idle, "waiting": waiting}
+
+async def warm_groq_connections(trigger: str) -> None:
+    """Open (or refresh) pooled Groq connections with concurrent lightweight authenticated requests.
+
+    Concurrency matters on HTTP/1.1, where each in-flight request holds its own connection; on HTTP/2 the
+    pings share one connection and simply keep it from idling out.
+    """
+    if groq_client is None or groq_http_client is None or settings.groq_warm_connections <= 0:
+        return
+    url = str(groq_client.base_url).rstrip("/") + GROQ_WARMUP_PATH
+    headers = {"Authorization": f"Bearer {settings.groq_api_key}"}
+    timeout = httpx.Timeout(settings.http_read_timeout, connect=settings.http_connect_timeout)
+    results = await asyncio.gather(
+        *(groq_http_client.get(url, headers=headers, timeout=timeout) for _ in range(settings.groq_warm_connections)),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            GROQ_WARMUPS.inc(trigger, "error")
+            logger.warning(f"Groq connection warm-up ({trigger}) failed: {result!r}")
+        else:
+            GROQ_WARMUPS.inc(trigger, "ok")
+    logger.info(f"Groq connection pool after {trigger} warm-up: {connection_pool_stats(groq_http_client)}")
+
+async def keep_groq_connections_warm() -> None:
+    """Warm the pool once at startup, then ping on a timer so idle periods never leave it cold."""
+    await warm_groq_connections("startup")
+    if settings.groq_keep_warm_interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.groq_keep_warm_interval)
         try:
-            youtube_vids, youtube_ctx_text = await search_youtube(query)
-            if youtube_ctx_text.strip():
-                combined_search_text_context += f"Cool YouTube Videos Found:\n{youtube_ctx_text.strip()}\n\n"
-                if f"YouTube: {query}" not in queries_used:
-                    queries_used.append(f"YouTube: {query}")
-            if youtube_vids:
-                youtube_videos_found.extend(youtube_vids)
-            logger.debug(f"YouTube search for '{query}' yielded {len(youtube_videos_found)} videos. Context text length: {len(youtube_ctx_text)}.")
-        except Exception as e: 
-            logger.error(f"Error during YouTube search integration: {e}", exc_info=True)
-    # ... (other YouTube logging conditions from before)
-
-    if len(combined_search_text_context) > settings.max_search_results_chars:
-        combined_search_text_context = combined_search_text_context[:settings.max_search_results_chars] + "\n... [Search results truncated due to length]"
-        logger.info(f"Combined search results truncated to {settings.max_search_results_chars} characters.")
-    
-    # Ensure flags passed to /ask are accurate
-    # search_was_performed_flag = web_search_did_run or youtube_search_did_run (This will be set in /ask)
-    # youtube_search_was_performed_flag = bool(youtube_videos_found) (This will be set in /ask)
+            await warm_groq_connections("timer")
+        except Exception as e:
+            logger.error(f"Groq keep-warm ping failed: {e}", exc_info=True)
 
-    return combined_search_text_context.strip(), queries_used, final_categorized_web_urls, youtube_videos_found
+def build_upstream_clients() -> None:
+    """Import the upstream SDKs and build the Groq chains and the DuckDuckGo tool.
 
-# --- FastAPI Events ---
-@app.on_event("startup")
-async def startup_event():
-    global groq_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain, model_status, ddg_search
-    logger.info("SmartGenie is waking up! Initializing AI and search tools...")
+    This is the slow part of startup. It touches no event-loop state, so fast boot runs it in a thread.
+    """
+    global groq_llm, fallback_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain, model_status, ddg_search, groq_http_client, groq_client
+    load_upstream_modules()
     if not settings.groq_api_key:
         model_status = MODEL_STATUS_API_KEY_MISSING
         logger.error(model_status)
     else:
         try:
-            groq_llm = ChatGroq(temperature=settings.model_temperature, model_name=settings.model_name, groq_api_key=settings.groq_api_key)
+            groq_http_client = create_groq_http_client()
+            groq_client = groq.AsyncGroq(api_key=settings.groq_api_key, http_client=groq_http_client)
+            # The chains only make async calls, so the pooled client backs ChatGroq's async Groq client.
+            groq_llm = ChatGroq(
+                temperature=settings.model_temperature, model_name=settings.model_name, groq_api_key=settings.groq_api_key,
+                async_client=groq_client.chat.completions,
+            )
+            if settings.fallback_model_name and settings.fallback_model_name != settings.model_name:
+                fallback_llm = ChatGroq(
+                    temperature=settings.model_temperature, model_name=settings.fallback_model_name,
+                    groq_api_key=settings.groq_api_key, async_client=groq_client.chat.completions,
+                )
+                logger.info(f"Slow LLM calls will be hedged to {settings.fallback_model_name}")
             
             max_words_for_searched_answer = settings.max_response_words + 150 
             if max_words_for_searched_answer < 300:
@@ -546,33 +1335,29 @@ async def startup_event():
             logger.info(f"Max words for direct answers: {settings.max_response_words}")
             logger.info(f"Max words for search-based/reconciled answers: {max_words_for_searched_answer}")
 
-            direct_prompt_template = PromptTemplate(
-                template=STRICT_PROMPT_TEMPLATE_TEXT, 
-                input_variables=["current_date", "question"], 
-                partial_variables={"max_words": str(settings.max_response_words)}
+            # Templates are split into literal and placeholder segments once here; the word limits are
+            # baked in now and the current date once per day, leaving only per-request slots to fill.
+            direct_prompt_template = CompiledPrompt(
+                STRICT_PROMPT_TEMPLATE_TEXT, partial_variables={"max_words": str(settings.max_response_words)}
             )
-            direct_llm_chain = LLMChain(prompt=direct_prompt_template, llm=groq_llm)
-            
-            search_augmented_prompt_template = PromptTemplate(
-                template=SEARCH_AUGMENTED_PROMPT_TEMPLATE_TEXT, 
-                input_variables=["current_date", "question", "search_results"], 
-                partial_variables={"max_words_augmented": str(max_words_for_searched_answer)}
+            direct_llm_chain = PromptChain(direct_prompt_template, groq_llm)
+
+            search_augmented_prompt_template = CompiledPrompt(
+                SEARCH_AUGMENTED_PROMPT_TEMPLATE_TEXT, partial_variables={"max_words_augmented": str(max_words_for_searched_answer)}
             )
-            search_augmented_llm_chain = LLMChain(prompt=search_augmented_prompt_template, llm=groq_llm)
+            search_augmented_llm_chain = PromptChain(search_augmented_prompt_template, groq_llm)
 
-            reconcile_prompt_template = PromptTemplate(
-                template=RECONCILE_PROMPT_TEMPLATE_TEXT, 
-                input_variables=["current_date", "question", "initial_answer", "search_results"], 
-                partial_variables={"max_words_reconciled": str(max_words_for_searched_answer)}
+            reconcile_prompt_template = CompiledPrompt(
+                RECONCILE_PROMPT_TEMPLATE_TEXT, partial_variables={"max_words_reconciled": str(max_words_for_searched_answer)}
             )
-            reconciliation_llm_chain = LLMChain(prompt=reconcile_prompt_template, llm=groq_llm)
+            reconciliation_llm_chain = PromptChain(reconcile_prompt_template, groq_llm)
             
             model_status = MODEL_STATUS_CONNECTED
             logger.info(f"SmartGenie's brain (all chains) is ready! Using {settings.model_name}")
         except Exception as e:
             model_status = f"{MODEL_STATUS_ERROR_PREFIX}LLM_CHAINS_INIT_FAILED: {str(e)}"
             logger.error(f"SmartGenie had trouble starting up its brain: {model_status}", exc_info=True)
-            groq_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain = None, None, None, None
+            groq_llm, fallback_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain = None, None, None, None, None
             
     if settings.enable_web_search:
         try:
@@ -584,67 +1369,312 @@ async def startup_event():
     else:
         ddg_search = None
         logger.info("Web search is turned off for SmartGenie.")
-        
+
+async def initialize_upstreams() -> None:
+    global groq_keep_warm_task, model_status
+    try:
+        if settings.fast_boot:
+            await asyncio.to_thread(build_upstream_clients)
+        else:
+            build_upstream_clients()
+    except Exception as e:  # e.g. an SDK that fails to import; the API stays up and reports not-ready
+        model_status = f"{MODEL_STATUS_ERROR_PREFIX}UPSTREAM_INIT_FAILED: {str(e)}"
+        logger.error(f"SmartGenie could not load its upstream clients: {model_status}", exc_info=True)
+    if model_status == MODEL_STATUS_CONNECTED:
+        # Warm-up runs in the background so a slow or unreachable API never delays startup.
+        groq_keep_warm_task = asyncio.create_task(keep_groq_connections_warm())
+    boot_timings["upstreams_ready_seconds"] = round(time.monotonic() - boot_started_at, 3)
+    logger.info(f"Web search for SmartGenie: {'Enabled and tool ready' if ddg_search else ('Enabled but tool failed' if settings.enable_web_search else 'Disabled')}")
+    logger.info(f"SmartGenie is fully awake! LLM Status: {model_status} ({boot_timings['upstreams_ready_seconds']}s after startup began)")
+
+# --- FastAPI Events ---
+@app.on_event("startup")
+async def startup_event():
+    global http_client, batch_semaphore, ask_admission, knowledge_index, search_decision_model, shared_cache, answer_recorder, upstream_init_task, refresh_ahead_task, boot_started_at
+    boot_started_at = time.monotonic()
+    boot_timings.clear()
+    setup_logging()
+    logger.info("SmartGenie is waking up! Initializing AI and search tools...")
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.http_read_timeout, connect=settings.http_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+    _host_semaphores.clear()
+    batch_semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+    if settings.enable_admission_control:
+        ask_admission = AdmissionController(settings.ask_max_concurrent, settings.ask_max_queue, settings.ask_queue_timeout)
+    logger.info(f"Shared HTTP client ready (connect timeout {settings.http_connect_timeout}s, read timeout {settings.http_read_timeout}s, "
+                f"{settings.http_max_concurrency_per_host} concurrent requests per host)")
+    if settings.enable_knowledge_index:
+        if os.path.exists(settings.knowledge_index_path):
+            try:
+                knowledge_index = KnowledgeIndex(settings.knowledge_index_path)
+                logger.info(f"Local knowledge index loaded: {len(knowledge_index)} answers from {settings.knowledge_index_path}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load local knowledge index {settings.knowledge_index_path}: {e}")
+                knowledge_index = None
+        else:
+            logger.info(f"No local knowledge index at {settings.knowledge_index_path}; every question goes to the LLM.")
+
+    if settings.shared_cache_path:
+        try:
+            shared_cache = SharedCache(settings.shared_cache_path, settings.shared_cache_max_entries)
+            warm_from_shared_cache()
+        except Exception as e:
+            logger.error(f"Shared cache at {settings.shared_cache_path} unavailable; caches stay per-worker: {e}", exc_info=True)
+            shared_cache = None
+    elif worker_count() > 1:
+        logger.warning(f"Running {worker_count()} workers without SHARED_CACHE_PATH; each worker keeps its own cold caches.")
+    if settings.answer_record_path:
+        answer_recorder = JsonlRecordWriter(settings.answer_record_path, settings.answer_record_queue_size)
+        logger.info(f"Recording answers to {settings.answer_record_path}")
+
+    if settings.youtube_video_cache_path and settings.youtube_api_key and settings.enable_youtube_search:
+        try:
+            youtube_video_store = SharedCache(settings.youtube_video_cache_path, settings.youtube_video_cache_max_entries)
+            warmed_videos = youtube_video_cache.attach_store(youtube_video_store, settings.youtube_video_cache_max_entries)
+            youtube_quota.attach_store(youtube_video_store, settings.youtube_daily_quota_units, settings.youtube_quota_reserve_units)
+            logger.info(f"YouTube video cache at {settings.youtube_video_cache_path}: {warmed_videos} records loaded, "
+                        f"{youtube_quota.used()} quota units already spent today")
+        except Exception as e:
+            logger.error(f"YouTube video cache at {settings.youtube_video_cache_path} unavailable; keeping records in memory: {e}", exc_info=True)
+
+    if settings.search_decision_mode != SEARCH_DECISION_HEURISTIC:
+        try:
+            search_decision_model = SearchDecisionModel.load(settings.search_decision_model_path)
+            logger.info(f"Search decision model loaded from {settings.search_decision_model_path} ({settings.search_decision_mode} mode)")
+        except (OSError, ValueError, KeyError) as e:
+            search_decision_model = None
+            logger.error(f"Failed to load search decision model {settings.search_decision_model_path}; using keyword heuristics: {e}")
+
     if settings.enable_youtube_search and not settings.youtube_api_key:
         logger.warning(MODEL_STATUS_YOUTUBE_API_KEY_MISSING + " SmartGenie might not find YouTube videos.")
         
-    logger.info(f"Web search for SmartGenie: {'Enabled and tool ready' if ddg_search else ('Enabled but tool failed' if settings.enable_web_search else 'Disabled')}")
     logger.info(f"YouTube search for SmartGenie: {'Enabled' if settings.enable_youtube_search else 'Disabled'}")
     logger.info(f"YouTube API key for SmartGenie: {'Configured' if settings.youtube_api_key else 'Missing'}")
-    logger.info(f"SmartGenie is fully awake! LLM Status: {model_status}")
+
+    if settings.enable_refresh_ahead and settings.enable_answer_cache:
+        refresh_ahead_task = asyncio.create_task(refresh_scheduler.run())
+        logger.info(f"Refresh-ahead on: up to {refresh_scheduler.budget.rate_per_second * 60:g} refreshes a minute, "
+                    f"{settings.refresh_ahead_before_seconds:g}s before a hot time-sensitive answer expires")
+
+    if settings.fast_boot:
+        upstream_init_task = asyncio.create_task(initialize_upstreams())
+        logger.info("Fast boot: accepting connections while the LLM chains and search tools load.")
+    else:
+        await initialize_upstreams()
+    boot_timings["accepting_connections_seconds"] = round(time.monotonic() - boot_started_at, 3)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global http_client, knowledge_index, shared_cache, answer_recorder, groq_http_client, groq_client, groq_keep_warm_task, upstream_init_task, refresh_ahead_task
+    if upstream_init_task is not None:
+        upstream_init_task.cancel()
+        upstream_init_task = None
+    if groq_keep_warm_task is not None:
+        groq_keep_warm_task.cancel()
+        groq_keep_warm_task = None
+    if refresh_ahead_task is not None:
+        refresh_ahead_task.cancel()
+        refresh_ahead_task = None
+        await refresh_scheduler.stop()
+    if groq_http_client is not None:
+        await groq_http_client.aclose()
+        groq_http_client, groq_client = None, None
+        logger.info("Groq connection pool closed.")
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+        logger.info("Shared HTTP client closed.")
+    if knowledge_index is not None:
+        knowledge_index.close()
+        knowledge_index = None
+    if shared_cache is not None:
+        shared_cache.close()
+        shared_cache = None
+    youtube_quota.detach_store(settings.youtube_daily_quota_units // worker_count(), settings.youtube_quota_reserve_units // worker_count())
+    youtube_video_store = youtube_video_cache.detach_store()
+    if youtube_video_store is not None:
+        youtube_video_store.close()
+    if answer_recorder is not None:
+        await asyncio.to_thread(answer_recorder.stop)
+        answer_recorder = None
+    logger.info("SmartGenie is going to sleep. Bye!")
 
 # --- API Endpoints ---
-@app.post("/ask", response_model=AnswerResponse)
-async def ask_question(request: QuestionRequest):
-    if model_status != MODEL_STATUS_CONNECTED or not groq_llm or not direct_llm_chain or \
-       not search_augmented_llm_chain or not reconciliation_llm_chain:
+def rate_limited_exception(e: RateLimitExceeded) -> HTTPException:
+    return HTTPException(status_code=503, detail=ANSWER_SERVICE_UNAVAILABLE,
+                         headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+async def admit_ask_request() -> bool:
+    """Take an /ask admission slot (queueing up to the deadline); returns whether one must be released."""
+    if ask_admission is None:
+        return False
+    try:
+        await ask_admission.acquire()
+    except RateLimitExceeded as e:
+        logger.warning(f"Shedding /ask request: {e}")
+        raise rate_limited_exception(e)
+    return True
+
+def llm_service_ready() -> bool:
+    return model_status == MODEL_STATUS_CONNECTED and all(
+        chain is not None for chain in [groq_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain]
+    )
+
+def boot_phase() -> str:
+    if upstream_init_task is not None and not upstream_init_task.done():
+        return BOOT_PHASE_STARTING
+    return BOOT_PHASE_READY if llm_service_ready() else BOOT_PHASE_FAILED
+
+async def ensure_llm_service_available() -> None:
+    """Raise 503 unless the chains are usable, first waiting (bounded) for a fast-boot init still running."""
+    if upstream_init_task is not None and not upstream_init_task.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(upstream_init_task), settings.startup_wait_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Still starting up; shedding request.")
+            raise HTTPException(status_code=503, detail=ANSWER_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+    if not llm_service_ready():
         logger.error(f"LLM service not fully available. Status: {model_status}")
         if model_status == MODEL_STATUS_API_KEY_MISSING:
             raise HTTPException(status_code=503, detail="Service configuration error: Groq API key missing.")
         raise HTTPException(status_code=503, detail=ANSWER_SERVICE_UNAVAILABLE)
 
-    logger.info(f"Someone asked SmartGenie: '{request.question}' (Include YouTube: {request.include_youtube})")
-    current_date_str = get_current_date()
-    final_answer: str = ANSWER_UNKNOWN
-    final_source: str = SOURCE_SYSTEM
-    final_confidence: str = CONFIDENCE_LOW
+# Response field for each URL category, in the order they appear in additional_resources.
+ADDITIONAL_RESOURCE_FIELDS = (
+    ("wikipedia", "wikipedia_articles"), ("academic", "academic_sources"), ("news", "news_articles"),
+    ("government", "government_sources"), ("educational", "educational_resources"), ("general", "web_sources"),
+)
+
+def build_additional_resources(categorized_web_urls: Dict[str, List[str]],
+                               youtube_videos: List[YouTubeVideo]) -> Dict[str, List[str]]:
+    """additional_resources from whatever search found: web URLs by category, then the YouTube video URLs."""
+    additional_res: Dict[str, List[str]] = {}
+    for category, field in ADDITIONAL_RESOURCE_FIELDS:
+        if categorized_web_urls.get(category):
+            additional_res[field] = categorized_web_urls[category]
+    if youtube_videos:
+        additional_res["youtube_videos_urls"] = [video.url for video in youtube_videos]
+    return additional_res
+
+async def answer_question(request: QuestionRequest, emit: Optional[EventEmitter] = None,
+                          deadline: Optional[Deadline] = None) -> AnswerResponse:
+    """The full /ask pipeline; emit, when given, receives staged events for /ask/stream.
+
+    Every stage runs within deadline (ASK_DEADLINE_SECONDS from now if not given). Search and the
+    search-based LLM calls degrade to the direct answer when they run out of time. Everything it logs,
+    including from the search tasks it starts, shares one request ID and sampling decision.
+    """
+    with request_log_scope():
+        return await run_answer_pipeline(request, emit, deadline)
+
+async def run_answer_pipeline(request: QuestionRequest, emit: Optional[EventEmitter],
+                              deadline: Optional[Deadline]) -> AnswerResponse:
+    await ensure_llm_service_available()
+    deadline = deadline or Deadline(settings.ask_deadline_seconds)
+    request_logger.info("Someone asked SmartGenie: '%s' (Include YouTube: %s)", request.question, request.include_youtube)
+    stage_start = time.perf_counter()
+    classify_question(request.question)  # later checks in this request hit the memo
+    STAGE_LATENCY.observe(time.perf_counter() - stage_start, STAGE_STALENESS_CHECK)
+    if settings.enable_refresh_ahead and is_question_potentially_stale(request.question):
+        refresh_scheduler.record_hit(request.question, bool(request.include_youtube))
+    speculative_search_task: Optional[asyncio.Task] = None
+    try:
+        cached_response = get_cached_answer(request)
+        if cached_response is not None:
+            ASK_PATHS.inc(ASK_PATH_ANSWER_CACHE)
+            cached_response._reusable = True
+            return cached_response
+        local_response = get_local_answer(request)
+        if local_response is not None:
+            ASK_PATHS.inc(ASK_PATH_LOCAL_KNOWLEDGE)
+            ANSWER_PATHS.inc(local_response.source, local_response.confidence)
+            local_response._reusable = True
+            return local_response
+
+        current_date_str = get_current_date()
+        final_answer: str = ANSWER_UNKNOWN
+        final_source: str = SOURCE_SYSTEM
+        final_confidence: str = CONFIDENCE_LOW
     
-    # These will be determined by what perform_search returns and subsequent logic
-    search_was_performed_flag: bool = False 
-    youtube_search_was_performed_flag: bool = False
+        # These will be determined by what perform_search returns and subsequent logic
+        search_was_performed_flag: bool = False 
+        youtube_search_was_performed_flag: bool = False
     
-    search_queries: List[str] = []
-    # categorized_web_urls will hold URLs from web search (DDG + Suggested)
-    categorized_web_urls: Dict[str, List[str]] = {} 
-    youtube_videos_results: List[YouTubeVideo] = []
+        search_queries: List[str] = []
+        # categorized_web_urls will hold URLs from web search (DDG + Suggested)
+        categorized_web_urls: Dict[str, List[str]] = {} 
+        youtube_videos_results: List[YouTubeVideo] = []
+        stages_overlapped: List[str] = []
+        degraded = False
+
+        search_expected, include_youtube = decide_search(request.question, request.include_youtube)
+        explored = not search_expected and random.random() < settings.search_decision_explore_rate
+        if explored:
+            request_logger.info("Searching outside the search decision to collect a training label.")
+            search_expected = True
+        decision_labels: Dict[str, Optional[bool]] = {HEAD_SEARCH: None, HEAD_YOUTUBE: None}
+
+        # Web search is only possible with the DDG tool ready; YouTube needs the flag, the toggle and a key.
+        web_search_possible = settings.enable_web_search and ddg_search
+        youtube_search_possible = include_youtube and settings.enable_youtube_search and settings.youtube_api_key
+        any_search_actually_possible = web_search_possible or youtube_search_possible
+        # Search-first needs web search: YouTube descriptions alone rarely answer a time-sensitive question.
+        search_first = bool(web_search_possible) and search_expected and is_search_certain(request.question)
+        ask_path = ASK_PATH_DIRECT
+
+        if not search_first and any_search_actually_possible and should_speculate_search(request.question, include_youtube, search_expected):
+            request_logger.info("Search looks likely for this question; starting it alongside the direct answer.")
+            speculative_search_task = asyncio.create_task(
+                perform_search(request.question, include_youtube_flag=include_youtube, deadline=deadline)
+            )
+            if emit:
+                emit(EVENT_SEARCH_STARTED, {"speculative": True, "web": bool(web_search_possible), "youtube": bool(youtube_search_possible)})
 
-    try:
-        logger.info("SmartGenie is thinking (direct answer attempt)...")
         context_direct = {"current_date": current_date_str, "question": request.question}
-        raw_direct_response = await direct_llm_chain.arun(context_direct)
-        logger.info(f"SmartGenie's first thought (raw): '{raw_direct_response[:200]}...'")
-        cleaned_direct_answer = clean_response(raw_direct_response, is_from_search=False)
-        logger.info(f"SmartGenie's cleaned direct answer: '{cleaned_direct_answer[:200]}...'")
+        if search_first:
+            # Treated exactly like an unknown direct answer: search, then the augmented chain.
+            request_logger.info("Search is certain for this question; skipping the direct answer.")
+            cleaned_direct_answer = ANSWER_UNKNOWN
+            ask_path = ASK_PATH_SEARCH_FIRST
+        else:
+            llm_logger.info("SmartGenie is thinking (direct answer attempt)...")
+            raw_direct_response = await run_llm_chain(direct_llm_chain, context_direct, STAGE_DIRECT_ANSWER, emit,
+                                                      token_event=EVENT_DIRECT_TOKEN, deadline=deadline)
+            payload_logger.info("SmartGenie's first thought (raw)", extra={"payload": raw_direct_response})
+            cleaned_direct_answer = clean_response(raw_direct_response, is_from_search=False)
+            payload_logger.info("SmartGenie's cleaned direct answer", extra={"payload": cleaned_direct_answer})
 
         is_direct_answer_unknown = cleaned_direct_answer == ANSWER_UNKNOWN
         
         search_needed_for_unknown = is_direct_answer_unknown
-        search_needed_for_staleness_check = not is_direct_answer_unknown and is_question_potentially_stale(request.question)
+        search_needed_for_staleness_check = not is_direct_answer_unknown and search_expected
         
         should_trigger_search_logic = search_needed_for_unknown or search_needed_for_staleness_check
         
-        # Check if any search type is actually enabled and configured
-        web_search_possible = settings.enable_web_search and ddg_search # ddg_search implies tool is ready
-        youtube_search_possible = request.include_youtube and settings.enable_youtube_search and settings.youtube_api_key
-        any_search_actually_possible = web_search_possible or youtube_search_possible
-        
         if should_trigger_search_logic and any_search_actually_possible:
-            logger.info(f"Search logic triggered. Reason - Direct unknown: {search_needed_for_unknown}, Potentially stale: {search_needed_for_staleness_check}. Web possible: {web_search_possible}, YT possible: {youtube_search_possible}")
+            if not search_first:
+                ask_path = ASK_PATH_DIRECT_THEN_SEARCH
+            request_logger.info("Search logic triggered. Reason - Direct unknown: %s, Potentially stale: %s. Web possible: %s, YT possible: %s",
+                                search_needed_for_unknown, search_needed_for_staleness_check, bool(web_search_possible), bool(youtube_search_possible))
             
             # perform_search now returns all web URLs in its 3rd output
-            search_context_str, queries_from_search, web_urls_from_search, yt_videos_from_search = await perform_search(
-                request.question, include_youtube_flag=request.include_youtube
-            )
+            if speculative_search_task is not None:
+                request_logger.info("Using speculative search started alongside the direct answer.")
+                search_context_str, queries_from_search, web_urls_from_search, yt_videos_from_search = await speculative_search_task
+                speculative_search_task = None
+                stages_overlapped = [STAGE_DIRECT_ANSWER, STAGE_SEARCH]
+            else:
+                if emit:
+                    emit(EVENT_SEARCH_STARTED, {"speculative": False, "web": bool(web_search_possible), "youtube": bool(youtube_search_possible)})
+                search_context_str, queries_from_search, web_urls_from_search, yt_videos_from_search = await perform_search(
+                    request.question, include_youtube_flag=include_youtube, deadline=deadline
+                )
             
             search_queries.extend(queries_from_search) # Update with actual queries made
             categorized_web_urls = web_urls_from_search # This is the final list of web URLs
@@ -658,32 +1688,52 @@ async def ask_question(request: QuestionRequest):
 
             search_was_performed_flag = web_search_effectively_performed or youtube_search_effectively_performed
             youtube_search_was_performed_flag = youtube_search_effectively_performed # Specifically for YT videos list
+            if emit:
+                emit(EVENT_SEARCH_SOURCES, {
+                    "queries": search_queries, "source_urls": flatten_categorized_urls(categorized_web_urls),
+                    "youtube_videos": [video.url for video in youtube_videos_results],
+                })
 
             if search_context_str.strip(): # If search_context_str (text for LLM) has actual content
                 if search_needed_for_staleness_check and reconciliation_llm_chain:
-                    logger.info("Reconciling potentially stale direct answer with new search results...")
+                    llm_logger.info("Reconciling potentially stale direct answer with new search results...")
                     # ... (reconciliation logic as before)
                     context_reconcile = {"current_date": current_date_str, "question": request.question, "initial_answer": cleaned_direct_answer, "search_results": search_context_str}
-                    raw_reconciled_response = await reconciliation_llm_chain.arun(context_reconcile)
-                    final_answer = clean_response(raw_reconciled_response, is_from_search=True)
-                    logger.info(f"LLM Reconciled Cleaned: '{final_answer[:200]}...'")
-                    final_source = SOURCE_GROQ_AI_RECONCILED if final_answer != ANSWER_UNKNOWN else SOURCE_GROQ_AI_WITH_SEARCH
-                    final_confidence = CONFIDENCE_HIGH if final_answer != ANSWER_UNKNOWN else CONFIDENCE_LOW
+                    try:
+                        raw_reconciled_response = await run_llm_chain(reconciliation_llm_chain, context_reconcile, STAGE_RECONCILE, emit,
+                                                                      deadline=deadline)
+                    except DeadlineExceeded:
+                        logger.warning("Reconciliation ran out of time; answering with the unverified direct answer.")
+                        degraded = True
+                        final_answer, final_source, final_confidence = cleaned_direct_answer, SOURCE_GROQ_AI_DIRECT, CONFIDENCE_MEDIUM
+                    else:
+                        final_answer = clean_response(raw_reconciled_response, is_from_search=True)
+                        payload_logger.info("LLM Reconciled Cleaned", extra={"payload": final_answer})
+                        final_source = SOURCE_GROQ_AI_RECONCILED if final_answer != ANSWER_UNKNOWN else SOURCE_GROQ_AI_WITH_SEARCH
+                        final_confidence = CONFIDENCE_HIGH if final_answer != ANSWER_UNKNOWN else CONFIDENCE_LOW
+                        decision_labels[HEAD_SEARCH] = final_answer != ANSWER_UNKNOWN and \
+                            search_changed_answer(cleaned_direct_answer, final_answer, search_context_str)
 
                 elif search_needed_for_unknown and search_augmented_llm_chain:
-                    logger.info("Direct answer was 'Unknown'. Augmenting with search results...")
+                    llm_logger.info("Direct answer was 'Unknown'. Augmenting with search results...")
                     # ... (augmentation logic as before)
                     context_augmented = {"current_date": current_date_str, "question": request.question, "search_results": search_context_str}
-                    raw_augmented_response = await search_augmented_llm_chain.arun(context_augmented)
+                    try:
+                        raw_augmented_response = await run_llm_chain(search_augmented_llm_chain, context_augmented, STAGE_AUGMENT, emit,
+                                                                     deadline=deadline)
+                    except DeadlineExceeded:
+                        logger.warning("Augmentation ran out of time; no answer from search.")
+                        degraded = True
+                        raw_augmented_response = ANSWER_UNKNOWN
                     final_answer = clean_response(raw_augmented_response, is_from_search=True)
-                    logger.info(f"LLM Augmented Cleaned: '{final_answer[:200]}...'")
+                    payload_logger.info("LLM Augmented Cleaned", extra={"payload": final_answer})
                     # Determine source based on what contributed
                     if final_answer != ANSWER_UNKNOWN:
                         # Refined source determination logic
                         web_contributed_to_answer = web_search_effectively_performed and \
                                                     ("Web Search Results" in search_context_str or "Suggested Web Resources" in search_context_str)
                         youtube_contributed_to_answer = youtube_search_effectively_performed and \
-                                                        "Cool YouTube Videos Found" in search_context_str
+                                                        YOUTUBE_RESULTS_HEADER in search_context_str
 
                         if web_contributed_to_answer and youtube_contributed_to_answer:
                             final_source = SOURCE_GROQ_AI_WITH_MIXED_SEARCH
@@ -702,9 +1752,15 @@ async def ask_question(request: QuestionRequest):
                     final_answer = cleaned_direct_answer if not is_direct_answer_unknown else ANSWER_UNKNOWN
                     final_source = SOURCE_GROQ_AI_DIRECT if not is_direct_answer_unknown else SOURCE_SYSTEM
                     final_confidence = CONFIDENCE_HIGH if final_answer != ANSWER_UNKNOWN else CONFIDENCE_LOW
+
+                if youtube_videos_results:
+                    decision_labels[HEAD_YOUTUBE] = youtube_contributed(
+                        final_answer, [video.title for video in youtube_videos_results],
+                        [video.channel for video in youtube_videos_results],
+                    )
             
             else: # Search operation was triggered, but perform_search returned no text_context for LLM
-                logger.info("Search logic triggered, but perform_search yielded no usable text context for LLM. Using direct answer if available.")
+                request_logger.info("Search logic triggered, but perform_search yielded no usable text context for LLM. Using direct answer if available.")
                 final_answer = cleaned_direct_answer if not is_direct_answer_unknown else ANSWER_UNKNOWN
                 final_source = SOURCE_GROQ_AI_DIRECT if not is_direct_answer_unknown else SOURCE_SYSTEM
                 final_confidence = CONFIDENCE_HIGH if final_answer != ANSWER_UNKNOWN else CONFIDENCE_LOW
@@ -712,7 +1768,12 @@ async def ask_question(request: QuestionRequest):
                 # This means the AnswerResponse.search_performed can be true, but LLM didn't use search context.
         
         else: # No search logic triggered OR no search actually possible
-            logger.info(f"No search logic triggered or no search possible. Using direct answer. Trigger: {should_trigger_search_logic}, Possible: {any_search_actually_possible}")
+            request_logger.info("No search logic triggered or no search possible. Using direct answer. Trigger: %s, Possible: %s",
+                                should_trigger_search_logic, bool(any_search_actually_possible))
+            if speculative_search_task is not None:
+                request_logger.info("Direct answer was sufficient; cancelling speculative search.")
+                await cancel_speculative_task(speculative_search_task)
+                speculative_search_task = None
             final_answer = cleaned_direct_answer
             final_source = SOURCE_GROQ_AI_DIRECT
             final_confidence = CONFIDENCE_HIGH if not is_direct_answer_unknown else CONFIDENCE_LOW
@@ -723,30 +1784,28 @@ async def ask_question(request: QuestionRequest):
             categorized_web_urls = {}
             youtube_videos_results = []
 
-        # Build additional_resources from whatever was found
-        additional_res: Dict[str, List[str]] = {}
-        if categorized_web_urls: # Populated by perform_search -> perform_enhanced_web_search
-            if 'wikipedia' in categorized_web_urls and categorized_web_urls['wikipedia']:
-                additional_res["wikipedia_articles"] = list(set(categorized_web_urls['wikipedia']))
-            if 'academic' in categorized_web_urls and categorized_web_urls['academic']:
-                additional_res["academic_sources"] = list(set(categorized_web_urls['academic']))
-            if 'news' in categorized_web_urls and categorized_web_urls['news']:
-                additional_res["news_articles"] = list(set(categorized_web_urls['news']))
-            if 'government' in categorized_web_urls and categorized_web_urls['government']:
-                additional_res["government_sources"] = list(set(categorized_web_urls['government']))
-            if 'educational' in categorized_web_urls and categorized_web_urls['educational']:
-                additional_res["educational_resources"] = list(set(categorized_web_urls['educational']))
-            if 'general' in categorized_web_urls and categorized_web_urls['general']:
-                additional_res["web_sources"] = list(set(categorized_web_urls['general']))
-        
-        if youtube_videos_results: # Populated by perform_search -> search_youtube
-            additional_res["youtube_videos_urls"] = [video.url for video in youtube_videos_results]
+        if search_first and final_answer == ANSWER_UNKNOWN and settings.search_first_fallback_to_direct and not deadline.expired():
+            request_logger.info("Search-first path produced no answer; falling back to the direct answer.")
+            ask_path = ASK_PATH_SEARCH_FIRST_FALLBACK
+            try:
+                raw_direct_response = await run_llm_chain(direct_llm_chain, context_direct, STAGE_DIRECT_ANSWER, emit,
+                                                          token_event=EVENT_DIRECT_TOKEN, deadline=deadline)
+            except DeadlineExceeded:
+                logger.warning("Search-first fallback ran out of time.")
+                degraded = True
+                raw_direct_response = ANSWER_UNKNOWN
+            final_answer = clean_response(raw_direct_response, is_from_search=False)
+            if final_answer != ANSWER_UNKNOWN:
+                final_source = SOURCE_GROQ_AI_DIRECT
+                final_confidence = CONFIDENCE_MEDIUM
+
+        additional_res = build_additional_resources(categorized_web_urls, youtube_videos_results)
         
-        legacy_web_urls = get_legacy_urls_list(categorized_web_urls) if categorized_web_urls else []
+        legacy_web_urls = flatten_categorized_urls(categorized_web_urls) if categorized_web_urls else []
         
         # Override source if final answer is UNKNOWN despite search attempts.
         if final_answer == ANSWER_UNKNOWN and search_was_performed_flag:
-            logger.info(f"Final answer is UNKNOWN despite search attempt(s). Question: '{request.question}'")
+            request_logger.info("Final answer is UNKNOWN despite search attempt(s). Question: '%s'", request.question)
             # Determine a more accurate source based on what was attempted
             if web_search_effectively_performed and youtube_search_effectively_performed:
                 final_source = SOURCE_GROQ_AI_WITH_MIXED_SEARCH
@@ -758,25 +1817,329 @@ async def ask_question(request: QuestionRequest):
             # in which case source would be system or direct.
             final_confidence = CONFIDENCE_LOW # Already set but good to be explicit
 
-        return AnswerResponse(
+        response = AnswerResponse(
             answer=final_answer, source=final_source, confidence=final_confidence,
             search_performed=search_was_performed_flag, # Overall search attempt
             youtube_search_performed=youtube_search_was_performed_flag, # Specifically if YT videos are in response
             search_queries_used=search_queries if search_queries else None,
             source_urls=legacy_web_urls if legacy_web_urls else None,
             youtube_videos=youtube_videos_results if youtube_videos_results else None,
-            additional_resources=additional_res if additional_res else None
+            additional_resources=additional_res if additional_res else None,
+            stages_overlapped=stages_overlapped if stages_overlapped else None
         )
+        ASK_PATHS.inc(ask_path)
+        ANSWER_PATHS.inc(final_source, final_confidence)
+        if not degraded:  # a deadline-cut answer should not be served again from cache
+            store_cached_answer(request, response)
+        record_answer(request, response, decision_labels)
+        return response
     except HTTPException: raise
+    except DeadlineExceeded as e:
+        logger.warning(f"/ask deadline of {settings.ask_deadline_seconds}s exceeded during {e.stage}.")
+        raise HTTPException(status_code=504, detail=ANSWER_DEADLINE_EXCEEDED)
+    except RateLimitExceeded as e:
+        logger.warning(f"Upstream capacity exhausted while answering: {e}")
+        raise rate_limited_exception(e)
     except Exception as e:
         logger.error(f"Unexpected error during /ask endpoint processing: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=ANSWER_PROCESSING_ERROR)
+    finally:
+        await cancel_speculative_task(speculative_search_task)
+
+async def refresh_stale_answer(entry: RefreshEntry) -> str:
+    """Recompute a hot time-sensitive answer ahead of expiry and cache it: search, then reconcile the cached answer.
+
+    This is the search-and-reconcile half of the /ask pipeline. Refreshes give way to user traffic: they
+    are skipped while the Groq bucket has no spare token. The cached web results for the question are
+    dropped first, since they may be as old as the answer; YouTube results are kept, as a YouTube search
+    costs 100 quota units and video lists do not date the way news does.
+    """
+    web_search_possible = settings.enable_web_search and ddg_search
+    if not llm_service_ready() or not web_search_possible or not entry.answer:
+        return REFRESH_SKIPPED
+    if groq_rate_limiter.stats()["available_tokens"] < 1:
+        return REFRESH_SKIPPED
+    invalidate_search_result(SEARCH_SOURCE_WEB, entry.question)
+    deadline = Deadline(settings.ask_deadline_seconds)
+    try:
+        search_context_str, search_queries, categorized_web_urls, youtube_videos_results = await perform_search(
+            entry.question, include_youtube_flag=entry.include_youtube, deadline=deadline
+        )
+        if not search_context_str.strip():
+            request_logger.info("Refresh-ahead found no search results for %r; keeping the cached answer.", entry.question)
+            return REFRESH_FAILED
+        context_reconcile = {"current_date": get_current_date(), "question": entry.question,
+                             "initial_answer": entry.answer, "search_results": search_context_str}
+        raw_reconciled_response = await run_llm_chain(reconciliation_llm_chain, context_reconcile, STAGE_RECONCILE,
+                                                      deadline=deadline)
+    except (DeadlineExceeded, RateLimitExceeded) as e:
+        logger.warning(f"Refresh-ahead of '{entry.question}' gave up: {e}")
+        return REFRESH_FAILED
+    final_answer = clean_response(raw_reconciled_response, is_from_search=True)
+    if final_answer == ANSWER_UNKNOWN:
+        return REFRESH_FAILED
+    source_urls = flatten_categorized_urls(categorized_web_urls) if categorized_web_urls else []
+    additional_res = build_additional_resources(categorized_web_urls, youtube_videos_results)
+    response = AnswerResponse(
+        answer=final_answer, source=SOURCE_GROQ_AI_RECONCILED, confidence=CONFIDENCE_HIGH,
+        search_performed=True, youtube_search_performed=bool(youtube_videos_results),
+        search_queries_used=search_queries or None, source_urls=source_urls or None,
+        youtube_videos=youtube_videos_results or None, additional_resources=additional_res or None,
+    )
+    store_cached_answer(QuestionRequest(question=entry.question, include_youtube=entry.include_youtube), response)
+    request_logger.info("Refresh-ahead updated the cached answer for %r", entry.question)
+    return REFRESH_REFRESHED
+
+def response_mode(compact: bool, mode_header: Optional[str]) -> str:
+    """compact=true or an X-Response-Mode: compact header selects the compact body."""
+    if compact or (mode_header or "").strip().lower() == RESPONSE_MODE_COMPACT:
+        return RESPONSE_MODE_COMPACT
+    return RESPONSE_MODE_FULL
+
+def encode_answer_body(response: AnswerResponse, mode: str) -> bytes:
+    if mode == RESPONSE_MODE_COMPACT:
+        return dumps(compact_answer_payload(response.model_dump(exclude_none=True)))
+    return response.model_dump_json().encode("utf-8")
+
+def json_body_response(body: bytes, http_request: Request, endpoint: str, mode: str, reused: bool = False,
+                       headers: Optional[Dict[str, str]] = None) -> Response:
+    """Send an encoded JSON body, compressed in the client's preferred coding once it is big enough.
+
+    Bodies of reused answers are compressed once per coding and served from memory afterwards.
+    """
+    headers = dict(headers or {}, Vary=f"Accept-Encoding, {RESPONSE_MODE_HEADER}")
+    encoding = ENCODING_IDENTITY
+    if settings.enable_response_compression and len(body) >= settings.response_compression_min_bytes:
+        encoding = negotiate_encoding(http_request.headers.get("accept-encoding"))
+    sent = body
+    if encoding != ENCODING_IDENTITY:
+        sent = (compress_reused if reused else compress)(body, encoding, settings.response_gzip_level, settings.response_brotli_quality)
+        headers["Content-Encoding"] = encoding
+    RESPONSE_BYTES.inc("encoded", amount=len(body))
+    RESPONSE_BYTES.inc("sent", amount=len(sent))
+    ANSWER_RESPONSES.inc(endpoint, mode, encoding, "200")
+    return Response(sent, media_type="application/json", headers=headers)
+
+def answer_http_response(response: AnswerResponse, http_request: Request, mode: str) -> Response:
+    """Render /ask directly, skipping FastAPI's response-model re-validation and jsonable_encoder.
+
+    Reusable answers (cache and local-index hits, and answers just stored in the cache) carry an
+    ETag, and a matching If-None-Match gets an empty 304.
+    """
+    body = encode_answer_body(response, mode)
+    headers = {}
+    if response._reusable:
+        headers["ETag"] = make_etag(body)
+        if etag_matches(http_request.headers.get("if-none-match"), headers["ETag"]):
+            ANSWER_RESPONSES.inc("ask", mode, ENCODING_IDENTITY, "304")
+            return Response(status_code=304, headers=dict(headers, Vary=f"Accept-Encoding, {RESPONSE_MODE_HEADER}"))
+    return json_body_response(body, http_request, "ask", mode, reused=response._reusable, headers=headers)
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask", response_model=AnswerResponse)
+async def ask_question(request: QuestionRequest, http_request: Request, compact: bool = False,
+                       mode_header: Optional[str] = Header(None, alias=RESPONSE_MODE_HEADER)):
+    """Answer one question. compact=true (or X-Response-Mode: compact) drops nulls and the repeated URL lists."""
+    await ensure_llm_service_available()
+    # The deadline starts before admission, so time spent queued counts against the request's budget.
+    deadline = Deadline(settings.ask_deadline_seconds)
+    admitted = await admit_ask_request()
+    request_start = time.perf_counter()
+    try:
+        response = await answer_question(request, deadline=deadline)
+        return answer_http_response(response, http_request, response_mode(compact, mode_header))
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - request_start, "ask")
+        if admitted:
+            ask_admission.release()
+
+async def answer_batch_question(request: QuestionRequest, indexes: List[int]) -> List[BatchAnswerItem]:
+    """Answer one unique batch question and fan the result out to every index that asked it."""
+    response, error = None, None
+    async with batch_semaphore:
+        try:
+            response = await answer_question(request)
+        except HTTPException as e:
+            error = BatchItemError(status_code=e.status_code, detail=str(e.detail))
+        except Exception as e:  # one bad item must not fail the whole batch
+            logger.error(f"Unexpected error answering batch question '{request.question}': {e}", exc_info=True)
+            error = BatchItemError(status_code=500, detail=ANSWER_PROCESSING_ERROR)
+    return [BatchAnswerItem(index=index, response=response, error=error) for index in indexes]
+
+@app.post("/ask/batch", response_model=BatchAnswerResponse)
+async def ask_question_batch(requests: List[QuestionRequest], http_request: Request, stream: bool = False,
+                             compact: bool = False, mode_header: Optional[str] = Header(None, alias=RESPONSE_MODE_HEADER)):
+    """Run many questions through the /ask pipeline with bounded concurrency.
+
+    Identical questions (after normalization) are answered once. Errors are reported per item. With
+    stream=true results are sent as NDJSON lines in completion order, each tagged with its index.
+    Otherwise the body is compressed like /ask, and compact mode applies to every answer.
+    """
+    await ensure_llm_service_available()
+    if len(requests) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {settings.batch_max_items} questions per request.")
+
+    indexes_by_key: Dict[tuple, List[int]] = {}
+    unique_requests: Dict[tuple, QuestionRequest] = {}
+    for index, item in enumerate(requests):
+        key = (normalize_text(item.question), bool(item.include_youtube))
+        unique_requests.setdefault(key, item)
+        indexes_by_key.setdefault(key, []).append(index)
+    request_logger.info("Batch of %d questions (%d unique) received.", len(requests), len(unique_requests))
+
+    batch_start = time.perf_counter()
+    tasks = [asyncio.create_task(answer_batch_question(item, indexes_by_key[key])) for key, item in unique_requests.items()]
+
+    if stream:
+        async def ndjson_stream() -> AsyncIterator[str]:
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    for batch_item in await finished:
+                        yield batch_item.model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+                REQUEST_LATENCY.observe(time.perf_counter() - batch_start, "ask_batch")
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+    try:
+        fanned_out_items = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        REQUEST_LATENCY.observe(time.perf_counter() - batch_start, "ask_batch")
+    results = sorted((batch_item for items in fanned_out_items for batch_item in items), key=lambda batch_item: batch_item.index)
+    batch_response = BatchAnswerResponse(results=results, unique_questions=len(unique_requests))
+    mode = response_mode(compact, mode_header)
+    if mode == RESPONSE_MODE_COMPACT:
+        payload = batch_response.model_dump(exclude_none=True)
+        for item in payload["results"]:
+            if "response" in item:
+                compact_answer_payload(item["response"])
+        body = dumps(payload)
+    else:
+        body = batch_response.model_dump_json().encode("utf-8")
+    return json_body_response(body, http_request, "ask_batch", mode)
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """Server-Sent Events variant of /ask: staged events as they happen, then a final AnswerResponse."""
+    await ensure_llm_service_available()
+    admitted = await admit_ask_request()
+    events: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    def release_admission() -> None:
+        # Called from the stream's cleanup and again as a background task, in case the client
+        # disconnected before the stream body ever started.
+        nonlocal admitted
+        if admitted:
+            admitted = False
+            ask_admission.release()
+
+    def emit(event: str, data: Dict[str, Any]) -> None:
+        events.put_nowait(format_sse_event(event, data))
+
+    async def run_pipeline() -> None:
+        request_start = time.perf_counter()
+        try:
+            response = await answer_question(request, emit=emit)
+            REQUEST_LATENCY.observe(time.perf_counter() - request_start, "ask_stream")
+            emit(EVENT_FINAL, response.model_dump())
+        except HTTPException as e:
+            emit(EVENT_ERROR, {"status_code": e.status_code, "detail": e.detail,
+                               "retry_after": (e.headers or {}).get("Retry-After")})
+        finally:
+            events.put_nowait(None)
+
+    async def event_stream() -> AsyncIterator[str]:
+        pipeline_task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Client disconnected mid-stream: stop spending upstream calls on it.
+            if not pipeline_task.done():
+                pipeline_task.cancel()
+            release_admission()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(release_admission))
+
+def collect_cache_metrics() -> List[str]:
+    answer_stats = answer_cache.stats()
+    search_stats = search_cache.stats()
+    return render_gauge_family(
+        "smartgenie_search_cache_events_total", "Search cache hits, misses, coalesced waits and upstream calls.",
+        "counter", ["event"], {(event,): search_stats[event] for event in ("hits", "misses", "coalesced", "upstream_calls")},
+    ) + render_gauge_family(
+        "smartgenie_cache_entries", "Entries currently held per cache.", "gauge", ["cache"],
+        {("answer",): answer_stats["entries"], ("search",): search_stats["entries"]},
+    )
+
+metrics_registry.add_collector(collect_cache_metrics)
+
+def collect_groq_pool_metrics() -> List[str]:
+    pool_stats = connection_pool_stats(groq_http_client)
+    return render_gauge_family(
+        "smartgenie_groq_pool_connections", "Groq connection pool connections by state.", "gauge", ["state"],
+        {(state,): pool_stats[state] for state in ("idle", "active", "waiting")},
+    )
+
+metrics_registry.add_collector(collect_groq_pool_metrics)
+
+def collect_youtube_quota_metrics() -> List[str]:
+    return render_gauge_family(
+        "smartgenie_youtube_quota_remaining_units", "YouTube Data API quota units left today (node-wide with a video store).", "gauge", [],
+        {(): youtube_quota.remaining()},
+    )
+
+metrics_registry.add_collector(collect_youtube_quota_metrics)
+
+def collect_refresh_ahead_metrics() -> List[str]:
+    refresh_stats = refresh_scheduler.stats()
+    return render_gauge_family(
+        "smartgenie_refresh_ahead_runs_total", "Refresh-ahead runs of hot time-sensitive answers by outcome.", "counter",
+        ["outcome"], {(outcome,): count for outcome, count in refresh_stats["outcomes"].items()},
+    ) + render_gauge_family(
+        "smartgenie_refresh_ahead_queue_depth", "Hot time-sensitive questions due for a refresh and not yet started.", "gauge", [],
+        {(): refresh_stats["queue_depth"]},
+    ) + render_gauge_family(
+        "smartgenie_refresh_ahead_lag_seconds", "Refresh-ahead lag behind the due time: longest wait in the queue, last and worst started refresh.",
+        "gauge", ["kind"], {("queue",): refresh_stats["queue_lag_seconds"], ("last",): refresh_stats["last_lag_seconds"],
+                            ("max",): refresh_stats["max_lag_seconds"]},
+    ) + render_gauge_family(
+        "smartgenie_refresh_ahead_budget_used_ratio", "Refreshes started over the last minute as a fraction of the per-minute budget.",
+        "gauge", [], {(): refresh_stats["budget_used"]},
+    )
+
+metrics_registry.add_collector(collect_refresh_ahead_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of stage latencies, answer paths and cache/search outcomes."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: the process is serving requests. Never depends on upstreams."""
+    return {"status": "alive", "uptime_seconds": round(time.monotonic() - boot_started_at, 3) if boot_started_at else 0.0}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: the LLM chains are built and /ask can be answered. 503 while starting or if init failed."""
+    phase = boot_phase()
+    body = {"status": phase, "llm_service": model_status, **boot_timings}
+    return JSONResponse(body, status_code=200 if phase == BOOT_PHASE_READY else 503)
 
 @app.get("/health")
 async def health_check():
-    is_llm_healthy = model_status == MODEL_STATUS_CONNECTED and all(
-        chain is not None for chain in [groq_llm, direct_llm_chain, search_augmented_llm_chain, reconciliation_llm_chain]
-    )
+    is_llm_healthy = llm_service_ready()
     
     web_search_status_detail = "disabled_by_configuration"
     if settings.enable_web_search:
@@ -797,13 +2160,54 @@ async def health_check():
 
     return {
         "status": overall_status, "timestamp": datetime.utcnow().isoformat(),
-        "llm_service": {"status": model_status, "model_name": settings.model_name if is_llm_healthy else None},
+        "readiness": {"live": True, "ready": boot_phase() == BOOT_PHASE_READY, "phase": boot_phase(),
+                      "fast_boot": settings.fast_boot, **boot_timings},
+        "llm_service": {"status": model_status, "model_name": settings.model_name if is_llm_healthy else None,
+                        "fallback_model_name": fallback_llm.model_name if fallback_llm else None},
+        "deadlines": {
+            "ask_deadline_seconds": settings.ask_deadline_seconds, "hedging_enabled": settings.enable_llm_hedging,
+            "hedge_delay_seconds": {stage: round(hedge_delay(stage), 3) for stage in (STAGE_DIRECT_ANSWER, STAGE_RECONCILE, STAGE_AUGMENT)},
+            "hedges": {f"{stage}_{winner}": LLM_HEDGES.value(stage, winner)
+                       for stage in (STAGE_DIRECT_ANSWER, STAGE_RECONCILE, STAGE_AUGMENT) for winner in ("primary", "hedge")},
+        },
+        "groq_pool": {
+            **connection_pool_stats(groq_http_client),
+            "max_connections": settings.groq_max_connections,
+            "warmups": {f"{trigger}_{outcome}": GROQ_WARMUPS.value(trigger, outcome)
+                        for trigger in ("startup", "timer") for outcome in ("ok", "error")},
+        },
         "web_search_service": {"configured_enabled": settings.enable_web_search, "tool_status": web_search_status_detail},
         "youtube_search_service": {"configured_enabled": settings.enable_youtube_search, 
-                                   "api_key_configured": bool(settings.youtube_api_key), "status": youtube_search_status_detail}
+                                   "api_key_configured": bool(settings.youtube_api_key), "status": youtube_search_status_detail},
+        "answer_cache": {"enabled": settings.enable_answer_cache, **answer_cache.stats()},
+        "search_cache": {"enabled": settings.enable_search_cache, **search_cache.stats()},
+        "shared_cache": shared_cache.stats() if shared_cache else {"enabled": False},
+        "answer_record": answer_recorder.stats() if answer_recorder else {"enabled": False},
+        "worker": {"pid": os.getpid(), "configured_workers": worker_count()},
+        "rate_limits": {limiter.name: limiter.stats() for limiter in (groq_rate_limiter, ddg_rate_limiter, youtube_rate_limiter)},
+        "admission": ask_admission.stats() if ask_admission else {"enabled": False},
+        "knowledge_index": {"enabled": settings.enable_knowledge_index, "loaded": knowledge_index is not None,
+                            **(knowledge_index.stats() if knowledge_index else {})},
+        "youtube": {"quota": youtube_quota.stats(), "video_cache": youtube_video_cache.stats()},
+        "refresh_ahead": {"enabled": settings.enable_refresh_ahead and settings.enable_answer_cache, **refresh_scheduler.stats()},
+        "logging": {"async": True, "format": settings.log_format, **log_handler.stats()} if log_handler is not None else {"async": False},
+        "url_engine": {"suggested_url_phrases": len(SUGGESTED_URL_INDEX),
+                       "host_classification_cache": classify_host.cache_info()._asdict()},
+        "search_decision": {
+            "mode": settings.search_decision_mode if search_decision_model else SEARCH_DECISION_HEURISTIC,
+            "model_loaded": search_decision_model is not None,
+            "shadow_calls": {f"{call}_{effect}": SEARCH_DECISION_SHADOW_CALLS.value(call, effect)
+                             for call in ("llm", "web_search", "youtube_api") for effect in ("saved", "added")},
+        }
     }
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    logger.info(f"Starting Uvicorn server for SmartGenie API on port {port}...")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = worker_count()
+    setup_logging()
+    logger.info(f"Starting Uvicorn server for SmartGenie API on port {port} with {workers} worker(s)...")
+    if workers > 1:
+        # Multiple workers need an import string so each process builds its own app and clients.
+        uvicorn.run("app:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
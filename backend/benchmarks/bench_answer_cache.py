@@ -0,0 +1,78 @@
+"""Microbenchmark: AnswerCache lookup cost for exact, near-duplicate and missing questions.
+
+Before timing, it checks that rephrasings still hit as near-duplicates and that a question differing in
+one content word or number does not ("cold" and "flu" once scored 0.86 and shared an answer). The
+cache holds --entries generated questions. Run from the backend directory:
+
+    python benchmarks/bench_answer_cache.py --entries 10000 [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from caching import AnswerCache  # noqa: E402
+
+LONG_QUESTION = ("can you explain in simple terms how the immune system of a human body fights off a common "
+                 "cold virus infection")
+SAME_QUESTION = [
+    "Can you explain, in simple terms, how the immune system of the human body fights off a common cold virus infection?",
+    "please explain in simple terms how the immune system of a human body fights off a common cold virus infection",
+]
+DIFFERENT_QUESTION = [
+    LONG_QUESTION.replace("cold", "flu"),
+    LONG_QUESTION.replace("human", "dog"),
+    LONG_QUESTION.replace("common", "rare"),
+]
+NUMBERED_QUESTION = ("what was the population of the united kingdom according to the official census taken in 2011",
+                     "what was the population of the united kingdom according to the official census taken in 2021")
+
+
+def check_near_duplicates(threshold: float) -> None:
+    cache = AnswerCache(max_entries=100, max_bytes=0, similarity_threshold=threshold)
+    cache.put(LONG_QUESTION, False, "answer", 60, 0)
+    cache.put(NUMBERED_QUESTION[0], False, "answer", 60, 0)
+    for question in SAME_QUESTION:
+        hit = cache.get(question, False)
+        assert hit is not None and hit[1] == AnswerCache.LEVEL_NEAR_DUPLICATE, question
+    for question in DIFFERENT_QUESTION + [NUMBERED_QUESTION[1]]:
+        assert cache.get(question, False) is None, question
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--threshold", type=float, default=0.85, help="ANSWER_CACHE_SIMILARITY_THRESHOLD")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    check_near_duplicates(args.threshold)
+    rng = random.Random(4)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(2000)]
+    cache = AnswerCache(max_entries=args.entries + 1, max_bytes=0, similarity_threshold=args.threshold)
+    for i in range(args.entries):
+        cache.put(f"what is the {' '.join(rng.sample(words, 6))}", False, "answer", 3600, 0)
+    cache.put(LONG_QUESTION, False, "answer", 3600, 0)
+    cases = {"exact": LONG_QUESTION, "near_duplicate": SAME_QUESTION[0], "content_word_changed": DIFFERENT_QUESTION[0],
+             "miss": "how do tides work on the far side of the moon"}
+    report: Dict[str, Any] = {"entries": args.entries, "threshold": args.threshold, "lookup_us": {}}
+    for name, question in cases.items():
+        seconds = timeit.timeit(lambda: cache.get(question, False), number=args.iterations)
+        report["lookup_us"][name] = round(seconds / args.iterations * 1e6, 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.entries} entries, threshold {args.threshold}; near-duplicate checks passed")
+    for name, micros in report["lookup_us"].items():
+        print(f"{name:>22}  {micros:8.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
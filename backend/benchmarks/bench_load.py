@@ -0,0 +1,295 @@
+"""Offline load test for the /ask pipeline with stubbed Groq, DuckDuckGo and YouTube upstreams.
+
+Runs the FastAPI app in-process, replays a mix of direct, stale/reconcile, search-first, unknown/augment
+and YouTube-heavy questions at a fixed concurrency, and reports throughput, per-path latency percentiles
+and event-loop blocking. Upstream latency and failure rates are configurable so runs are comparable
+across commits. Run from the backend directory:
+
+    python benchmarks/bench_load.py --requests 400 --concurrency 32 --output bench_load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+
+import app  # noqa: E402
+from structured_logging import LOGGER_PREFIX  # noqa: E402
+
+PATH_DIRECT = "direct"
+PATH_STALE = "stale_reconcile"
+PATH_SEARCH_FIRST = "search_first"
+PATH_UNKNOWN = "unknown_augment"
+PATH_YOUTUBE = "youtube_heavy"
+DEFAULT_MIX = {PATH_DIRECT: 0.4, PATH_STALE: 0.15, PATH_SEARCH_FIRST: 0.15, PATH_UNKNOWN: 0.15, PATH_YOUTUBE: 0.15}
+UNKNOWN_TOPIC_MARKER = "zorblax"
+FILLER_ANSWER = ("It is a well documented topic with a long history, plenty of context and several interesting "
+                 "details that are worth covering in a friendly, conversational way. ") * 4
+
+
+class UpstreamProfile:
+    """Lognormal latency around a median, plus an independent failure probability."""
+
+    def __init__(self, median_ms: float, sigma: float, failure_rate: float, rng: random.Random):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.rng = rng
+
+    async def wait(self, name: str) -> None:
+        await asyncio.sleep(self.median_ms / 1000.0 * self.rng.lognormvariate(0.0, self.sigma))
+        if self.rng.random() < self.failure_rate:
+            raise RuntimeError(f"stub {name} failure")
+
+
+def stub_answer_for(prompt: str) -> str:
+    if "Initial AI Answer" in prompt:
+        return "Actually, things have changed a bit. " + FILLER_ANSWER
+    if "Search Results" in prompt:
+        return "Here's what turned up. " + FILLER_ANSWER
+    if UNKNOWN_TOPIC_MARKER in prompt:
+        return app.ANSWER_UNKNOWN
+    return FILLER_ANSWER
+
+
+class StubChatGroq(BaseChatModel):
+    """Stands in for ChatGroq; answers are keyed off which prompt template was rendered."""
+
+    profile: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-groq"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError("the benchmark only exercises the async path")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self.profile.wait("groq")
+        content = stub_answer_for(messages[-1].content)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await self.profile.wait("groq")
+        for word in stub_answer_for(messages[-1].content).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+class StubDuckDuckGo:
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+
+    async def arun(self, query: str) -> str:
+        await self.profile.wait("ddg")
+        slug = query.replace(" ", "_")
+        return (f"{query} is covered in depth by several sources. https://en.wikipedia.org/wiki/{slug} "
+                f"Reporting at https://www.bbc.com/news/{slug} and https://www.example.org/{slug} adds detail.")
+
+
+def youtube_transport(profile: UpstreamProfile) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await profile.wait("youtube")
+        if request.url.path.endswith("/search"):
+            items = [{"id": {"kind": "youtube#video", "videoId": f"vid{i}"}} for i in range(app.settings.max_youtube_results)]
+            return httpx.Response(200, json={"items": items})
+        ids = request.url.params["id"].split(",")
+        return httpx.Response(200, json={"items": [
+            {"id": vid, "snippet": {"title": f"Video {vid}", "channelTitle": "Stub Channel", "description": "A stub video.",
+                                    "publishedAt": "2024-01-01T00:00:00Z"},
+             "contentDetails": {"duration": "PT4M13S"}, "statistics": {"viewCount": "123456"}}
+            for vid in ids
+        ]})
+    return httpx.MockTransport(handler)
+
+
+def groq_transport() -> httpx.MockTransport:
+    """Backs the pooled Groq client, so nothing reaches api.groq.com; the stub chat models never call it."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, json={"error": {"message": "bench_load runs offline"}})
+    return httpx.MockTransport(handler)
+
+
+def build_question(path: str, n: int) -> Dict[str, Any]:
+    if path == PATH_DIRECT:
+        return {"question": f"why do cats purr, variant {n}", "include_youtube": False}
+    if path == PATH_STALE:
+        return {"question": f"who is the current ceo of company {n}", "include_youtube": False}
+    if path == PATH_SEARCH_FIRST:
+        return {"question": f"latest news about topic {n}", "include_youtube": False}
+    if path == PATH_UNKNOWN:
+        return {"question": f"what is the {UNKNOWN_TOPIC_MARKER} constant number {n}", "include_youtube": False}
+    return {"question": f"latest how to video for skill {n}", "include_youtube": True}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def monitor_event_loop(interval: float, samples: List[float], stop: asyncio.Event) -> None:
+    """Record how late each fixed-interval wakeup is; lateness means the loop was blocked."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    groq_profile = UpstreamProfile(args.groq_ms, args.sigma, args.groq_failure_rate, rng)
+    ddg_profile = UpstreamProfile(args.ddg_ms, args.sigma, args.ddg_failure_rate, rng)
+    youtube_profile = UpstreamProfile(args.youtube_ms, args.sigma, args.youtube_failure_rate, rng)
+
+    settings = app.settings
+    settings.groq_api_key = "stub-key"  # never the real key from .env
+    settings.groq_warm_connections = 0
+    settings.groq_keep_warm_interval = 0
+    settings.youtube_api_key = "stub-key"
+    settings.youtube_video_cache_path = ""  # no SQLite state carried over between runs
+    settings.enable_web_search = True
+    settings.enable_youtube_search = True
+    settings.enable_answer_cache = args.with_caches
+    settings.enable_search_cache = args.with_caches
+    settings.enable_admission_control = args.with_admission
+    for limiter in (app.groq_rate_limiter, app.ddg_rate_limiter, app.youtube_rate_limiter):
+        limiter.__init__(limiter.name, requests_per_minute=1e9, burst=1_000_000)
+    app.ChatGroq = lambda **kwargs: StubChatGroq(profile=groq_profile)
+    app.DuckDuckGoSearchRun = lambda **kwargs: StubDuckDuckGo(ddg_profile)
+    app.create_groq_http_client = lambda: httpx.AsyncClient(transport=groq_transport())
+
+    await app.startup_event()
+    await app.http_client.aclose()
+    app.http_client = httpx.AsyncClient(transport=youtube_transport(youtube_profile))
+
+    paths = list(args.mix)
+    weights = [args.mix[p] for p in paths]
+    workload = [(path, build_question(path, n)) for n, path in enumerate(rng.choices(paths, weights, k=args.requests))]
+    latencies: Dict[str, List[float]] = {p: [] for p in paths}
+    errors: Dict[str, int] = {p: 0 for p in paths}
+    sources: Dict[str, Dict[str, int]] = {p: {} for p in paths}
+    loop_lag: List[float] = []
+    stop_monitor = asyncio.Event()
+    monitor = asyncio.create_task(monitor_event_loop(args.loop_probe_ms / 1000.0, loop_lag, stop_monitor))
+    queue: "asyncio.Queue" = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench", timeout=None) as client:
+        async def worker() -> None:
+            while not queue.empty():
+                path, body = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/ask", json=body)
+                latencies[path].append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors[path] += 1
+                    continue
+                source = response.json()["source"]
+                sources[path][source] = sources[path].get(source, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    stop_monitor.set()
+    await monitor
+    await app.shutdown_event()
+
+    per_path = {}
+    for path in paths:
+        values = sorted(latencies[path])
+        per_path[path] = {
+            "requests": len(values), "errors": errors[path], "sources": sources[path],
+            "p50_ms": _ms(percentile(values, 50)), "p95_ms": _ms(percentile(values, 95)), "p99_ms": _ms(percentile(values, 99)),
+            "mean_ms": _ms(statistics.fmean(values) if values else None),
+        }
+    all_values = sorted(v for values in latencies.values() for v in values)
+    return {
+        "git_revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(all_values) / elapsed, 2) if elapsed else None,
+        "overall": {"p50_ms": _ms(percentile(all_values, 50)), "p95_ms": _ms(percentile(all_values, 95)),
+                    "p99_ms": _ms(percentile(all_values, 99))},
+        "paths": per_path,
+        "event_loop": {
+            "probe_interval_ms": args.loop_probe_ms,
+            "max_lag_ms": _ms(max(loop_lag) if loop_lag else None),
+            "p99_lag_ms": _ms(percentile(sorted(loop_lag), 99)),
+            "blocked_ms_total": _ms(sum(lag for lag in loop_lag if lag > args.loop_block_threshold_ms / 1000.0)),
+        },
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000.0, 2)
+
+
+def parse_mix(raw: str) -> Dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown path '{name}', expected one of {sorted(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="comma-separated path=weight, e.g. direct=0.5,stale_reconcile=0.5")
+    parser.add_argument("--groq-ms", type=float, default=350.0, help="median stub Groq latency")
+    parser.add_argument("--ddg-ms", type=float, default=400.0, help="median stub DuckDuckGo latency")
+    parser.add_argument("--youtube-ms", type=float, default=150.0, help="median stub latency per YouTube API call")
+    parser.add_argument("--sigma", type=float, default=0.35, help="lognormal spread of all stub latencies")
+    parser.add_argument("--groq-failure-rate", type=float, default=0.0)
+    parser.add_argument("--ddg-failure-rate", type=float, default=0.0)
+    parser.add_argument("--youtube-failure-rate", type=float, default=0.0)
+    parser.add_argument("--with-caches", action="store_true", help="keep the answer and search caches enabled")
+    parser.add_argument("--with-admission", action="store_true", help="keep /ask admission control enabled")
+    parser.add_argument("--loop-probe-ms", type=float, default=10.0)
+    parser.add_argument("--loop-block-threshold-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    app.settings.enable_async_logging = False  # startup then leaves the root logger to this script
+    logging.basicConfig(level=logging.WARNING)
+    app.logger.setLevel("WARNING")
+    logging.getLogger(LOGGER_PREFIX.rstrip(".")).setLevel(logging.WARNING)  # per-request category loggers
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run_benchmark(args))
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+
+
+if __name__ == "__main__":
+    main()
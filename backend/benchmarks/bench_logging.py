@@ -0,0 +1,123 @@
+"""Microbenchmark: per-request logging cost on the event loop thread, synchronous f-strings against the sampled queue.
+
+The synchronous path is what /ask did before: a dozen or so logger.info f-strings per request, several
+slicing the LLM output and the search text, formatted and written to the stream by the calling thread.
+The queued path logs the same events through the category loggers with lazy arguments and payloads
+passed as extras; records are sampled per request and formatted and written by the listener thread.
+Both write to os.devnull (or --output). Run from the backend directory:
+
+    python benchmarks/bench_logging.py --requests 5000 --payload-chars 4000 [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_logging import (CATEGORY_LLM, CATEGORY_PAYLOAD, CATEGORY_REQUEST, CATEGORY_SEARCH,  # noqa: E402
+                                LOG_FORMAT_JSON, TEXT_FORMAT, category_logger, configure_logging,
+                                parse_sample_rates, request_log_scope)
+
+legacy_logger = logging.getLogger("bench.legacy")
+request_logger = category_logger(CATEGORY_REQUEST)
+search_logger = category_logger(CATEGORY_SEARCH)
+llm_logger = category_logger(CATEGORY_LLM)
+payload_logger = category_logger(CATEGORY_PAYLOAD)
+
+
+def legacy_request(question: str, answer: str, search_text: str) -> None:
+    legacy_logger.info(f"Someone asked SmartGenie: '{question}' (Include YouTube: {True})")
+    legacy_logger.info("SmartGenie is thinking (direct answer attempt)...")
+    legacy_logger.info(f"SmartGenie's first thought (raw): '{answer[:200]}...'")
+    legacy_logger.info(f"SmartGenie's cleaned direct answer: '{answer[:200]}...'")
+    legacy_logger.info(f"Search logic triggered. Reason - Direct unknown: {False}, Potentially stale: {True}. Web possible: {True}, YT possible: {True}")
+    legacy_logger.info(f"Attempting DuckDuckGo search for: '{question}'")
+    legacy_logger.info(f"DDG result raw text length: {len(search_text)}")
+    legacy_logger.info(f"DDG search text processed. URLs extracted for categories: {['wikipedia', 'news', 'general']}")
+    legacy_logger.info("Attempting to generate/merge suggested URLs.")
+    legacy_logger.info(f"Suggested URLs merged into categorized list. Final web URL categories: {['wikipedia', 'news', 'general']}")
+    legacy_logger.info(f"Web search for '{question}' processed. Context sections: {2}. Categorized URLs: {True}")
+    legacy_logger.info(f"Search context compacted from ~{1800} to ~{900} tokens (budget {900}).")
+    legacy_logger.info("Reconciling potentially stale direct answer with new search results...")
+    legacy_logger.info(f"LLM Reconciled Cleaned: '{answer[:200]}...'")
+
+
+def queued_request(question: str, answer: str, search_text: str) -> None:
+    with request_log_scope():
+        request_logger.info("Someone asked SmartGenie: '%s' (Include YouTube: %s)", question, True)
+        llm_logger.info("SmartGenie is thinking (direct answer attempt)...")
+        payload_logger.info("SmartGenie's first thought (raw)", extra={"payload": answer})
+        payload_logger.info("SmartGenie's cleaned direct answer", extra={"payload": answer})
+        request_logger.info("Search logic triggered. Reason - Direct unknown: %s, Potentially stale: %s. Web possible: %s, YT possible: %s",
+                            False, True, True, True)
+        search_logger.info("Attempting DuckDuckGo search for: '%s'", question)
+        payload_logger.info("DDG result text (%d chars)", len(search_text), extra={"payload": search_text})
+        search_logger.info("DDG search text processed. URLs extracted for categories: %s", ["wikipedia", "news", "general"])
+        search_logger.info("Attempting to generate/merge suggested URLs.")
+        search_logger.info("Suggested URLs merged into categorized list. Final web URL categories: %s", ["wikipedia", "news", "general"])
+        search_logger.info("Web search for '%s' processed. Context sections: %d. Categorized URLs: %s", question, 2, True)
+        search_logger.info("Search context compacted from ~%d to ~%d tokens (budget %d).", 1800, 900, 900)
+        payload_logger.info("Search context for the LLM", extra={"payload": search_text})
+        llm_logger.info("Reconciling potentially stale direct answer with new search results...")
+        payload_logger.info("LLM Reconciled Cleaned", extra={"payload": answer})
+
+
+def time_requests(run_one: Callable[[str, str, str], None], requests: int, answer: str, search_text: str,
+                  drain: Callable[[], None]) -> Dict[str, float]:
+    """Caller-thread time per request, and wall time per request including writing everything out."""
+    started = time.perf_counter()
+    for i in range(requests):
+        run_one(f"what is the latest price of coin number {i}", answer, search_text)
+    caller = time.perf_counter() - started
+    drain()
+    total = time.perf_counter() - started
+    return {"caller_us": caller / requests * 1e6, "total_us": total / requests * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--payload-chars", type=int, default=4000, help="size of the LLM answer and the search text")
+    parser.add_argument("--payload-max-chars", type=int, default=200, help="payload cut-off; the old messages kept 200")
+    parser.add_argument("--sample-rates", default="search=0.25,llm=0.25,payload=0.05")
+    parser.add_argument("--output", default=os.devnull, help="where log lines are written")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(400)]
+    text = " ".join(rng.choice(words) for _ in range(args.payload_chars // 5))[:args.payload_chars]
+    root = logging.getLogger()
+    results: Dict[str, Any] = {}
+    with open(args.output, "a") as stream:
+        sync_handler = logging.StreamHandler(stream)
+        sync_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.handlers = [sync_handler]
+        root.setLevel(logging.INFO)
+        results["sync_fstrings"] = time_requests(legacy_request, args.requests, text, text, sync_handler.flush)
+
+        for name, rates in (("queued_unsampled", {}), ("queued_sampled", parse_sample_rates(args.sample_rates))):
+            handler = configure_logging("INFO", LOG_FORMAT_JSON, rates, queue_size=args.requests * 20,
+                                        payload_max_chars=args.payload_max_chars, stream=stream)
+            results[name] = time_requests(queued_request, args.requests, text, text, handler.stop)
+            results[name]["written"] = handler.enqueued
+            results[name]["dropped"] = handler.dropped
+        root.handlers = []
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results["sync_fstrings"]["caller_us"]
+    for name, result in results.items():
+        extra = f"   records written {result['written']}" if "written" in result else ""
+        print(f"{name:18s} caller {result['caller_us']:7.1f} us/request (x{baseline / result['caller_us']:.1f})   "
+              f"incl. writing {result['total_us']:7.1f} us/request{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Microbenchmark: per-call cost of the phrase checks in clean_response and the question triggers.
+
+Compares the precompiled PhraseMatcher path in app.py against the previous multi-pass substring scans
+at 1KB and 10KB response sizes. Run from the backend directory:
+
+    python benchmarks/bench_phrase_matcher.py [--json]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+FILLER_SENTENCE = "The river runs through the old town and past the market where traders sell spices. "
+QUESTIONS = [
+    "what is the latest news about the election", "how to tie a tie step by step",
+    "who is the current prime minister of the uk", "why is the sky blue",
+]
+LEGACY_STALE_KEYWORDS = list(app.STALE_QUESTION_KEYWORDS)
+
+
+def legacy_rejects(response_text: str) -> bool:
+    cleaned = response_text.strip()
+    lower_cleaned = cleaned.lower()
+    if "hmm, i'm not sure about that one!" in lower_cleaned or cleaned == app.ANSWER_UNKNOWN:
+        return True
+    if any(refusal in lower_cleaned for refusal in app.COMMON_LLM_REFUSALS):
+        return True
+    if any(phrase in lower_cleaned for phrase in app.FORBIDDEN_PHRASES_IN_RESPONSE):
+        return True
+    for preamble in app.RESPONSE_PREAMBLES:
+        if cleaned.lower().startswith(preamble):
+            cleaned = cleaned[len(preamble):].lstrip()
+    return False
+
+
+def matcher_rejects(response_text: str) -> bool:
+    return app.RESPONSE_REJECTION_MATCHER.search(response_text.strip().lower()) is not None
+
+
+def legacy_question_flags(question: str) -> tuple:
+    question_lower = question.lower()
+    youtube = any(keyword in question_lower for keyword in app.YOUTUBE_TRIGGER_KEYWORDS)
+    stale_keywords = list(LEGACY_STALE_KEYWORDS)
+    stale = bool(re.search(app.STALE_ROLE_PATTERN.pattern, question_lower)) or \
+        any(keyword in question_lower for keyword in stale_keywords)
+    return youtube, stale
+
+
+def matcher_question_flags(question: str) -> tuple:
+    categories = app.classify_question.__wrapped__(question)
+    return app.PHRASE_YOUTUBE_TRIGGER in categories, app.PHRASE_STALE in categories
+
+
+def cached_question_flags(question: str) -> tuple:
+    return app.should_search_youtube(question), app.is_question_potentially_stale(question)
+
+
+def per_call_us(func, arg, number: int) -> float:
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (1024, 10 * 1024):
+        text = (FILLER_SENTENCE * (size // len(FILLER_SENTENCE) + 1))[:size]
+        assert legacy_rejects(text) == matcher_rejects(text)
+        results[f"clean_response_checks_{size // 1024}kb"] = {
+            "legacy_us": per_call_us(legacy_rejects, text, 2000),
+            "matcher_us": per_call_us(matcher_rejects, text, 2000),
+        }
+    for question in QUESTIONS:
+        assert legacy_question_flags(question) == matcher_question_flags(question)
+    results["question_triggers"] = {
+        "legacy_us": sum(per_call_us(legacy_question_flags, q, 20000) for q in QUESTIONS) / len(QUESTIONS),
+        "matcher_us": sum(per_call_us(matcher_question_flags, q, 20000) for q in QUESTIONS) / len(QUESTIONS),
+        # What a request actually pays after the first check of its question (classify_question is memoized).
+        "matcher_cached_us": sum(per_call_us(cached_question_flags, q, 20000) for q in QUESTIONS) / len(QUESTIONS),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, timings in results.items():
+        speedup = timings["legacy_us"] / timings["matcher_us"]
+        line = f"{name:32s} legacy {timings['legacy_us']:9.2f} us   matcher {timings['matcher_us']:9.2f} us   x{speedup:.1f}"
+        if "matcher_cached_us" in timings:
+            line += f"   (memoized {timings['matcher_cached_us']:.2f} us)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Microbenchmark: per-request prompt overhead of the compiled PromptChain path against LLMChain.
+
+Both paths drive the same instant fake chat model, so the numbers are pure Python-side overhead:
+template rendering alone, and the whole arun() call including the chat-model invocation. Peak memory
+per render is traced with tracemalloc. Runs the reconcile and search-augmented prompts with a search
+context of the configured size. Run from the backend directory:
+
+    python benchmarks/bench_prompt_rendering.py --context-chars 3500 [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.chains import LLMChain  # noqa: E402
+from langchain.prompts import PromptTemplate  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import app  # noqa: E402
+from prompt_engine import CompiledPrompt, PromptChain  # noqa: E402
+
+SEARCH_SENTENCE = "The match ended 2-1 after a late goal, and the club confirmed the new coach on Monday. "
+
+
+def build_cases(context_chars: int) -> Dict[str, Dict[str, Any]]:
+    search_results = (SEARCH_SENTENCE * (context_chars // len(SEARCH_SENTENCE) + 1))[:context_chars]
+    context = {"current_date": app.get_current_date(), "question": "who won the latest cup final",
+               "initial_answer": "It was won by the home side last season. " * 6, "search_results": search_results}
+    return {
+        "reconcile": {"template": app.RECONCILE_PROMPT_TEMPLATE_TEXT, "partials": {"max_words_reconciled": "350"},
+                      "variables": ["current_date", "question", "initial_answer", "search_results"], "context": context},
+        "augment": {"template": app.SEARCH_AUGMENTED_PROMPT_TEMPLATE_TEXT, "partials": {"max_words_augmented": "350"},
+                    "variables": ["current_date", "question", "search_results"],
+                    "context": {k: v for k, v in context.items() if k != "initial_answer"}},
+    }
+
+
+def time_sync(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def time_async(fn: Callable[[], Awaitable[Any]], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def peak_bytes_per_call(fn: Callable[[], Any]) -> int:
+    """Peak traced memory during one warmed-up call, including its result: the transient copies it makes."""
+    fn()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - baseline
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    llm = FakeListChatModel(responses=["A friendly answer."])
+    report: Dict[str, Any] = {"context_chars": args.context_chars, "iterations": args.iterations, "prompts": {}}
+    for name, case in build_cases(args.context_chars).items():
+        context = case["context"]
+        legacy_prompt = PromptTemplate(template=case["template"], input_variables=case["variables"],
+                                       partial_variables=case["partials"])
+        compiled_prompt = CompiledPrompt(case["template"], partial_variables=case["partials"])
+        assert legacy_prompt.format(**context) == compiled_prompt.format(**context)
+        legacy_chain = LLMChain(prompt=legacy_prompt, llm=llm)
+        compiled_chain = PromptChain(compiled_prompt, llm)
+
+        legacy_render = time_sync(lambda: legacy_prompt.format(**context), args.iterations)
+        compiled_render = time_sync(lambda: compiled_prompt.format(**context), args.iterations)
+        legacy_call = await time_async(lambda: legacy_chain.arun(context), args.iterations // 10)
+        compiled_call = await time_async(lambda: compiled_chain.arun(context), args.iterations // 10)
+        report["prompts"][name] = {
+            "render_us": {"llmchain": round(legacy_render, 2), "compiled": round(compiled_render, 2),
+                          "speedup": round(legacy_render / compiled_render, 1)},
+            "render_peak_bytes": {"llmchain": peak_bytes_per_call(lambda: legacy_prompt.format(**context)),
+                                  "compiled": peak_bytes_per_call(lambda: compiled_prompt.format(**context))},
+            "arun_us": {"llmchain": round(legacy_call, 1), "compiled": round(compiled_call, 1),
+                        "saved_per_call_us": round(legacy_call - compiled_call, 1)},
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--context-chars", type=int, default=3500, help="size of the search results context")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"context {args.context_chars} chars, {args.iterations} iterations")
+    for name, result in report["prompts"].items():
+        render, peak, call = result["render_us"], result["render_peak_bytes"], result["arun_us"]
+        print(f"{name:>9}  render  LLMChain {render['llmchain']:8.2f}us  compiled {render['compiled']:8.2f}us  "
+              f"x{render['speedup']}  peak {peak['llmchain']}B -> {peak['compiled']}B")
+        print(f"{'':>9}  arun    LLMChain {call['llmchain']:8.1f}us  compiled {call['compiled']:8.1f}us  "
+              f"saved {call['saved_per_call_us']}us/call")
+
+
+if __name__ == "__main__":
+    main()
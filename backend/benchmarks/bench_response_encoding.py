@@ -0,0 +1,102 @@
+"""Microbenchmark: /ask response rendering and bytes on the wire, FastAPI's default path against the fast path.
+
+The default path is what a response_model endpoint returning a model did before: re-validate against
+the response model, serialize it, then JSONResponse's json.dumps. The fast path is what /ask does now:
+pydantic-core's JSON encoder for full bodies, orjson (when installed) for compact ones. Sizes are
+reported for full and compact bodies, raw and compressed with every coding available here. Run from
+the backend directory:
+
+    python benchmarks/bench_response_encoding.py --answer-words 350 --videos 3 --urls 10 [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import timeit
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+import app  # noqa: E402
+from response_encoding import available_encodings, compress  # noqa: E402
+
+
+def build_response(answer_words: int, videos: int, urls: int) -> "app.AnswerResponse":
+    rng = random.Random(3)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(400)]
+    web_urls = [f"https://www.example{i % 3}.com/articles/{i}/a-fairly-typical-article-slug" for i in range(urls)]
+    youtube_videos = [
+        app.YouTubeVideo(title=f"Match highlights part {i}: every wicket and boundary", channel="Sports Channel",
+                         url=f"https://www.youtube.com/watch?v=vid{i:08d}", description="Full highlights. " * 15 + "...",
+                         duration="12m 4s", view_count="1.2M views", published_at="2024-05-01T10:00:00Z")
+        for i in range(videos)
+    ]
+    return app.AnswerResponse(
+        answer=" ".join(rng.choice(vocabulary) for _ in range(answer_words)), source=app.SOURCE_GROQ_AI_WITH_MIXED_SEARCH,
+        confidence=app.CONFIDENCE_HIGH, search_performed=True, youtube_search_performed=bool(videos),
+        search_queries_used=["Web: who won", "YouTube: who won"], source_urls=web_urls,
+        youtube_videos=youtube_videos or None,
+        additional_resources={"web_sources": web_urls, "youtube_videos_urls": [video.url for video in youtube_videos]},
+    )
+
+
+def per_call_us(func: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answer-words", type=int, default=350)
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--urls", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    response = build_response(args.answer_words, args.videos, args.urls)
+    field = create_response_field(name="Response_ask_question_ask_post", type_=app.AnswerResponse)
+    loop = asyncio.new_event_loop()
+
+    def default_path() -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+
+    def fast_full() -> bytes:
+        return app.encode_answer_body(response, app.RESPONSE_MODE_FULL)
+
+    def fast_compact() -> bytes:
+        return app.encode_answer_body(response, app.RESPONSE_MODE_COMPACT)
+
+    assert json.loads(default_path()) == json.loads(fast_full())
+    results: Dict[str, Any] = {"render_us": {
+        "fastapi_default": per_call_us(default_path, args.iterations),
+        "fast_full": per_call_us(fast_full, args.iterations),
+        "fast_compact": per_call_us(fast_compact, args.iterations),
+    }, "bytes": {}, "compress_us": {}}
+    for mode, body in (("full", fast_full()), ("compact", fast_compact())):
+        results["bytes"][mode] = {"identity": len(body)}
+        for encoding in available_encodings():
+            results["bytes"][mode][encoding] = len(compress(body, encoding))
+            results["compress_us"][f"{mode}_{encoding}"] = per_call_us(lambda: compress(body, encoding), args.iterations // 10)
+    loop.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    render = results["render_us"]
+    print(f"render   FastAPI default {render['fastapi_default']:8.1f} us   fast full {render['fast_full']:6.1f} us "
+          f"(x{render['fastapi_default'] / render['fast_full']:.1f})   fast compact {render['fast_compact']:6.1f} us")
+    for mode, sizes in results["bytes"].items():
+        print(f"{mode:8s} " + "   ".join(f"{encoding} {size} B" for encoding, size in sizes.items()))
+    for name, micros in results["compress_us"].items():
+        print(f"compress {name:16s} {micros:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Startup benchmark: `import app` time, slowest imports, and time until /health/live and /health/ready.
+
+Each measurement runs in a fresh interpreter so module caches do not carry over. Boot is measured by
+starting uvicorn on a free port and polling the liveness and readiness probes, once with FAST_BOOT off
+and once with it on. Readiness is timed until the probe leaves the "starting" phase, so the benchmark
+also works without a GROQ_API_KEY (the phase is then "failed" rather than "ready"). Exits non-zero when
+a budget is exceeded. Run from the backend directory:
+
+    python benchmarks/bench_startup.py --runs 5 --import-budget-ms 900 --live-budget-ms 1500
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000.0, 1)
+
+
+def measure_import(runs: int) -> List[float]:
+    return [float(subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR,
+                                          stderr=subprocess.DEVNULL, text=True).strip().splitlines()[-1])
+            for _ in range(runs)]
+
+
+def slowest_imports(limit: int) -> List[Dict[str, Any]]:
+    """Top-level packages imported by app, by cumulative import time (from python -X importtime)."""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BACKEND_DIR,
+                            capture_output=True, text=True).stderr
+    packages = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            packages.append({"module": name.strip(), "cumulative_ms": round(int(cumulative) / 1000.0, 1)})
+    return sorted(packages, key=lambda item: -item["cumulative_ms"])[:limit]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_boot(fast_boot: bool, timeout: float) -> Dict[str, Optional[float]]:
+    """Seconds from process start until liveness answers and until readiness leaves the starting phase."""
+    port = _free_port()
+    env = dict(os.environ, FAST_BOOT="true" if fast_boot else "false", WORKERS="1", YOUTUBE_VIDEO_CACHE_PATH="")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    phase = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - started < timeout and ready is None:
+                try:
+                    if live is None and client.get("/health/live").status_code == 200:
+                        live = time.perf_counter() - started
+                    if live is not None:
+                        phase = client.get("/health/ready").json().get("status")
+                        if phase != "starting":
+                            ready = time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"live_s": live, "ready_s": ready, "phase": phase}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest imports to list")
+    parser.add_argument("--import-budget-ms", type=float, default=900.0, help="median `import app` budget")
+    parser.add_argument("--live-budget-ms", type=float, default=1500.0, help="median fast-boot time to liveness")
+    parser.add_argument("--boot-timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    import_times = measure_import(args.runs)
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "import_app": {"median_ms": _ms(statistics.median(import_times)), "max_ms": _ms(max(import_times)),
+                       "budget_ms": args.import_budget_ms},
+        "slowest_imports": slowest_imports(args.top),
+        "boot": {},
+    }
+    for fast_boot in (False, True):
+        runs = [measure_boot(fast_boot, args.boot_timeout) for _ in range(args.runs)]
+        lives = [run["live_s"] for run in runs if run["live_s"] is not None]
+        readies = [run["ready_s"] for run in runs if run["ready_s"] is not None]
+        report["boot"]["fast_boot" if fast_boot else "eager"] = {
+            "live_median_ms": _ms(statistics.median(lives)) if lives else None,
+            "ready_median_ms": _ms(statistics.median(readies)) if readies else None,
+            "phase": runs[-1]["phase"], "timeouts": len(runs) - len(readies),
+        }
+    fast_live = report["boot"]["fast_boot"]["live_median_ms"]
+    report["boot"]["fast_boot"]["live_budget_ms"] = args.live_budget_ms
+    over_budget = [name for name, over in (
+        ("import_app", report["import_app"]["median_ms"] > args.import_budget_ms),
+        ("fast_boot_live", fast_live is None or fast_live > args.live_budget_ms),
+    ) if over]
+    report["over_budget"] = over_budget
+
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Microbenchmark: URL extraction, classification and merging on large search-result blobs.
+
+Compares url_engine (one regex pass, suffix-trie host classification, ordered-set dedupe) against the
+previous three-pass extractor with substring classification, and the ordered-set merge against the
+previous `if url not in list` merge. Blobs mix DDG-style snippets with bare, markdown and quoted URLs,
+with each URL repeated a few times the way result pages repeat them. Host classification is memoized,
+so the steady-state numbers are reported. Run from the backend directory:
+
+    python benchmarks/bench_url_engine.py --sizes 4,64,1024 [--json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import timeit
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_engine import extract_urls, generate_suggested_urls, merge_categorized_urls  # noqa: E402
+
+SNIPPET = "The committee published its findings on Tuesday, and officials said the review would continue. "
+HOSTS = [
+    "en.wikipedia.org", "www.bbc.co.uk", "www.reuters.com", "arxiv.org", "www.cdc.gov", "www.khanacademy.org",
+    "pubmed.ncbi.nlm.nih.gov", "news.ycombinator.com", "www.example.com", "blog.example.org", "www.espncricinfo.com",
+    "www.nature.com", "duckduckgo.com", "www.who.int", "docs.python.org", "www.coursera.org",
+]
+QUERIES = ["what caused world war 2", "latest ipl cricket score", "how does photosynthesis work",
+           "who is the ceo of the company that makes the new phone"]
+
+
+def legacy_extract(search_results_text: str) -> Dict[str, List[str]]:
+    url_pattern = r'https?://[^\s<>"\'()\[\]{}|\\^`\n]+[^\s<>"\'()\[\]{}|\\^`.,;:!?\n]'
+    markdown_link_pattern = r'\[[^\]]+\]\((https?://[^\s<>"\'()\[\]{}|\\^`\n]+[^\s<>"\'()\[\]{}|\\^`.,;:!?\n])\)'
+    wrapped_url_pattern = r'[<"\']+(https?://[^\s<>"\'()\[\]{}|\\^`\n]+)[>"\']+'
+    categorized_urls = {'wikipedia': [], 'academic': [], 'news': [], 'government': [], 'educational': [], 'general': []}
+    all_urls = set()
+    for pattern in [url_pattern, markdown_link_pattern, wrapped_url_pattern]:
+        for url in re.findall(pattern, search_results_text, re.IGNORECASE):
+            url_cleaned = url.strip().rstrip(').,!?:;"\'')
+            if not any(blocked in url_cleaned.lower() for blocked in ["duckduckgo.com", "google.com/search", "bing.com/search"]):
+                all_urls.add(url_cleaned)
+    for url in all_urls:
+        url_lower = url.lower()
+        if 'wikipedia.org' in url_lower or 'wiki' in url_lower:
+            categorized_urls['wikipedia'].append(url)
+        elif any(d in url_lower for d in ['.edu', 'scholar.', 'academia.', 'researchgate.', 'pubmed.', 'arxiv.', 'jstor.', 'springer.', 'ieee.', 'acm.org']):
+            categorized_urls['academic'].append(url)
+        elif any(d in url_lower for d in ['.gov', '.mil', 'who.int', 'un.org', 'unesco.', 'worldbank.', 'imf.org', 'europa.eu']):
+            categorized_urls['government'].append(url)
+        elif any(d in url_lower for d in ['bbc.', 'cnn.', 'reuters.', 'ap.org', 'npr.', 'news', 'guardian.', 'nytimes.', 'wsj.', 'bloomberg.', 'espn.', 'cricinfo.', 'cricbuzz.', 'espncricinfo.']):
+            categorized_urls['news'].append(url)
+        elif any(d in url_lower for d in ['coursera.', 'edx.', 'khanacademy.', 'udemy.', 'skillshare.', 'pluralsight.', 'lynda.', 'masterclass.']):
+            categorized_urls['educational'].append(url)
+        else:
+            categorized_urls['general'].append(url)
+    return {k: list(set(v)) for k, v in categorized_urls.items() if v}
+
+
+def legacy_merge(target: Dict[str, List[str]], source: Dict[str, List[str]]) -> None:
+    for category, urls in source.items():
+        cat_list = target.setdefault(category, [])
+        for url in urls:
+            if url not in cat_list:
+                cat_list.append(url)
+
+
+def build_blob(size: int, rng: random.Random) -> str:
+    """About size bytes of snippets, with a fresh URL every few sentences and roughly 3 mentions of each."""
+    urls = [f"https://{rng.choice(HOSTS)}/article/{i}-{rng.randrange(10**6)}" for i in range(max(1, size // 600))]
+    wrappers = ["{}", "[source]({})", "\"{}\"", "<{}>", "({}).", "{},"]
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        piece = SNIPPET + rng.choice(wrappers).format(rng.choice(urls)) + " "
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts)[:size]
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="4,64,1024", help="comma-separated blob sizes in KB")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {}
+    for size_kb in (int(size) for size in args.sizes.split(",")):
+        blob = build_blob(size_kb * 1024, rng)
+        number = max(1, 256 // size_kb)
+        legacy_urls, engine_urls = legacy_extract(blob), extract_urls(blob)
+        results[f"extract_{size_kb}kb"] = {
+            "legacy_us": per_call_us(lambda: legacy_extract(blob), number),
+            "engine_us": per_call_us(lambda: extract_urls(blob), number),
+            "legacy_unique_urls": sum(len(urls) for urls in legacy_urls.values()),
+            "engine_unique_urls": sum(len(urls) for urls in engine_urls.values()),
+        }
+        # Merge the blob's URLs into an accumulator that already holds half of them, as perform_search does.
+        half = {category: urls[::2] for category, urls in engine_urls.items()}
+
+        def run_legacy_merge() -> None:
+            legacy_merge({category: list(urls) for category, urls in half.items()}, engine_urls)
+
+        def run_engine_merge() -> None:
+            merge_categorized_urls({category: dict.fromkeys(urls) for category, urls in half.items()}, engine_urls)
+
+        results[f"merge_{size_kb}kb"] = {
+            "legacy_us": per_call_us(run_legacy_merge, number),
+            "engine_us": per_call_us(run_engine_merge, number),
+        }
+    results["suggested_urls"] = {
+        "engine_us": sum(per_call_us(lambda: generate_suggested_urls(q), 5000) for q in QUERIES) / len(QUERIES),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, timings in results.items():
+        if "legacy_us" not in timings:
+            print(f"{name:16s} engine {timings['engine_us']:12.2f} us")
+            continue
+        speedup = timings["legacy_us"] / timings["engine_us"]
+        line = f"{name:16s} legacy {timings['legacy_us']:12.2f} us   engine {timings['engine_us']:12.2f} us   x{speedup:.1f}"
+        if "engine_unique_urls" in timings:
+            line += f"   urls {timings['legacy_unique_urls']} -> {timings['engine_unique_urls']}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
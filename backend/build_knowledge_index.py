@@ -0,0 +1,79 @@
+"""Build the local knowledge index from recorded /ask answers.
+
+Reads the JSONL answer records written when ANSWER_RECORD_PATH is set, keeps high-confidence direct
+answers to evergreen questions, and writes a memory-mappable BM25 index that /ask consults before any
+LLM call. Run offline from the backend directory, then restart (or redeploy) the API to pick it up:
+
+    python build_knowledge_index.py answers.jsonl --output knowledge.idx --min-count 2
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator
+
+import app
+from caching import normalize_text
+from knowledge_index import build_knowledge_index
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed record on line {line_number}", file=sys.stderr)
+
+
+def is_indexable(record: Dict[str, Any], allowed_sources: set) -> bool:
+    response = record.get("response") or {}
+    return (
+        bool(record.get("question")) and response.get("source") in allowed_sources
+        and response.get("confidence") == app.CONFIDENCE_HIGH and bool(response.get("answer"))
+        and response["answer"] != app.ANSWER_UNKNOWN
+        and not app.is_question_potentially_stale(record["question"])
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("records", nargs="+", help="answer record JSONL file(s)")
+    parser.add_argument("--output", default=app.settings.knowledge_index_path)
+    parser.add_argument("--min-count", type=int, default=1,
+                        help="only index questions recorded at least this many times")
+    parser.add_argument("--include-reconciled", action="store_true",
+                        help="also index answers that were reconciled against search results")
+    args = parser.parse_args()
+
+    allowed_sources = {app.SOURCE_GROQ_AI_DIRECT}
+    if args.include_reconciled:
+        allowed_sources.add(app.SOURCE_GROQ_AI_RECONCILED)
+
+    # One document per normalized question; the most recent answer wins.
+    latest: Dict[str, Dict[str, Any]] = {}
+    counts: Dict[str, int] = {}
+    scanned = 0
+    for path in args.records:
+        for record in read_records(path):
+            scanned += 1
+            if not is_indexable(record, allowed_sources):
+                continue
+            key = normalize_text(record["question"])
+            counts[key] = counts.get(key, 0) + 1
+            current = latest.get(key)
+            if current is None or record.get("recorded_at", "") >= current.get("recorded_at", ""):
+                latest[key] = {
+                    "question": record["question"], "answer": record["response"]["answer"],
+                    "recorded_at": record.get("recorded_at"),
+                }
+
+    documents = [dict(document, count=counts[key]) for key, document in latest.items() if counts[key] >= args.min_count]
+    written = build_knowledge_index(documents, args.output)
+    print(f"Scanned {scanned} records, indexed {written} questions into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Words a rephrasing can add, drop or swap without changing what is asked. Question words and negations
+# are deliberately absent: "how" and "why", or "is" and "is not", ask different things.
+QUESTION_STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did", "can", "could",
+    "would", "will", "should", "may", "might", "i", "me", "my", "we", "our", "you", "your", "it", "its",
+    "this", "that", "these", "those", "there", "of", "in", "on", "at", "to", "for", "from", "by", "with",
+    "about", "into", "as", "and", "or", "s", "please", "tell", "explain", "describe", "give", "show",
+    "know", "let", "us", "some", "any", "just", "really", "simple", "simply", "terms", "briefly",
+})
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different phrasings share a key."""
+    text = _NON_WORD_RE.sub(" ", text.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry, bounded by entry count and by an approximate byte budget."""
+
+    def __init__(self, max_entries: int, max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float, size: int = 0) -> List[Hashable]:
+        """Store value and return the keys evicted to make room for it."""
+        if key in self._entries:
+            self._remove(key)
+        if self.max_bytes and size > self.max_bytes:
+            return []
+        self._entries[key] = (time.monotonic() + ttl_seconds, size, value)
+        self.total_bytes += size
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes and self.total_bytes > self.max_bytes)):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+            evicted.append(oldest_key)
+        return evicted
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._remove(key)
+        return entry[2]
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Live (key, value) pairs, least recently used first. Neither counts as a hit nor refreshes recency."""
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, _, value) in self._entries.items() if expires_at > now]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "expirations": self.expirations,
+        }
+
+
+def word_shingles(normalized_text: str) -> Set[str]:
+    """Word unigrams plus bigrams; short questions carry too little signal for longer shingles."""
+    words = normalized_text.split()
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def content_words(normalized_text: str) -> FrozenSet[str]:
+    """The words, numbers included, that a near-duplicate question must share exactly."""
+    return frozenset(word for word in normalized_text.split() if word not in QUESTION_STOPWORDS)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashIndex:
+    """MinHash signatures with LSH banding for near-duplicate lookup over short texts.
+
+    Candidates sharing any band are verified with exact Jaccard similarity on their shingle sets,
+    so the banding only has to be a cheap pre-filter.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        seed_bytes = seed.to_bytes(8, "little")
+        self._perms = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(i.to_bytes(4, "little"), digest_size=16, key=seed_bytes).digest()
+            a = int.from_bytes(digest[:8], "little") % _MERSENNE_PRIME or 1
+            b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+            self._perms.append((a, b))
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = {}
+        self._items: Dict[Hashable, Tuple[Set[str], List[Tuple[int, Tuple[int, ...]]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _signature(self, shingles: Iterable[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                  for s in shingles]
+        if not hashes:
+            return [0] * self.num_perm
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def add(self, key: Hashable, shingles: Set[str]) -> None:
+        self.remove(key)
+        band_keys = self._band_keys(self._signature(shingles))
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, set()).add(key)
+        self._items[key] = (shingles, band_keys)
+
+    def remove(self, key: Hashable) -> None:
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        for band_key in item[1]:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, shingles: Set[str], threshold: float,
+              accept: Optional[Callable[[Hashable], bool]] = None) -> Optional[Tuple[Hashable, float]]:
+        """Return the most similar stored key at or above threshold, if any."""
+        candidates: Set[Hashable] = set()
+        for band_key in self._band_keys(self._signature(shingles)):
+            candidates.update(self._buckets.get(band_key, ()))
+        best: Optional[Tuple[Hashable, float]] = None
+        for candidate in candidates:
+            if accept is not None and not accept(candidate):
+                continue
+            score = jaccard(shingles, self._items[candidate][0])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._items.clear()
+
+
+class AnswerCache:
+    """Two-level answer cache: exact normalized-text match, then MinHash near-duplicate match.
+
+    Shingle similarity alone lets two long questions that differ in one key word ("cold" and "flu")
+    clear the threshold, so a near-duplicate must also have exactly the same content words: only
+    stopwords, word order and repetition may differ.
+    """
+
+    LEVEL_EXACT = "exact"
+    LEVEL_NEAR_DUPLICATE = "near_duplicate"
+
+    def __init__(self, max_entries: int, max_bytes: int, similarity_threshold: float):
+        self.similarity_threshold = similarity_threshold
+        self._store = TTLCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._index = MinHashIndex()
+        self.exact_hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(question: str, include_youtube: bool) -> Tuple[str, bool]:
+        return normalize_text(question), bool(include_youtube)
+
+    def get(self, question: str, include_youtube: bool) -> Optional[Tuple[Any, str]]:
+        key = self.make_key(question, include_youtube)
+        value = self._store.get(key)
+        if value is not None:
+            self.exact_hits += 1
+            return value, self.LEVEL_EXACT
+        if key not in self._store:
+            self._index.remove(key)
+        # The YouTube flag changes the answer payload, so near-duplicates only match within the same flag.
+        words = content_words(key[0])
+        match = self._index.query(word_shingles(key[0]), self.similarity_threshold,
+                                  accept=lambda candidate: candidate[1] == key[1] and content_words(candidate[0]) == words)
+        if match is not None:
+            value = self._store.get(match[0])
+            if value is not None:
+                self.near_duplicate_hits += 1
+                return value, self.LEVEL_NEAR_DUPLICATE
+            self._index.remove(match[0])
+        self.misses += 1
+        return None
+
+    def put(self, question: str, include_youtube: bool, value: Any, ttl_seconds: float, size: int) -> None:
+        key = self.make_key(question, include_youtube)
+        for evicted_key in self._store.set(key, value, ttl_seconds, size):
+            self._index.remove(evicted_key)
+        if key in self._store:
+            self._index.add(key, word_shingles(key[0]))
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        store_stats = self._store.stats()
+        return {
+            "entries": store_stats["entries"], "bytes": store_stats["bytes"], "max_bytes": self._store.max_bytes,
+            "exact_hits": self.exact_hits, "near_duplicate_hits": self.near_duplicate_hits, "misses": self.misses,
+            "evictions": store_stats["evictions"], "expirations": store_stats["expirations"],
+        }
+
+
+class SearchCache:
+    """TTL cache for upstream search results with single-flight coalescing of identical in-flight queries.
+
+    The upstream fetch runs in its own task and callers await it through asyncio.shield, so a caller being
+    cancelled (for example a discarded speculative search) never cancels the fetch other callers share.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._store = TTLCache(max_entries=max_entries)
+        self._in_flight: Dict[Tuple[str, str], "asyncio.Future[Any]"] = {}
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    @staticmethod
+    def make_key(source: str, query: str) -> Tuple[str, str]:
+        return source, normalize_text(query)
+
+    async def get_or_fetch(self, source: str, query: str, fetch: Callable[[], Awaitable[Any]],
+                           cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        key = self.make_key(source, query)
+        value = self._store.get(key)
+        if value is not None:
+            return value
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_fetch_done(key, done, cacheable))
+        return await asyncio.shield(task)
+
+    def put(self, source: str, query: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Seed an entry fetched elsewhere (e.g. warmed from a shared cache)."""
+        self._store.set(self.make_key(source, query), value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    def invalidate(self, source: str, query: str) -> None:
+        """Drop the cached result, so the next lookup fetches it again (joining a fetch already in flight)."""
+        self._store.pop(self.make_key(source, query))
+
+    def _on_fetch_done(self, key: Tuple[str, str], task: "asyncio.Future[Any]",
+                       cacheable: Optional[Callable[[Any], bool]]) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        if value is not None and (cacheable is None or cacheable(value)):
+            self._store.set(key, value, self.ttl_seconds)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        store_stats = self._store.stats()
+        return {
+            "entries": store_stats["entries"], "hits": store_stats["hits"], "misses": store_stats["misses"],
+            "coalesced": self.coalesced, "upstream_calls": self.upstream_calls,
+            "in_flight": len(self._in_flight), "expirations": store_stats["expirations"],
+            "evictions": store_stats["evictions"],
+        }
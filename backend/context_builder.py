@@ -0,0 +1,144 @@
+import math
+import re
+from typing import Dict, List, Sequence, Set, Tuple
+
+from caching import jaccard, normalize_text, word_shingles
+
+# A section is a header line plus the passages under it, e.g. the DDG snippets or one block per video.
+Section = Tuple[str, List[str]]
+
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+_CHARS_PER_WORD_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count: one per punctuation mark, one per ~4 characters of each word."""
+    return sum(math.ceil(len(piece) / _CHARS_PER_WORD_TOKEN) for piece in _TOKEN_PIECE_RE.findall(text))
+
+
+def split_passages(text: str, max_tokens: int) -> List[str]:
+    """Split free text into sentence-aligned passages of at most roughly max_tokens each.
+
+    Repeated sentences (cookie banners, newsletter prompts scraped from every result) are kept once.
+    """
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    seen_sentences: Set[str] = set()
+    for sentence in _SENTENCE_BOUNDARY_RE.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        normalized = normalize_text(sentence)
+        if not normalized or normalized in seen_sentences:
+            continue
+        seen_sentences.add(normalized)
+        sentence_tokens = estimate_tokens(sentence)
+        if current and current_tokens + sentence_tokens > max_tokens:
+            passages.append(" ".join(current))
+            current, current_tokens = [], 0
+        if sentence_tokens > max_tokens:
+            passages.extend(_split_long_sentence(sentence, max_tokens))
+            continue
+        current.append(sentence)
+        current_tokens += sentence_tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _split_long_sentence(sentence: str, max_tokens: int) -> List[str]:
+    chunks, words, tokens = [], [], 0
+    for word in sentence.split():
+        word_tokens = estimate_tokens(word)
+        if words and tokens + word_tokens > max_tokens:
+            chunks.append(" ".join(words))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def bm25_scores(query: str, passages: Sequence[str], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """BM25 of each passage against query, with document frequencies taken from the passages themselves."""
+    query_terms = set(normalize_text(query).split())
+    passage_terms = [normalize_text(passage).split() for passage in passages]
+    if not query_terms or not passage_terms:
+        return [0.0] * len(passages)
+    doc_freq: Dict[str, int] = {}
+    for terms in passage_terms:
+        for term in query_terms.intersection(terms):
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+    count = len(passage_terms)
+    avg_length = sum(len(terms) for terms in passage_terms) / count or 1.0
+    idf = {term: math.log(1.0 + (count - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+    scores = []
+    for terms in passage_terms:
+        freqs: Dict[str, int] = {}
+        for term in terms:
+            if term in idf:
+                freqs[term] = freqs.get(term, 0) + 1
+        length_factor = k1 * (1.0 - b + b * len(terms) / avg_length)
+        scores.append(sum(idf[term] * freq * (k1 + 1.0) / (freq + length_factor) for term, freq in freqs.items()))
+    return scores
+
+
+def compact_context(sections: Sequence[Section], question: str, token_budget: int,
+                    duplicate_threshold: float = 0.8) -> Tuple[str, int, int]:
+    """Pack the passages most relevant to question into token_budget.
+
+    Near-duplicate passages (word-shingle Jaccard at or above duplicate_threshold) are dropped, keeping
+    the first. Every non-empty section keeps its best passage if it fits, so a source the caller asked
+    for is never squeezed out entirely; the rest of the budget goes to the highest BM25 passages overall,
+    and passages sharing no terms with the question are not used as filler.
+    Kept passages are emitted in their original order under their section headers.
+    Returns the packed text with its estimated token count and the estimated count before packing.
+    """
+    candidates: List[Tuple[int, int, str]] = []  # (section index, position, passage)
+    seen_shingles: List[Set[str]] = []
+    for section_index, (_, passages) in enumerate(sections):
+        for position, passage in enumerate(passages):
+            shingles = word_shingles(normalize_text(passage))
+            if any(jaccard(shingles, seen) >= duplicate_threshold for seen in seen_shingles):
+                continue
+            seen_shingles.append(shingles)
+            candidates.append((section_index, position, passage))
+
+    raw_tokens = sum(estimate_tokens(header) + sum(estimate_tokens(p) for p in passages)
+                     for header, passages in sections if passages)
+    scores = bm25_scores(question, [passage for _, _, passage in candidates])
+    costs = [estimate_tokens(passage) for _, _, passage in candidates]
+    header_costs = [estimate_tokens(header) for header, _ in sections]
+    # Highest score first; ties keep the sources' own ordering, which is usually their relevance order.
+    ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], candidates[i][0], candidates[i][1]))
+
+    selected: Set[int] = set()
+    used_sections: Set[int] = set()
+    used_tokens = 0
+
+    def try_select(i: int) -> None:
+        nonlocal used_tokens
+        section_index = candidates[i][0]
+        cost = costs[i] + (0 if section_index in used_sections else header_costs[section_index])
+        if used_tokens + cost <= token_budget:
+            selected.add(i)
+            used_sections.add(section_index)
+            used_tokens += cost
+
+    for section_index in range(len(sections)):
+        best = next((i for i in ranked if candidates[i][0] == section_index), None)
+        if best is not None:
+            try_select(best)
+    for i in ranked:
+        if scores[i] <= 0.0:
+            break
+        if i not in selected:
+            try_select(i)
+
+    blocks = []
+    for section_index, (header, _) in enumerate(sections):
+        kept = [candidates[i][2] for i in sorted(selected) if candidates[i][0] == section_index]
+        if kept:
+            blocks.append(header + "\n" + "\n".join(kept))
+    return "\n\n".join(blocks), used_tokens, raw_tokens
@@ -0,0 +1,96 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+HEDGE_WINNER_PRIMARY = "primary"
+HEDGE_WINNER_HEDGE = "hedge"
+
+
+class DeadlineExceeded(Exception):
+    """A stage could not finish before the request's end-to-end deadline."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """End-to-end time budget for one request, shared by every stage it passes through.
+
+    A budget of None (or zero) means no deadline; remaining() is then infinite.
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.expires_at = time.monotonic() + self.seconds if self.seconds else math.inf
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def budget(self, cap: float, reserve: float = 0.0) -> float:
+        """Time a stage may spend: its own cap, cut short so reserve seconds remain for later stages."""
+        return max(0.0, min(cap, self.remaining() - reserve))
+
+
+class LatencyWindow:
+    """The most recent observations of one latency, for percentiles that track the current tail."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def hedged_call(primary: Callable[[], Awaitable[T]], hedge: Callable[[], Awaitable[Optional[T]]],
+                      hedge_delay: float, timeout: float) -> Tuple[T, str]:
+    """Run primary; if it has not finished after hedge_delay, also run hedge and take whichever wins.
+
+    hedge may return None to decline (for example when no rate-limit token is free), in which case only
+    primary is awaited. A call that fails while the other is still running is ignored in favour of the
+    other. The loser is cancelled. Raises asyncio.TimeoutError once timeout seconds have passed overall.
+    """
+    started = time.monotonic()
+    primary_task = asyncio.ensure_future(primary())
+    tasks = {primary_task: HEDGE_WINNER_PRIMARY}
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=min(hedge_delay, timeout))
+        if done:
+            return primary_task.result(), HEDGE_WINNER_PRIMARY
+        hedge_task = asyncio.ensure_future(hedge())
+        tasks[hedge_task] = HEDGE_WINNER_HEDGE
+        pending = set(tasks)
+        failures = []
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in sorted(done, key=lambda t: tasks[t] != HEDGE_WINNER_PRIMARY):
+                if task.exception() is not None:
+                    failures.append(task.exception())
+                elif task is not hedge_task or task.result() is not None:  # None: the hedge declined to run
+                    return task.result(), tasks[task]
+        raise failures[0]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,218 @@
+import json
+import math
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from caching import normalize_text
+
+MAGIC = b"SGKIDX01"
+FORMAT_VERSION = 1
+_HEADER_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize_text(text).split()
+
+
+def _pad(buffer: bytearray) -> None:
+    buffer.extend(b"\0" * (-len(buffer) % _ALIGNMENT))
+
+
+def _idf(doc_count: int, doc_freq: int) -> float:
+    return math.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def build_knowledge_index(records: Iterable[Dict[str, Any]], path: str, k1: float = 1.2, b: float = 0.75) -> int:
+    """Write a BM25 index over record["question"]; each record is stored whole as the document payload.
+
+    Layout: magic, a length-prefixed JSON header (parameters, term dictionary, section offsets), then
+    8-byte aligned sections of doc lengths (uint32), doc weights (float64), payload offsets (uint64),
+    per-term postings (uint32 doc ids followed by uint32 term frequencies) and JSON payloads.
+    Returns the number of documents written.
+    """
+    documents = [(Counter(tokenize(record["question"])), record) for record in records]
+    documents = [(terms, record) for terms, record in documents if terms]
+    doc_count = len(documents)
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for doc_id, (terms, _) in enumerate(documents):
+        for term, freq in terms.items():
+            postings.setdefault(term, []).append((doc_id, freq))
+    doc_lengths = [sum(terms.values()) for terms, _ in documents]
+    avg_doc_length = sum(doc_lengths) / doc_count if doc_count else 0.0
+    idf = {term: _idf(doc_count, len(entries)) for term, entries in postings.items()}
+    # Sum of idf over a document's distinct terms: what a query identical to it would score.
+    doc_weights = [sum(idf[term] for term in terms) for terms, _ in documents]
+
+    body = bytearray()
+    sections = {}
+    sections["doc_lengths"] = len(body)
+    body.extend(struct.pack(f"<{doc_count}I", *doc_lengths))
+    _pad(body)
+    sections["doc_weights"] = len(body)
+    body.extend(struct.pack(f"<{doc_count}d", *doc_weights))
+    payloads = [json.dumps(record, separators=(",", ":")).encode("utf-8") for _, record in documents]
+    sections["payload_offsets"] = len(body)
+    offset = 0
+    for payload in payloads:
+        body.extend(struct.pack("<Q", offset))
+        offset += len(payload)
+    body.extend(struct.pack("<Q", offset))
+    term_dictionary = {}
+    for term in sorted(postings):
+        entries = postings[term]
+        term_dictionary[term] = [len(entries), len(body)]
+        body.extend(struct.pack(f"<{len(entries)}I", *(doc_id for doc_id, _ in entries)))
+        body.extend(struct.pack(f"<{len(entries)}I", *(freq for _, freq in entries)))
+    _pad(body)
+    sections["payloads"] = len(body)
+    for payload in payloads:
+        body.extend(payload)
+
+    header = json.dumps({
+        "version": FORMAT_VERSION, "doc_count": doc_count, "avg_doc_length": avg_doc_length, "k1": k1, "b": b,
+        "sections": sections, "terms": term_dictionary,
+    }, separators=(",", ":")).encode("utf-8")
+    prefix = bytearray(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+    _pad(prefix)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        f.write(body)
+    os.replace(tmp_path, path)
+    return doc_count
+
+
+class KnowledgeIndex:
+    """Read side of a knowledge index file, memory-mapped so answers are paged in only when served.
+
+    The term dictionary is decoded into a dict on open; postings, document statistics and payloads are
+    read straight out of the mapping. A candidate's match score is its idf-weighted term overlap with the
+    query, divided by the larger of the query's and the document's total idf. That score lands in [0, 1],
+    is 1.0 for the same wording and drops for extra terms on either side, so it works as a fixed serving
+    threshold where raw BM25 scores do not; BM25 picks the best among candidates that clear it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            view.release()
+            self.close()
+            raise ValueError(f"{path} is not a knowledge index file")
+        header_length, = _HEADER_LENGTH.unpack_from(view, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(bytes(view[header_start:header_start + header_length]))
+        if header["version"] != FORMAT_VERSION:
+            view.release()
+            self.close()
+            raise ValueError(f"Unsupported knowledge index version {header['version']}")
+        body_start = header_start + header_length
+        body_start += -body_start % _ALIGNMENT
+        self._view = view
+        self.doc_count: int = header["doc_count"]
+        self.avg_doc_length: float = header["avg_doc_length"] or 1.0
+        self.k1: float = header["k1"]
+        self.b: float = header["b"]
+        self._terms: Dict[str, List[int]] = header["terms"]
+        sections = {name: body_start + offset for name, offset in header["sections"].items()}
+        self._body_start = body_start
+        self._doc_lengths = view[sections["doc_lengths"]:sections["doc_lengths"] + 4 * self.doc_count].cast("I")
+        self._doc_weights = view[sections["doc_weights"]:sections["doc_weights"] + 8 * self.doc_count].cast("d")
+        self._payload_offsets = view[sections["payload_offsets"]:
+                                     sections["payload_offsets"] + 8 * (self.doc_count + 1)].cast("Q")
+        self._payloads_start = sections["payloads"]
+        self._unknown_term_idf = _idf(self.doc_count, 0)
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def _postings(self, term: str) -> Optional[Tuple[memoryview, memoryview]]:
+        entry = self._terms.get(term)
+        if entry is None:
+            return None
+        doc_freq, offset = entry
+        start = self._body_start + offset
+        doc_ids = self._view[start:start + 4 * doc_freq].cast("I")
+        freqs = self._view[start + 4 * doc_freq:start + 8 * doc_freq].cast("I")
+        return doc_ids, freqs
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        start = self._payloads_start + self._payload_offsets[doc_id]
+        end = self._payloads_start + self._payload_offsets[doc_id + 1]
+        return json.loads(bytes(self._view[start:end]))
+
+    def search(self, question: str, min_score: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Best stored record for question and its normalized score, if the score reaches min_score."""
+        self.lookups += 1
+        query_terms = set(tokenize(question))
+        if not query_terms or not self.doc_count:
+            return None
+        query_weight = 0.0
+        query_postings = []
+        for term in query_terms:
+            postings = self._postings(term)
+            if postings is None:
+                query_weight += self._unknown_term_idf
+                continue
+            idf = _idf(self.doc_count, len(postings[0]))
+            query_weight += idf
+            query_postings.append((idf, postings))
+        # Rarest terms first. Once the idf still to come cannot lift a document that has not matched yet
+        # to min_score, common terms ("what", "is") only update existing candidates via binary search
+        # instead of walking postings that cover most of the index.
+        query_postings.sort(key=lambda item: item[0], reverse=True)
+        remaining_weight = sum(idf for idf, _ in query_postings)
+        scores: Dict[int, float] = {}
+        matched_weights: Dict[int, float] = {}
+        length_norm = self.k1 * (1.0 - self.b)
+        length_scale = self.k1 * self.b / self.avg_doc_length
+        for idf, (doc_ids, freqs) in query_postings:
+            if remaining_weight >= min_score * query_weight:
+                matches = zip(doc_ids, freqs)
+            else:
+                matches = []
+                for doc_id in scores:
+                    position = bisect_left(doc_ids, doc_id)
+                    if position < len(doc_ids) and doc_ids[position] == doc_id:
+                        matches.append((doc_id, freqs[position]))
+            for doc_id, freq in matches:
+                tf_weight = freq * (self.k1 + 1.0) / (freq + length_norm + length_scale * self._doc_lengths[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf_weight
+                matched_weights[doc_id] = matched_weights.get(doc_id, 0.0) + idf
+            remaining_weight -= idf
+        best: Optional[Tuple[float, int, float]] = None
+        for doc_id, bm25 in scores.items():
+            score = matched_weights[doc_id] / max(query_weight, self._doc_weights[doc_id])
+            if score >= min_score and (best is None or bm25 > best[0]):
+                best = (bm25, doc_id, score)
+        if best is None:
+            return None
+        self.hits += 1
+        return self.document(best[1]), best[2]
+
+    def close(self) -> None:
+        for name in ("_doc_lengths", "_doc_weights", "_payload_offsets", "_view"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path, "documents": self.doc_count, "terms": len(self._terms),
+            "lookups": self.lookups, "hits": self.hits,
+        }
@@ -0,0 +1,80 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+def _trie_regex(phrases: Iterable[str]) -> str:
+    """Build a regex from a character trie of the phrases.
+
+    Shared prefixes are factored out (``current(?:ly)?`` rather than ``current|currently``), which lets the
+    re engine reject most positions after one or two characters instead of trying every alternative.
+    Greedy optional groups make the longest phrase win at a given start position.
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def branches(node: Dict) -> List[str]:
+        return [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+
+    def render(node: Dict) -> str:
+        node_branches = branches(node)
+        if not node_branches:
+            return ""
+        body = node_branches[0] if len(node_branches) == 1 else "(?:" + "|".join(node_branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    # The top level is left as a bare alternation so the re compiler can derive a first-character set
+    # and skip positions that cannot start any phrase.
+    return "|".join(branches(trie))
+
+
+class PhraseMatcher:
+    """Multi-pattern substring matcher over categorized phrase tables, compiled once.
+
+    Matching is plain substring matching on already-lowercased text, the same semantics as a series of
+    ``phrase in text`` checks, but done in one regex pass.
+    """
+
+    def __init__(self, phrases_by_category: Dict[str, Iterable[str]]):
+        self._categories_by_phrase: Dict[str, set] = {}
+        for category, phrases in phrases_by_category.items():
+            for phrase in phrases:
+                self._categories_by_phrase.setdefault(phrase, set()).add(category)
+        # At any position the regex reports only the longest phrase, so fold in the categories of every
+        # shorter phrase that is a prefix of it.
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        for phrase in self._categories_by_phrase:
+            implied = set()
+            for other, categories in self._categories_by_phrase.items():
+                if phrase.startswith(other):
+                    implied.update(categories)
+            self._implied[phrase] = frozenset(implied)
+        alternation = _trie_regex(self._categories_by_phrase)
+        self._search_pattern = re.compile(alternation)
+        # Zero-width lookahead so overlapping phrases starting at different positions are all seen.
+        self._scan_pattern = re.compile(f"(?=({alternation}))")
+        self.all_categories = frozenset(c for cats in self._categories_by_phrase.values() for c in cats)
+
+    def search(self, text: str) -> Optional[Tuple[str, FrozenSet[str]]]:
+        """Leftmost matching phrase and its categories, or None."""
+        match = self._search_pattern.search(text)
+        if match is None:
+            return None
+        return match.group(0), self._implied[match.group(0)]
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """Every category with at least one phrase occurring in text."""
+        found = set()
+        for match in self._scan_pattern.finditer(text):
+            found.update(self._implied[match.group(1)])
+            if len(found) == len(self.all_categories):
+                break
+        return frozenset(found)
+
+    def matches(self, text: str) -> List[str]:
+        return [match.group(1) for match in self._scan_pattern.finditer(text)]
@@ -0,0 +1,89 @@
+import string
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+class CompiledPrompt:
+    """A str.format-style template split once into literal text and placeholder slots.
+
+    Partials that are fixed for the life of the process (the word limits) are baked into the literal text
+    at compile time. The daily variable (the current date) is baked in the first time each new value is
+    seen, so a render only copies one list of merged literals and fills the per-request slots. Exposes
+    format(**values) like langchain's PromptTemplate.
+    """
+
+    def __init__(self, template: str, partial_variables: Optional[Mapping[str, str]] = None,
+                 daily_variable: Optional[str] = "current_date"):
+        partial_variables = partial_variables or {}
+        segments: List[Tuple[bool, str]] = []  # (is_placeholder, literal text or variable name)
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            if literal:
+                segments.append((False, literal))
+            if field_name is None:
+                continue
+            if not field_name.isidentifier() or format_spec or conversion:
+                raise ValueError(f"Unsupported placeholder in prompt template: {{{field_name}}}")
+            if field_name in partial_variables:
+                segments.append((False, str(partial_variables[field_name])))
+            else:
+                segments.append((True, field_name))
+        self._segments = segments
+        self.input_variables = list(dict.fromkeys(name for is_slot, name in segments if is_slot))
+        self.daily_variable = daily_variable if daily_variable in self.input_variables else None
+        self._parts, self._slots = self._compile(segments)
+        self._daily_value: Optional[str] = None
+        self._daily_parts, self._daily_slots = self._parts, self._slots
+
+    @staticmethod
+    def _compile(segments: List[Tuple[bool, str]]) -> Tuple[List[str], List[Tuple[int, str]]]:
+        """Merge adjacent literals; return the part list with empty slots and (index, variable) per slot."""
+        parts: List[str] = []
+        slots: List[Tuple[int, str]] = []
+        pending_literal: List[str] = []
+        for is_slot, text in segments:
+            if not is_slot:
+                pending_literal.append(text)
+                continue
+            if pending_literal:
+                parts.append("".join(pending_literal))
+                pending_literal = []
+            slots.append((len(parts), text))
+            parts.append("")
+        if pending_literal:
+            parts.append("".join(pending_literal))
+        return parts, slots
+
+    def _parts_for(self, daily_value: str) -> Tuple[List[str], List[Tuple[int, str]]]:
+        if daily_value != self._daily_value:
+            segments = [(False, daily_value) if is_slot and name == self.daily_variable else (is_slot, name)
+                        for is_slot, name in self._segments]
+            self._daily_parts, self._daily_slots = self._compile(segments)
+            self._daily_value = daily_value
+        return self._daily_parts, self._daily_slots
+
+    def format(self, **values: str) -> str:
+        if self.daily_variable is not None:
+            template_parts, slots = self._parts_for(values[self.daily_variable])
+        else:
+            template_parts, slots = self._parts, self._slots
+        parts = template_parts[:]
+        for index, name in slots:
+            parts[index] = values[name]
+        return "".join(parts)
+
+
+class PromptChain:
+    """A compiled prompt bound to a chat model: the rendered prompt goes straight to the model.
+
+    Replaces langchain's LLMChain for our single-prompt, single-output calls, skipping its input
+    validation, callback plumbing and output dict per call.
+    """
+
+    __slots__ = ("prompt", "llm")
+
+    def __init__(self, prompt: CompiledPrompt, llm: Any):
+        self.prompt = prompt
+        self.llm = llm
+
+    async def arun(self, values: Dict[str, str]) -> str:
+        message = await self.llm.ainvoke(self.prompt.format(**values))
+        return message.content if hasattr(message, "content") else str(message)
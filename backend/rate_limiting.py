@@ -0,0 +1,116 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Union
+
+
+class RateLimitExceeded(Exception):
+    """Capacity could not be obtained in time; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket for one upstream, refilled continuously at requests_per_minute.
+
+    Callers reserve a token up front, possibly driving the balance negative, and then sleep until their
+    reservation is covered. That keeps waiters in FIFO order without a lock; a caller whose wait would
+    exceed its timeout gives the token back and fails immediately instead of queueing.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int):
+        self.name = name
+        self.rate_per_second = requests_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self.granted = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    async def acquire(self, timeout: float) -> None:
+        self._refill()
+        self._tokens -= 1
+        wait_seconds = -self._tokens / self.rate_per_second if self._tokens < 0 else 0.0
+        if wait_seconds > timeout:
+            self._tokens += 1
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.name} rate limit reached", retry_after=wait_seconds)
+        if wait_seconds:
+            try:
+                await asyncio.sleep(wait_seconds)
+            except asyncio.CancelledError:
+                self._tokens += 1
+                raise
+            self.total_wait_seconds += wait_seconds
+        self.granted += 1
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        self._refill()
+        return {
+            "requests_per_minute": self.rate_per_second * 60.0, "burst": self.burst,
+            "available_tokens": round(max(self._tokens, 0.0), 2), "queued": max(0, -int(self._tokens // 1)),
+            "granted": self.granted, "rejected": self.rejected,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+        }
+
+
+class AdmissionController:
+    """Bounds concurrently processed requests, with a bounded wait queue and a queueing deadline.
+
+    Must be created inside the running event loop (asyncio primitives bind to it on Python 3.9).
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise RateLimitExceeded("Admission queue is full", retry_after=self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise RateLimitExceeded("Timed out waiting for admission", retry_after=self.queue_timeout)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent, "max_queue": self.max_queue, "active": self.active,
+            "waiting": self.waiting, "admitted": self.admitted, "shed": self.shed, "timed_out": self.timed_out,
+        }
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JsonlRecordWriter:
+    """Appends records as JSON lines to a file from a background thread.
+
+    write() only queues the record, so a caller on the event loop never waits on serialization or disk.
+    The writer thread appends whatever has queued up, each line with its own O_APPEND write, so several
+    processes can share the file without their lines interleaving. When the queue is full, records are
+    dropped and counted rather than blocking the caller. Records must not be mutated after write().
+    """
+
+    def __init__(self, path: str, queue_size: int = 1000):
+        self.path = path
+        self._queue: "queue.Queue[Any]" = queue.Queue(max(1, queue_size))
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Any] = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is _STOP for record in batch)
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                self._append(records)
+            if stop:
+                return
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except OSError as e:
+            self.errors += len(records)
+            logger.warning(f"Could not write {len(records)} record(s) to {self.path}: {e}")
+            return
+        try:
+            for record in records:
+                try:
+                    line = (json.dumps(record) + "\n").encode("utf-8")
+                    written = os.write(fd, line)
+                    while written < len(line):  # only on a full disk or a signal; finish the line
+                        written += os.write(fd, line[written:])
+                except (OSError, TypeError, ValueError) as e:
+                    self.errors += 1
+                    logger.warning(f"Could not write a record to {self.path}: {e}")
+                    continue
+                self.written += 1
+        finally:
+            os.close(fd)
+
+    def stop(self) -> None:
+        """Write out everything queued so far and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"path": self.path, "queued": self._queue.qsize(), "written": self.written,
+                "dropped": self.dropped, "errors": self.errors}
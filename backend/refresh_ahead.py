@@ -0,0 +1,206 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from caching import AnswerCache
+from rate_limiting import RateLimitExceeded, TokenBucket
+
+REFRESH_REFRESHED = "refreshed"
+REFRESH_FAILED = "failed"
+REFRESH_SKIPPED = "skipped"
+
+
+class RefreshEntry:
+    """One tracked question: how hot it is, when its cached answer expires and what that answer said."""
+
+    __slots__ = ("question", "include_youtube", "score", "scored_at", "expires_at", "answer", "retry_at")
+
+    def __init__(self, question: str, include_youtube: bool, now: float):
+        self.question = question
+        self.include_youtube = include_youtube
+        self.score = 0.0
+        self.scored_at = now
+        self.expires_at: Optional[float] = None  # unknown until an answer for it is cached
+        self.answer: Optional[str] = None
+        self.retry_at = 0.0
+
+
+RefreshFunction = Callable[[RefreshEntry], Awaitable[str]]
+
+
+class RefreshAheadScheduler:
+    """Recomputes the cached answers of hot time-sensitive questions shortly before they expire.
+
+    Hotness is a hit count that halves every half_life_seconds. A question becomes due
+    refresh_before_seconds ahead of its answer's expiry, and due questions at least min_hotness hot
+    are refreshed hottest first. Refreshes draw on their own token bucket of refreshes_per_minute, so
+    the upstream calls they make stay within a fixed budget on top of user traffic; a due question
+    the budget cannot cover waits for the next tick.
+
+    refresh is called with the entry and returns REFRESH_REFRESHED, REFRESH_FAILED or REFRESH_SKIPPED
+    (an exception counts as failed). It is expected to cache the new answer, which reports the new
+    expiry back through track_answer. Times are time.monotonic() seconds.
+    """
+
+    def __init__(self, refresh: RefreshFunction, refreshes_per_minute: float, burst: int, max_concurrent: int,
+                 interval_seconds: float, refresh_before_seconds: float, min_hotness: float,
+                 half_life_seconds: float, max_tracked: int, retry_after_seconds: float = 60.0):
+        self.refresh = refresh
+        self.budget = TokenBucket("Refresh-ahead", refreshes_per_minute, max(1, burst))
+        self.max_concurrent = max(1, max_concurrent)
+        self.interval_seconds = interval_seconds
+        self.refresh_before_seconds = refresh_before_seconds
+        self.min_hotness = min_hotness
+        self.half_life_seconds = half_life_seconds
+        self.max_tracked = max_tracked
+        self.retry_after_seconds = retry_after_seconds
+        self._entries: Dict[Hashable, RefreshEntry] = {}
+        self._in_flight: Set[Hashable] = set()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._started_at: Deque[float] = deque()  # refresh start times within the last minute
+        self.outcomes = {REFRESH_REFRESHED: 0, REFRESH_FAILED: 0, REFRESH_SKIPPED: 0}
+        self.budget_deferrals = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.total_lag_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def _hotness(self, entry: RefreshEntry, now: float) -> float:
+        if self.half_life_seconds <= 0:
+            return entry.score
+        return entry.score * 0.5 ** ((now - entry.scored_at) / self.half_life_seconds)
+
+    def _entry(self, question: str, include_youtube: bool, now: float) -> RefreshEntry:
+        key = AnswerCache.make_key(question, include_youtube)
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.max_tracked:
+                self._evict_coldest(now)
+            entry = self._entries[key] = RefreshEntry(question, include_youtube, now)
+        return entry
+
+    def _evict_coldest(self, now: float) -> None:
+        candidates = [key for key in self._entries if key not in self._in_flight]
+        if candidates:
+            del self._entries[min(candidates, key=lambda key: self._hotness(self._entries[key], now))]
+
+    def record_hit(self, question: str, include_youtube: bool) -> None:
+        """Count one request for question, answered from the cache or not."""
+        now = time.monotonic()
+        entry = self._entry(question, include_youtube, now)
+        entry.score = self._hotness(entry, now) + 1.0
+        entry.scored_at = now
+
+    def track_answer(self, question: str, include_youtube: bool, answer: str, ttl_seconds: float) -> None:
+        """Note a newly cached answer for question and when it expires; hotness is left unchanged."""
+        now = time.monotonic()
+        entry = self._entry(question, include_youtube, now)
+        entry.answer = answer
+        entry.expires_at = now + ttl_seconds
+        entry.retry_at = 0.0
+
+    def _due_at(self, entry: RefreshEntry) -> float:
+        return entry.expires_at - self.refresh_before_seconds
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[Hashable, RefreshEntry]]:
+        """Questions waiting for a refresh, hottest first."""
+        now = time.monotonic() if now is None else now
+        queue = []
+        for key, entry in self._entries.items():
+            hotness = self._hotness(entry, now)
+            if hotness < self.min_hotness or entry.expires_at is None or key in self._in_flight or \
+                    now < entry.retry_at or now < self._due_at(entry):
+                continue
+            queue.append((hotness, key, entry))
+        queue.sort(key=lambda item: item[0], reverse=True)
+        return [(key, entry) for _, key, entry in queue]
+
+    def _prune(self, now: float) -> None:
+        """Drop cold entries whose answer has expired, and refresh start times older than a minute."""
+        for key, entry in list(self._entries.items()):
+            if (entry.expires_at is None or entry.expires_at <= now) and key not in self._in_flight and \
+                    self._hotness(entry, now) < self.min_hotness / 2:
+                del self._entries[key]
+        while self._started_at and self._started_at[0] <= now - 60.0:
+            self._started_at.popleft()
+
+    async def tick(self) -> int:
+        """Start refreshes for due questions while budget and concurrency allow; returns how many started."""
+        now = time.monotonic()
+        self._prune(now)
+        started = 0
+        for key, entry in self.due(now):
+            if len(self._in_flight) >= self.max_concurrent:
+                break
+            try:
+                await self.budget.acquire(0.0)
+            except RateLimitExceeded:
+                self.budget_deferrals += 1
+                break
+            lag = max(0.0, now - self._due_at(entry))
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            self.total_lag_seconds += lag
+            self._started_at.append(now)
+            self._in_flight.add(key)
+            task = asyncio.create_task(self._run_refresh(key, entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def _run_refresh(self, key: Hashable, entry: RefreshEntry) -> None:
+        try:
+            outcome = await self.refresh(entry)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            outcome = REFRESH_FAILED
+        finally:
+            self._in_flight.discard(key)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if outcome != REFRESH_REFRESHED:
+            entry.retry_at = time.monotonic() + self.retry_after_seconds
+
+    async def run(self) -> None:
+        """Tick every interval_seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.tick()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"  # keep the loop alive
+
+    async def stop(self) -> None:
+        """Cancel refreshes still in flight."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def budget_used(self) -> float:
+        """Refreshes started over the last minute as a fraction of the per-minute budget."""
+        cutoff = time.monotonic() - 60.0
+        started = sum(1 for started_at in self._started_at if started_at > cutoff)
+        per_minute = self.budget.rate_per_second * 60.0
+        return started / per_minute if per_minute > 0 else 0.0
+
+    def queue_lag(self, queue: List[Tuple[Hashable, RefreshEntry]]) -> float:
+        """How long the longest-waiting due question has been overdue."""
+        now = time.monotonic()
+        return max((now - self._due_at(entry) for _, entry in queue), default=0.0)
+
+    def stats(self) -> Dict[str, object]:
+        """Read-only: entries are pruned by tick, not here."""
+        queue = self.due()
+        refreshes = sum(self.outcomes.values()) + len(self._in_flight)
+        return {
+            "tracked": len(self._entries), "queue_depth": len(queue), "in_flight": len(self._in_flight),
+            "queue_lag_seconds": round(self.queue_lag(queue), 3),
+            "last_lag_seconds": round(self.last_lag_seconds, 3), "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "mean_lag_seconds": round(self.total_lag_seconds / refreshes, 3) if refreshes else 0.0,
+            "budget_used": round(self.budget_used(), 3), "budget_deferrals": self.budget_deferrals,
+            "budget": self.budget.stats(), "outcomes": dict(self.outcomes), "last_error": self.last_error,
+        }
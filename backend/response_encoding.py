@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+# Both are optional: orjson for encoding, brotli for the "br" content coding. Without them responses
+# fall back to the json module and gzip.
+_orjson = importlib.import_module("orjson") if importlib.util.find_spec("orjson") else None
+_brotli = importlib.import_module("brotli") if importlib.util.find_spec("brotli") else None
+
+ENCODING_BROTLI = "br"
+ENCODING_GZIP = "gzip"
+ENCODING_IDENTITY = "identity"
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, through orjson when it is installed."""
+    if _orjson is not None:
+        return _orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compact_answer_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the fields a compact response repeats elsewhere, in place.
+
+    source_urls is the flattened copy of the web URLs in additional_resources, and
+    additional_resources["youtube_videos_urls"] repeats the url of each entry in youtube_videos.
+    Null fields are expected to be excluded already.
+    """
+    payload.pop("source_urls", None)
+    resources = payload.get("additional_resources")
+    if resources and payload.get("youtube_videos"):
+        resources.pop("youtube_videos_urls", None)
+        if not resources:
+            del payload["additional_resources"]
+    return payload
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Content codings we can produce, in order of preference."""
+    return (ENCODING_BROTLI, ENCODING_GZIP) if _brotli is not None else (ENCODING_GZIP,)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick a content coding from an Accept-Encoding header: the highest q-value wins, ties go to our preference.
+
+    Memoized on the raw header value, which is the same on every request from a given client build.
+    """
+    if not accept_encoding:
+        return ENCODING_IDENTITY
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            weights[coding.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    best, best_quality = ENCODING_IDENTITY, 0.0
+    for coding in available_encodings():
+        quality = weights.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == ENCODING_BROTLI:
+        return _brotli.compress(body, quality=brotli_quality)
+    if encoding == ENCODING_GZIP:
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    return body
+
+
+# Bodies that are served again and again (cache hits) are compressed once per coding.
+compress_reused = lru_cache(maxsize=512)(compress)
+
+
+def make_etag(body: bytes) -> str:
+    """Weak validator for the uncompressed body, so it matches whichever coding the client got it in."""
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: the W/ prefix is ignored on both sides."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
@@ -0,0 +1,144 @@
+import json
+import math
+import random
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from caching import normalize_text
+
+HEAD_SEARCH = "search_changes_answer"
+HEAD_YOUTUBE = "youtube_contributes"
+HEADS = (HEAD_SEARCH, HEAD_YOUTUBE)
+
+Features = Dict[int, float]
+
+# Numbers, and capitalized words that do not start a sentence: the kind of fact an update changes.
+_FACT_TOKEN_RE = re.compile(r"\d[\d,.:%]*|(?<=[a-z,;] )[A-Z][\w'-]+")
+
+
+def hashed_features(question: str, n_bits: int) -> Features:
+    """Word unigrams and bigrams plus a question-word marker, hashed into 2**n_bits buckets, L2-normalized."""
+    words = normalize_text(question).split()
+    grams = list(words)
+    grams.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    if words:
+        grams.append(f"^{words[0]}")
+    mask = (1 << n_bits) - 1
+    features: Features = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) & mask
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+
+class LogisticHead:
+    """Sparse logistic regression over hashed features, with its own decision threshold."""
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None, bias: float = 0.0, threshold: float = 0.5):
+        self.weights = weights or {}
+        self.bias = bias
+        self.threshold = threshold
+
+    def predict_proba(self, features: Features) -> float:
+        z = self.bias + sum(self.weights.get(index, 0.0) * value for index, value in features.items())
+        if z < -30.0:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def to_dict(self) -> Dict:
+        return {"bias": self.bias, "threshold": self.threshold,
+                "weights": {str(index): round(weight, 6) for index, weight in self.weights.items() if weight}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LogisticHead":
+        return cls({int(index): weight for index, weight in data["weights"].items()}, data["bias"], data["threshold"])
+
+
+def train_logistic(examples: Sequence[Tuple[Features, bool]], epochs: int = 20, learning_rate: float = 0.5,
+                   l2: float = 1e-4, seed: int = 0) -> LogisticHead:
+    """Plain SGD on log loss. Positives are weighted up to balance the classes, since missed updates are rare."""
+    head = LogisticHead()
+    positives = sum(1 for _, label in examples if label)
+    if not examples or positives in (0, len(examples)):
+        head.bias = 10.0 if positives else -10.0
+        return head
+    positive_weight = (len(examples) - positives) / positives
+    order = list(range(len(examples)))
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        rate = learning_rate / (1.0 + epoch)
+        for i in order:
+            features, label = examples[i]
+            error = head.predict_proba(features) - (1.0 if label else 0.0)
+            if label:
+                error *= positive_weight
+            head.bias -= rate * error
+            for index, value in features.items():
+                weight = head.weights.get(index, 0.0)
+                head.weights[index] = weight - rate * (error * value + l2 * weight)
+    return head
+
+
+class SearchDecisionModel:
+    """Two logistic heads over the question: will search change the answer, will YouTube contribute."""
+
+    def __init__(self, heads: Dict[str, LogisticHead], n_bits: int = 18):
+        self.heads = heads
+        self.n_bits = n_bits
+
+    def predict(self, question: str) -> Dict[str, float]:
+        features = hashed_features(question, self.n_bits)
+        return {name: head.predict_proba(features) for name, head in self.heads.items()}
+
+    def decide(self, question: str) -> Dict[str, bool]:
+        return {name: probability >= self.heads[name].threshold for name, probability in self.predict(question).items()}
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"n_bits": self.n_bits, "heads": {name: head.to_dict() for name, head in self.heads.items()}}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "SearchDecisionModel":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        heads = {name: LogisticHead.from_dict(head) for name, head in data["heads"].items()}
+        missing = [name for name in HEADS if name not in heads]
+        if missing:
+            raise ValueError(f"Search decision model is missing heads: {missing}")
+        return cls(heads, data["n_bits"])
+
+
+def fact_tokens(text: str) -> set:
+    return {token.rstrip(".,:").lower() for token in _FACT_TOKEN_RE.findall(text)}
+
+
+def search_changed_answer(direct_answer: str, final_answer: str, search_context: str, min_new_facts: int = 2) -> bool:
+    """Training label: the final answer carries facts (numbers, names) from search that the direct answer lacked."""
+    new_facts = fact_tokens(final_answer) - fact_tokens(direct_answer)
+    context_lower = search_context.lower()
+    return sum(1 for fact in new_facts if fact and fact in context_lower) >= min_new_facts
+
+
+def youtube_contributed(final_answer: str, video_titles: Iterable[str], video_channels: Iterable[str]) -> bool:
+    """Training label: the answer refers to one of the videos found, by channel or by most of a title."""
+    answer = normalize_text(final_answer)
+    if any(channel and normalize_text(channel) in answer for channel in video_channels):
+        return True
+    answer_words = set(answer.split())
+    for title in video_titles:
+        title_words = [word for word in normalize_text(title).split() if len(word) > 3]
+        if title_words and sum(word in answer_words for word in title_words) / len(title_words) >= 0.6:
+            return True
+    return False
+
+
+def choose_threshold(probabilities: List[float], labels: List[bool], min_recall: float) -> float:
+    """Highest threshold that still flags at least min_recall of the positives."""
+    positives = sorted((p for p, label in zip(probabilities, labels) if label), reverse=True)
+    if not positives:
+        return 0.5
+    needed = max(1, math.ceil(min_recall * len(positives)))
+    return positives[needed - 1]
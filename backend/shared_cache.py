@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_last_access ON cache_entries (namespace, last_access);
+"""
+
+
+class SharedCache:
+    """Cross-process cache in a local SQLite file, shared by every worker on the node.
+
+    Entries expire at a wall-clock deadline. Each namespace is capped at max_entries, and when it grows
+    past the cap the least recently used entries go first. last_access is refreshed at most once per
+    touch_interval seconds per read, so hot keys do not turn every read into a write. WAL mode lets
+    readers in one worker proceed while another worker writes.
+
+    Calls are synchronous: they are sub-millisecond local I/O, well below the cost of handing off to a
+    thread, and they run on the event loop of the worker that owns the connection. So that they stay
+    that cheap, they wait at most busy_timeout seconds for another worker's lock, and give up as a miss
+    or a skipped write when it is held longer. Only opening the file, at startup, waits open_timeout.
+    Entry counts come from the last COUNT(*) per namespace, taken on opening and by each eviction pass.
+    """
+
+    def __init__(self, path: str, max_entries: int, touch_interval: float = 60.0, evict_every: int = 64,
+                 busy_timeout: float = 0.05, open_timeout: float = 2.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.evict_every = evict_every
+        self._connection = sqlite3.connect(path, timeout=open_timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._entries: Dict[str, int] = dict(self._connection.execute(
+            "SELECT namespace, COUNT(*) FROM cache_entries GROUP BY namespace"
+        ).fetchall())
+        self._connection.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        self._writes_since_eviction = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.busy = 0
+        self.errors = 0
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        """Value and its remaining TTL in seconds, or None if absent or expired."""
+        now = time.time()
+        try:
+            row = self._connection.execute(
+                "SELECT value, expires_at, last_access FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            if now - row[2] >= self.touch_interval:
+                self._connection.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                )
+        except sqlite3.OperationalError:
+            self.busy += 1
+            self.misses += 1
+            return None
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        self.hits += 1
+        return row[0], row[1] - now
+
+    def set(self, namespace: str, key: str, value: str, ttl_seconds: float) -> None:
+        now = time.time()
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, now + ttl_seconds, now),
+            )
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self.writes += 1
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= self.evict_every:
+            self._writes_since_eviction = 0
+            self.evict(namespace)
+
+    def add(self, namespace: str, key: str, amount: int, ttl_seconds: float) -> Optional[int]:
+        """Add amount to an integer counter (created at 0) and return its new value, or None on failure.
+
+        The update is a single statement, so workers adding to the same counter never lose each other's
+        amounts. The expiry is set when the counter is created.
+        """
+        now = time.time()
+        try:
+            self._connection.execute(
+                "INSERT INTO cache_entries (namespace, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET "
+                "value = CAST(value AS INTEGER) + CAST(excluded.value AS INTEGER), last_access = excluded.last_access",
+                (namespace, key, str(amount), now + ttl_seconds, now),
+            )
+            row = self._connection.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return None
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        self.writes += 1
+        return int(row[0]) if row is not None else None
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self._connection.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.OperationalError:
+            self.busy += 1
+        except sqlite3.Error:
+            self.errors += 1
+
+    def evict(self, namespace: str) -> int:
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        try:
+            removed = self._connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+            ).rowcount
+            count = self._connection.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+            if count > self.max_entries:
+                removed += self._connection.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY last_access LIMIT ?)",
+                    (namespace, namespace, count - self.max_entries),
+                ).rowcount
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return 0
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+        self._entries[namespace] = min(count, self.max_entries)
+        self.evictions += removed
+        return removed
+
+    def recent(self, namespace: str, limit: int) -> List[Tuple[str, str, float]]:
+        """Up to limit live (key, value, remaining TTL) entries, least recently used first."""
+        now = time.time()
+        try:
+            rows = self._connection.execute(
+                "SELECT key, value, expires_at FROM ("
+                "SELECT key, value, expires_at, last_access FROM cache_entries "
+                "WHERE namespace = ? AND expires_at > ? ORDER BY last_access DESC LIMIT ?"
+                ") ORDER BY last_access",
+                (namespace, now, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            self.errors += 1
+            return []
+        return [(key, value, expires_at - now) for key, value, expires_at in rows]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "path": self.path, "entries": sum(self._entries.values()), "max_entries_per_namespace": self.max_entries,
+            "hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions,
+            "busy": self.busy, "errors": self.errors,
+        }
@@ -0,0 +1,270 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional, TextIO, Tuple
+
+# Per-request chatter goes to category loggers named LOGGER_PREFIX + category, sampled at the
+# category's rate. Everything else (startup, other libraries) is logged in full.
+LOGGER_PREFIX = "smartgenie."
+CATEGORY_GENERAL = "general"
+CATEGORY_REQUEST = "request"
+CATEGORY_SEARCH = "search"
+CATEGORY_LLM = "llm"
+CATEGORY_PAYLOAD = "payload"  # large values (LLM output, search text), passed as extra={"payload": value}
+
+LOG_FORMAT_JSON = "json"
+LOG_FORMAT_TEXT = "text"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_request_ids = itertools.count(1)
+_PROCESS_TAG = f"{os.getpid():x}"
+_active_handler: Optional["SampledQueueHandler"] = None  # set by configure_logging
+
+
+def category_logger(category: str) -> "CategoryLogger":
+    return CategoryLogger(logging.getLogger(LOGGER_PREFIX + category), category)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"search=0.25,llm=0.25" -> {"search": 0.25, "llm": 0.25}; rates are clamped to [0, 1]."""
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        category, _, rate = item.partition("=")
+        if category.strip() and rate.strip():
+            rates[category.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+# A payload held back for a request that may still fail: logger, level, msg, args, extra, time logged.
+HeldPayload = Tuple[logging.Logger, int, str, Tuple[Any, ...], Optional[Dict[str, Any]], float]
+
+
+class RequestLog:
+    """Logging state of one request: its ID, one sampling draw shared by every category, and the
+    payloads held back in case the request fails."""
+
+    __slots__ = ("request_id", "draw", "payloads", "errored")
+
+    def __init__(self) -> None:
+        self.request_id = f"{_PROCESS_TAG}-{next(_request_ids)}"
+        self.draw = random.random()
+        self.payloads: List[HeldPayload] = []
+        self.errored = False
+
+
+_request_log: ContextVar[Optional[RequestLog]] = ContextVar("request_log", default=None)
+
+
+@contextmanager
+def request_log_scope() -> Iterator[RequestLog]:
+    """Tag records logged inside (including by tasks started inside) with one request's ID and sampling draw."""
+    request_log = RequestLog()
+    token = _request_log.set(request_log)
+    try:
+        yield request_log
+    finally:
+        _request_log.reset(token)
+
+
+def _sampled(handler: "SampledQueueHandler", category: str, request_log: Optional[RequestLog]) -> bool:
+    rate = handler.sample_rates.get(category, 1.0)
+    return rate >= 1.0 or (request_log.draw if request_log is not None else random.random()) < rate
+
+
+class CategoryLogger(logging.LoggerAdapter):
+    """Logger for one category that samples before a record is even built.
+
+    Below WARNING, a call that is not sampled returns right after the sampling draw, without creating a
+    LogRecord or touching its arguments. A payload of a request that is not sampled is held back as the
+    raw call (at most payload_buffer_limit per request) and only turned into a record if the request
+    logs an error.
+    """
+
+    def __init__(self, logger: logging.Logger, category: str):
+        super().__init__(logger, {})
+        self.category = category
+
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        handler = _active_handler
+        if handler is None or level >= logging.WARNING or not self.logger.isEnabledFor(level):
+            super().log(level, msg, *args, **kwargs)
+            return
+        request_log = _request_log.get()
+        if _sampled(handler, self.category, request_log) or (request_log is not None and request_log.errored):
+            self.logger.log(level, msg, *args, **kwargs)
+        elif self.category == CATEGORY_PAYLOAD and request_log is not None and \
+                len(request_log.payloads) < handler.payload_buffer_limit:
+            request_log.payloads.append((self.logger, level, msg, args, kwargs.get("extra"), time.time()))
+            handler.payloads_held += 1
+        else:
+            handler.sampled_out += 1
+
+    def process(self, msg: Any, kwargs: MutableMapping[str, Any]) -> Tuple[Any, MutableMapping[str, Any]]:
+        return msg, kwargs
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that, once the queue runs dry, waits flush_interval before blocking on it again.
+
+    Records that arrive in the meantime are then written in one go, instead of the listener thread
+    waking up, and competing for the GIL, on every single record.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", *handlers: logging.Handler,
+                 respect_handler_level: bool = False, flush_interval: float = 0.05):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block: bool) -> Any:
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            if not block:
+                raise
+        time.sleep(self.flush_interval)
+        return self.queue.get()
+
+
+class SampledQueueHandler(QueueHandler):
+    """Hands records to a background listener thread, so the caller never formats or writes them.
+
+    A request's records are kept when its draw is below their category's rate, so a sampled request keeps
+    its records in every category sampled at least that often; CategoryLogger applies this before records
+    are built, and the handler applies it again to records from plain loggers under LOGGER_PREFIX.
+    Warnings and errors are always kept, and an error sends the payloads its request held back first.
+    Formatting is deferred to the listener thread, so log arguments must not be mutated after the call.
+    When the queue is full, records are dropped and counted rather than blocking the event loop.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", sample_rates: Dict[str, float],
+                 payload_buffer_limit: int = 32):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates
+        self.payload_buffer_limit = payload_buffer_limit
+        self.listener: Optional[QueueListener] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.payloads_held = 0
+        self.payloads_flushed = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # formatted later, on the listener thread
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            request_log = _request_log.get()
+            record.request_id = request_log.request_id if request_log is not None else None
+            name = record.name
+            record.category = name[len(LOGGER_PREFIX):] if name.startswith(LOGGER_PREFIX) else CATEGORY_GENERAL
+            if record.levelno >= logging.ERROR and request_log is not None:
+                self._flush_payloads(request_log)
+            if record.levelno >= logging.WARNING or (request_log is not None and request_log.errored) or \
+                    _sampled(self, record.category, request_log):
+                self.enqueue(record)
+            else:
+                self.sampled_out += 1
+        except Exception:
+            self.handleError(record)
+
+    def _flush_payloads(self, request_log: RequestLog) -> None:
+        request_log.errored = True
+        for logger, level, msg, args, extra, created in request_log.payloads:
+            record = logger.makeRecord(logger.name, level, "(held)", 0, msg, args, None, extra=extra)
+            record.created, record.msecs = created, (created - int(created)) * 1000
+            record.request_id, record.category = request_log.request_id, CATEGORY_PAYLOAD
+            self.enqueue(record)
+        self.payloads_flushed += len(request_log.payloads)
+        request_log.payloads = []
+
+    def stop(self) -> None:
+        """Write out everything queued so far and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"queued": self.queue.qsize(), "enqueued": self.enqueued, "dropped": self.dropped,
+                "sampled_out": self.sampled_out, "payloads_held": self.payloads_held,
+                "payloads_flushed": self.payloads_flushed, "sample_rates": dict(self.sample_rates)}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line (or the classic text line), with the payload cut to payload_max_chars."""
+
+    def __init__(self, output_format: str = LOG_FORMAT_JSON, payload_max_chars: int = 2000):
+        super().__init__(TEXT_FORMAT)
+        self.json_output = output_format == LOG_FORMAT_JSON
+        self.payload_max_chars = payload_max_chars
+
+    def _payload(self, record: logging.LogRecord) -> Optional[str]:
+        payload = getattr(record, "payload", None)
+        if payload is None:
+            return None
+        text = payload if isinstance(payload, str) else str(payload)
+        if len(text) > self.payload_max_chars:
+            return f"{text[:self.payload_max_chars]}... [{len(text) - self.payload_max_chars} more chars]"
+        return text
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not self.json_output:
+            line = super().format(record)
+            payload = self._payload(record)
+            return line if payload is None else f"{line} | {payload!r}"
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname, "logger": record.name,
+            "category": getattr(record, "category", CATEGORY_GENERAL), "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        payload = self._payload(record)
+        if payload is not None:
+            entry["payload"] = payload
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = "INFO", output_format: str = LOG_FORMAT_JSON,
+                      sample_rates: Optional[Dict[str, float]] = None, queue_size: int = 10000,
+                      payload_max_chars: int = 2000, payload_buffer_limit: int = 32,
+                      stream: Optional[TextIO] = None, flush_interval: float = 0.05) -> SampledQueueHandler:
+    """Route the root logger through a SampledQueueHandler to a stream written by a listener thread.
+
+    Replaces the root logger's handlers; the listener is stopped, and the queue drained, at exit.
+    """
+    global _active_handler
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(max(1, queue_size))
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(StructuredFormatter(output_format, payload_max_chars))
+    handler = SampledQueueHandler(log_queue, sample_rates or {}, payload_buffer_limit)
+    handler.listener = BatchingQueueListener(log_queue, stream_handler, respect_handler_level=True,
+                                             flush_interval=flush_interval)
+    handler.listener.start()
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+        if isinstance(previous, SampledQueueHandler):
+            previous.stop()
+    root.addHandler(handler)
+    _active_handler = handler
+    root.setLevel(level.upper())
+    atexit.register(handler.stop)
+    return handler
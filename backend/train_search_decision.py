@@ -0,0 +1,106 @@
+"""Train the search decision model from recorded /ask outcomes and report the calls it would save.
+
+Reads the JSONL answer records written when ANSWER_RECORD_PATH is set. Records only carry a label for a
+head when that search actually ran, so keep SEARCH_DECISION_EXPLORE_RATE above zero for a while to
+collect labels for questions the keyword heuristic would not have searched. Run offline from the
+backend directory, then deploy with SEARCH_DECISION_MODE=shadow before switching to model:
+
+    python train_search_decision.py answers.jsonl --output search_decision.json --min-recall 0.95
+"""
+import argparse
+import json
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import app
+from build_knowledge_index import read_records
+from search_decision import (
+    HEAD_SEARCH, HEAD_YOUTUBE, HEADS, Features, LogisticHead, SearchDecisionModel, choose_threshold,
+    hashed_features, train_logistic,
+)
+
+
+def is_test_question(question: str, test_fraction: float) -> bool:
+    """Stable split by question text, so repeats of one question never straddle train and test."""
+    return zlib.crc32(question.lower().encode("utf-8")) % 1000 < test_fraction * 1000
+
+
+def heuristic_decision(head: str, record: Dict[str, Any]) -> bool:
+    if head == HEAD_SEARCH:
+        return app.is_question_potentially_stale(record["question"])
+    return bool(record.get("include_youtube", True))
+
+
+def evaluate(head: str, model_head: LogisticHead, examples: List[Tuple[Dict[str, Any], Features, bool]]) -> Dict[str, Any]:
+    """Compare model and heuristic on labelled examples: calls triggered and positives caught."""
+    report = {"examples": len(examples), "positives": sum(1 for _, _, label in examples if label)}
+    for decider in ("heuristic", "model"):
+        triggered = caught = 0
+        for record, features, label in examples:
+            decision = heuristic_decision(head, record) if decider == "heuristic" \
+                else model_head.predict_proba(features) >= model_head.threshold
+            triggered += decision
+            caught += decision and label
+        report[decider] = {"triggered": triggered, "positives_caught": caught,
+                           "recall": round(caught / report["positives"], 3) if report["positives"] else None}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("records", nargs="+", help="answer record JSONL file(s)")
+    parser.add_argument("--output", default=app.settings.search_decision_model_path)
+    parser.add_argument("--n-bits", type=int, default=18, help="feature hashing space is 2**n_bits")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--min-recall", type=float, default=0.95,
+                        help="threshold keeps at least this share of the held-out positives")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    args = parser.parse_args()
+
+    records = [record for path in args.records for record in read_records(path) if record.get("question")]
+    model = SearchDecisionModel({}, args.n_bits)
+    report: Dict[str, Any] = {"records": len(records), "heads": {}}
+    for head in HEADS:
+        train: List[Tuple[Features, bool]] = []
+        test: List[Tuple[Dict[str, Any], Features, bool]] = []
+        for record in records:
+            label = (record.get("labels") or {}).get(head)
+            if label is None:
+                continue
+            features = hashed_features(record["question"], args.n_bits)
+            if is_test_question(record["question"], args.test_fraction):
+                test.append((record, features, bool(label)))
+            else:
+                train.append((features, bool(label)))
+        model_head = train_logistic(train, epochs=args.epochs)
+        calibration = test or [(None, features, label) for features, label in train]
+        model_head.threshold = choose_threshold([model_head.predict_proba(features) for _, features, _ in calibration],
+                                                [label for _, _, label in calibration], args.min_recall)
+        model.heads[head] = model_head
+        report["heads"][head] = {"train_examples": len(train), "threshold": round(model_head.threshold, 4),
+                                 "held_out": evaluate(head, model_head, test)}
+
+    # Over all traffic, labelled or not: how many searches (each one a web search plus a reconcile LLM
+    # call) and YouTube lookups (two API calls each) each decider would have triggered.
+    heuristic_searches = model_searches = heuristic_youtube = model_youtube = 0
+    for record in records:
+        decided = model.decide(record["question"])
+        heuristic_search = heuristic_decision(HEAD_SEARCH, record)
+        heuristic_searches += heuristic_search
+        model_searches += decided[HEAD_SEARCH]
+        heuristic_youtube += heuristic_search and heuristic_decision(HEAD_YOUTUBE, record)
+        model_youtube += decided[HEAD_SEARCH] and bool(record.get("include_youtube", True)) and decided[HEAD_YOUTUBE]
+    report["projected_calls"] = {
+        "heuristic": {"searches": heuristic_searches, "llm_calls": heuristic_searches, "youtube_api_calls": 2 * heuristic_youtube},
+        "model": {"searches": model_searches, "llm_calls": model_searches, "youtube_api_calls": 2 * model_youtube},
+        "saved": {"searches": heuristic_searches - model_searches, "llm_calls": heuristic_searches - model_searches,
+                  "youtube_api_calls": 2 * (heuristic_youtube - model_youtube)},
+    }
+
+    model.save(args.output)
+    report["output"] = args.output
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import re
+from functools import lru_cache
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import quote
+
+from caching import normalize_text
+
+V = TypeVar("V")
+
+CATEGORY_WIKIPEDIA = "wikipedia"
+CATEGORY_ACADEMIC = "academic"
+CATEGORY_GOVERNMENT = "government"
+CATEGORY_NEWS = "news"
+CATEGORY_EDUCATIONAL = "educational"
+CATEGORY_GENERAL = "general"
+URL_CATEGORIES = (CATEGORY_WIKIPEDIA, CATEGORY_ACADEMIC, CATEGORY_NEWS, CATEGORY_GOVERNMENT,
+                  CATEGORY_EDUCATIONAL, CATEGORY_GENERAL)
+
+# Domain suffixes per category. The longest matching suffix decides, so pubmed.ncbi.nlm.nih.gov is academic
+# while the rest of nih.gov stays government.
+DOMAIN_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    CATEGORY_WIKIPEDIA: ("wikipedia.org", "wikimedia.org", "wiktionary.org", "wikiquote.org", "wikibooks.org",
+                         "wikisource.org", "wikivoyage.org", "wikiversity.org", "wikidata.org"),
+    CATEGORY_ACADEMIC: ("edu", "ac.uk", "ac.in", "ac.jp", "edu.au", "edu.in", "scholar.google.com", "academia.edu",
+                        "researchgate.net", "pubmed.ncbi.nlm.nih.gov", "ncbi.nlm.nih.gov", "arxiv.org", "jstor.org",
+                        "springer.com", "ieee.org", "acm.org", "nature.com", "sciencedirect.com"),
+    CATEGORY_GOVERNMENT: ("gov", "mil", "gov.uk", "gov.in", "gov.au", "gc.ca", "who.int", "un.org", "unesco.org",
+                          "worldbank.org", "imf.org", "europa.eu"),
+    CATEGORY_NEWS: ("bbc.com", "bbc.co.uk", "cnn.com", "reuters.com", "apnews.com", "ap.org", "npr.org",
+                    "theguardian.com", "guardian.co.uk", "nytimes.com", "wsj.com", "bloomberg.com", "espn.com",
+                    "espn.in", "espncricinfo.com", "cricinfo.com", "cricbuzz.com", "aljazeera.com", "thehindu.com",
+                    "ndtv.com", "timesofindia.indiatimes.com"),
+    CATEGORY_EDUCATIONAL: ("coursera.org", "edx.org", "khanacademy.org", "udemy.com", "skillshare.com",
+                           "pluralsight.com", "lynda.com", "masterclass.com", "britannica.com"),
+}
+# Hosts that are not already covered by a suffix fall back to a keyword in any of their labels
+# (news.google.com, foxnews.com, wiki.archlinux.org, scholar.archive.org), checked in this order.
+HOST_LABEL_KEYWORDS: Tuple[Tuple[str, str], ...] = (
+    ("wiki", CATEGORY_WIKIPEDIA), ("scholar", CATEGORY_ACADEMIC), ("news", CATEGORY_NEWS),
+)
+# Search-engine result pages are never useful sources: host suffix -> blocked path prefix ("" blocks the host).
+BLOCKED_URL_PREFIXES: Dict[str, str] = {"duckduckgo.com": "", "google.com": "/search", "bing.com": "/search"}
+
+_URL_STOP_CHARS = r"\s<>\"'\[\]{}|\\^`"
+# Case-sensitive on purpose: the literal "http" prefix lets the re engine skip ahead between URLs, which
+# IGNORECASE would defeat. Search snippets do not use upper-case schemes.
+_URL_RE = re.compile(rf"https?://[^{_URL_STOP_CHARS}]+")
+_NETLOC_END_RE = re.compile(r"[/?#]")
+_TRAILING_PUNCTUATION = ".,;:!?*_~"
+_TAIL_CHARS = frozenset(_TRAILING_PUNCTUATION + ")")
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+class DomainTrie(Generic[V]):
+    """Longest-suffix lookup over domain labels: a trie keyed on the labels of each host, right to left.
+
+    A lookup walks at most one node per label of the host, whatever the number of suffixes stored.
+    """
+
+    _VALUE = ""  # Child key holding a node's value; never a valid label
+
+    def __init__(self, suffixes: Iterable[Tuple[str, V]] = ()):
+        self._root: Dict[str, dict] = {}
+        for suffix, value in suffixes:
+            self.add(suffix, value)
+
+    def add(self, suffix: str, value: V) -> None:
+        node = self._root
+        for label in reversed(suffix.lower().split(".")):
+            node = node.setdefault(label, {})
+        node[self._VALUE] = value
+
+    def lookup(self, host: str) -> Optional[V]:
+        """Value of the longest stored suffix that host ends with, on label boundaries; None if there is none."""
+        node = self._root
+        found = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(self._VALUE, found)
+        return found
+
+
+_CATEGORY_TRIE: DomainTrie[str] = DomainTrie(
+    (suffix, category) for category, suffixes in DOMAIN_CATEGORIES.items() for suffix in suffixes
+)
+_BLOCKED_TRIE: DomainTrie[str] = DomainTrie(BLOCKED_URL_PREFIXES.items())
+
+
+@lru_cache(maxsize=8192)
+def classify_host(host: str) -> str:
+    """Category of a lowercased host name: its longest listed domain suffix, else a label keyword, else general."""
+    category = _CATEGORY_TRIE.lookup(host)
+    if category is not None:
+        return category
+    for keyword, keyword_category in HOST_LABEL_KEYWORDS:
+        if keyword in host:
+            return keyword_category
+    return CATEGORY_GENERAL
+
+
+def _trim_url_tail(text: str) -> str:
+    """Drop sentence punctuation and closing brackets that belong to the surrounding text, not the URL."""
+    while text:
+        stripped = text.rstrip(_TRAILING_PUNCTUATION)
+        if stripped.endswith(")") and stripped.count("(") < stripped.count(")"):
+            stripped = stripped[:-1]
+        if stripped == text:
+            break
+        text = stripped
+    return text
+
+
+def normalize_url(raw: str) -> Optional[Tuple[str, str, str]]:
+    """(normalized URL, host, path and query) for one matched URL, or None if the host is not a domain name."""
+    if raw[-1] in _TAIL_CHARS:
+        raw = _trim_url_tail(raw)
+    netloc_start = raw.index("://") + 3
+    netloc_end = _NETLOC_END_RE.search(raw, netloc_start)
+    netloc_end = netloc_end.start() if netloc_end else len(raw)
+    netloc, rest = raw[netloc_start:netloc_end].lower(), raw[netloc_end:]
+    host = netloc
+    if ":" in netloc or "@" in netloc:
+        default_port = _DEFAULT_PORTS[raw[:netloc_start - 3]]
+        if netloc.endswith(default_port):
+            netloc = netloc[:-len(default_port)]
+        host = netloc.rpartition("@")[2].partition(":")[0]
+    host = host.rstrip(".")
+    if "." not in host:
+        return None
+    return f"{raw[:netloc_start]}{netloc}{rest}", host, rest
+
+
+_blocked_prefix = lru_cache(maxsize=8192)(_BLOCKED_TRIE.lookup)
+
+
+def is_blocked(host: str, path: str) -> bool:
+    blocked_prefix = _blocked_prefix(host)
+    return blocked_prefix is not None and path.startswith(blocked_prefix)
+
+
+def extract_urls(text: str) -> Dict[str, List[str]]:
+    """Every http(s) URL in text, normalized, deduplicated in first-seen order and grouped by category.
+
+    One regex pass finds bare, markdown-linked and quoted URLs alike, and each distinct match is
+    normalized once however often it repeats. Normalization lowercases the host, drops default ports and trims trailing sentence punctuation and unbalanced closing brackets
+    (so Wikipedia titles with parentheses survive). Only non-empty categories are returned.
+    """
+    categorized: Dict[str, Dict[str, None]] = {}
+    seen = set()
+    for raw in _URL_RE.findall(text):
+        if raw in seen:
+            continue
+        seen.add(raw)
+        normalized = normalize_url(raw)
+        if normalized is None:
+            continue
+        url, host, path = normalized
+        if is_blocked(host, path):
+            continue
+        categorized.setdefault(classify_host(host), {})[url] = None
+    return {category: list(urls) for category, urls in categorized.items()}
+
+
+def merge_categorized_urls(target: Dict[str, Dict[str, None]], source: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Add source's URLs to target's per-category ordered sets; returns the URLs that were new, by category."""
+    added: Dict[str, List[str]] = {}
+    for category, urls in source.items():
+        existing = target.setdefault(category, {})
+        for url in urls:
+            if url not in existing:
+                existing[url] = None
+                added.setdefault(category, []).append(url)
+    return added
+
+
+def flatten_categorized_urls(categorized: Dict[str, Iterable[str]]) -> List[str]:
+    """All URLs across categories, deduplicated, in category then first-seen order."""
+    return list(dict.fromkeys(url for urls in categorized.values() for url in urls))
+
+
+def wikipedia_url(title: str) -> str:
+    return "https://en.wikipedia.org/wiki/" + quote(title.replace(" ", "_"), safe="_()',-")
+
+
+# Reference pages for frequently asked topics: (query phrases, URLs). Categories come from classify_host.
+REFERENCE_TOPICS: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...]], ...] = (
+    (("python", "python programming"), (wikipedia_url("Python (programming language)"), "https://docs.python.org/3/")),
+    (("javascript",), (wikipedia_url("JavaScript"), "https://developer.mozilla.org/en-US/docs/Web/JavaScript")),
+    (("machine learning",), (wikipedia_url("Machine learning"), "https://www.coursera.org/learn/machine-learning")),
+    (("artificial intelligence", "ai"), (wikipedia_url("Artificial intelligence"),)),
+    (("quantum computing", "quantum computer"), (wikipedia_url("Quantum computing"),)),
+    (("blockchain",), (wikipedia_url("Blockchain"),)),
+    (("bitcoin",), (wikipedia_url("Bitcoin"),)),
+    (("cryptocurrency", "crypto"), (wikipedia_url("Cryptocurrency"),)),
+    (("climate change", "global warming"), (wikipedia_url("Climate change"), "https://www.ipcc.ch/", "https://climate.nasa.gov/")),
+    (("covid", "covid 19", "coronavirus"), (wikipedia_url("COVID-19"), "https://www.who.int/health-topics/coronavirus")),
+    (("vaccine", "vaccines", "vaccination"), (wikipedia_url("Vaccine"), "https://www.who.int/health-topics/vaccines-and-immunization")),
+    (("diabetes",), (wikipedia_url("Diabetes"), "https://www.who.int/health-topics/diabetes")),
+    (("cancer",), (wikipedia_url("Cancer"), "https://www.cancer.gov/")),
+    (("dna",), (wikipedia_url("DNA"), "https://www.khanacademy.org/science/biology")),
+    (("evolution",), (wikipedia_url("Evolution"), "https://www.khanacademy.org/science/biology")),
+    (("photosynthesis",), (wikipedia_url("Photosynthesis"), "https://www.khanacademy.org/science/biology")),
+    (("human heart",), (wikipedia_url("Heart"),)),
+    (("human brain",), (wikipedia_url("Human brain"),)),
+    (("gravity", "gravitation"), (wikipedia_url("Gravity"), "https://www.khanacademy.org/science/physics")),
+    (("relativity", "theory of relativity"), (wikipedia_url("Theory of relativity"),)),
+    (("black hole", "black holes"), (wikipedia_url("Black hole"), "https://science.nasa.gov/universe/black-holes/")),
+    (("solar system",), (wikipedia_url("Solar System"), "https://science.nasa.gov/solar-system/")),
+    (("moon landing", "apollo 11"), (wikipedia_url("Apollo 11"), "https://www.nasa.gov/")),
+    (("nasa",), (wikipedia_url("NASA"), "https://www.nasa.gov/")),
+    (("mount everest", "everest"), (wikipedia_url("Mount Everest"),)),
+    (("amazon rainforest",), (wikipedia_url("Amazon rainforest"),)),
+    (("earthquake", "earthquakes"), (wikipedia_url("Earthquake"), "https://www.usgs.gov/programs/earthquake-hazards")),
+    (("volcano", "volcanoes"), (wikipedia_url("Volcano"), "https://www.usgs.gov/programs/VHP")),
+    (("world war ii", "world war 2", "second world war", "ww2"), (wikipedia_url("World War II"),)),
+    (("world war i", "world war 1", "first world war", "ww1"), (wikipedia_url("World War I"),)),
+    (("french revolution",), (wikipedia_url("French Revolution"),)),
+    (("roman empire",), (wikipedia_url("Roman Empire"),)),
+    (("ancient egypt",), (wikipedia_url("Ancient Egypt"),)),
+    (("renaissance",), (wikipedia_url("Renaissance"),)),
+    (("shakespeare", "william shakespeare"), (wikipedia_url("William Shakespeare"),)),
+    (("democracy",), (wikipedia_url("Democracy"),)),
+    (("united nations",), (wikipedia_url("United Nations"), "https://www.un.org/")),
+    (("european union",), (wikipedia_url("European Union"), "https://european-union.europa.eu/")),
+    (("inflation",), (wikipedia_url("Inflation"), "https://www.imf.org/")),
+    (("recession",), (wikipedia_url("Recession"),)),
+    (("gdp", "gross domestic product"), (wikipedia_url("Gross domestic product"), "https://data.worldbank.org/")),
+    (("stock market",), (wikipedia_url("Stock market"),)),
+    (("cricket",), (wikipedia_url("Cricket"), "https://www.espncricinfo.com/")),
+    (("ipl", "indian premier league"), (wikipedia_url("Indian Premier League"), "https://www.espncricinfo.com/")),
+    (("football", "soccer"), (wikipedia_url("Association football"), "https://www.espn.com/soccer/")),
+    (("world cup", "fifa world cup"), (wikipedia_url("FIFA World Cup"),)),
+    (("olympics", "olympic games"), (wikipedia_url("Olympic Games"), "https://olympics.com/")),
+    (("nba",), (wikipedia_url("National Basketball Association"), "https://www.nba.com/")),
+)
+
+
+class SuggestedUrlIndex:
+    """Precomputed map from normalized query phrases to categorized reference URLs.
+
+    Lookups check every word n-gram of the normalized query (up to the longest indexed phrase) against a
+    dict, so the cost depends on the query length only. Longer phrase matches rank first, ties keep the
+    order the phrases appear in the query.
+    """
+
+    def __init__(self, topics: Iterable[Tuple[Iterable[str], Iterable[str]]], max_per_category: int = 3):
+        self.max_per_category = max_per_category
+        self._urls_by_phrase: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}
+        for phrases, urls in topics:
+            entries = [(url, classify_host(normalize_url(url)[1])) for url in urls]
+            for phrase in phrases:
+                self._urls_by_phrase.setdefault(tuple(normalize_text(phrase).split()), []).extend(entries)
+        self.max_phrase_words = max((len(phrase) for phrase in self._urls_by_phrase), default=0)
+
+    def __len__(self) -> int:
+        return len(self._urls_by_phrase)
+
+    def lookup(self, query: str) -> Dict[str, List[str]]:
+        words = normalize_text(query).split()
+        matches = []
+        for size in range(min(self.max_phrase_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                entries = self._urls_by_phrase.get(tuple(words[start:start + size]))
+                if entries:
+                    matches.extend(entries)
+        suggested: Dict[str, Dict[str, None]] = {}
+        for url, category in matches:
+            category_urls = suggested.setdefault(category, {})
+            if len(category_urls) < self.max_per_category:
+                category_urls[url] = None
+        return {category: list(urls) for category, urls in suggested.items()}
+
+
+SUGGESTED_URL_INDEX = SuggestedUrlIndex(REFERENCE_TOPICS)
+
+
+def generate_suggested_urls(query: str) -> Dict[str, List[str]]:
+    """Reference URLs for the topics named in query, by category; empty when none are indexed."""
+    return SUGGESTED_URL_INDEX.lookup(query)
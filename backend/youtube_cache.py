@@ -0,0 +1,202 @@
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from caching import TTLCache, normalize_text
+from shared_cache import SharedCache
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:  # No tz database on this host: Pacific standard time, off by an hour in summer
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# Quota cost per call of the YouTube Data API endpoints we use.
+SEARCH_LIST_UNITS = 100
+VIDEOS_LIST_UNITS = 1
+
+STORE_NAMESPACE_VIDEOS = "youtube:videos"
+STORE_NAMESPACE_QUOTA = "youtube:quota"  # units spent, keyed by Pacific date
+QUOTA_RECORD_TTL_SECONDS = 2 * 86400
+
+LOOKUP_FRESH = "fresh"
+LOOKUP_STALE = "stale"
+LOOKUP_MISS = "miss"
+
+_SEARCH_STOPWORDS = frozenset({
+    "the", "and", "for", "how", "what", "who", "why", "with", "from", "about", "show", "video", "videos",
+    "youtube", "watch", "latest", "best",
+})
+
+
+def _search_terms(text: str) -> Set[str]:
+    return {word for word in normalize_text(text).split() if len(word) > 2 and word not in _SEARCH_STOPWORDS}
+
+
+class VideoMetadataCache:
+    """YouTube video records by video ID: an in-memory LRU in front of an optional persistent store.
+
+    A record is fresh for fresh_seconds after it was fetched and is served without asking the details
+    endpoint. Between fresh_seconds and max_age_seconds it is stale: only served when the details
+    endpoint cannot be called, for example when the daily quota is nearly spent. Records are stored as
+    plain dicts (the YouTubeVideo fields, already formatted), so the store holds JSON.
+    """
+
+    def __init__(self, max_entries: int, fresh_seconds: float, max_age_seconds: float):
+        self.fresh_seconds = fresh_seconds
+        self.max_age_seconds = max(max_age_seconds, fresh_seconds)
+        self._memory = TTLCache(max_entries)
+        self._store: Optional[SharedCache] = None
+        self.lookups = {LOOKUP_FRESH: 0, LOOKUP_STALE: 0, LOOKUP_MISS: 0}
+
+    def attach_store(self, store: SharedCache, warm_entries: int) -> int:
+        """Persist records to store from now on and load its most recently used ones; returns how many."""
+        self._store = store
+        warmed = 0
+        for video_id, encoded, _ in store.recent(STORE_NAMESPACE_VIDEOS, warm_entries):
+            fetched_at, record = json.loads(encoded)
+            warmed += self._remember(video_id, record, fetched_at)
+        return warmed
+
+    def detach_store(self) -> Optional[SharedCache]:
+        store, self._store = self._store, None
+        return store
+
+    def _remember(self, video_id: str, record: Dict[str, str], fetched_at: float) -> bool:
+        ttl = fetched_at + self.max_age_seconds - time.time()
+        if ttl <= 0:
+            return False
+        searchable = " ".join(record.get(field) or "" for field in ("title", "channel"))
+        self._memory.set(video_id, (fetched_at, record, _search_terms(searchable)), ttl)
+        return True
+
+    def _entry(self, video_id: str) -> Optional[Tuple[float, Dict[str, str]]]:
+        entry = self._memory.get(video_id)
+        if entry is not None:
+            return entry[0], entry[1]
+        if self._store is None:
+            return None
+        hit = self._store.get(STORE_NAMESPACE_VIDEOS, video_id)
+        if hit is None:
+            return None
+        fetched_at, record = json.loads(hit[0])
+        self._remember(video_id, record, fetched_at)
+        return fetched_at, record
+
+    def get_many(self, video_ids: Iterable[str], allow_stale: bool = False) -> Dict[str, Dict[str, str]]:
+        """Cached records for the given IDs: fresh ones only, or any not yet past max_age with allow_stale.
+
+        Lookups count as fresh or miss (absent or too old to use); allow_stale lookups, the fallback for
+        misses, count the records they serve as stale.
+        """
+        now = time.time()
+        found: Dict[str, Dict[str, str]] = {}
+        for video_id in video_ids:
+            entry = self._entry(video_id)
+            if entry is not None and (allow_stale or now - entry[0] < self.fresh_seconds):
+                found[video_id] = entry[1]
+                self.lookups[LOOKUP_STALE if allow_stale else LOOKUP_FRESH] += 1
+            elif not allow_stale:
+                self.lookups[LOOKUP_MISS] += 1
+        return found
+
+    def put_many(self, records: Dict[str, Dict[str, str]]) -> None:
+        fetched_at = time.time()
+        for video_id, record in records.items():
+            self._remember(video_id, record, fetched_at)
+            if self._store is not None:
+                self._store.set(STORE_NAMESPACE_VIDEOS, video_id, json.dumps([fetched_at, record]), self.max_age_seconds)
+
+    def search(self, query: str, limit: int) -> List[Dict[str, str]]:
+        """Up to limit records in memory whose title or channel shares the most words with query."""
+        terms = _search_terms(query)
+        if not terms or limit <= 0:
+            return []
+        scored = []
+        for _, (fetched_at, record, record_terms) in self._memory.items():
+            overlap = len(terms & record_terms)
+            if overlap:
+                scored.append((overlap, fetched_at, record))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [record for _, _, record in scored[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def stats(self) -> Dict[str, object]:
+        return {"entries": len(self._memory), "persistent": self._store is not None,
+                "fresh_seconds": self.fresh_seconds, "max_age_seconds": self.max_age_seconds,
+                "lookups": dict(self.lookups)}
+
+
+class QuotaTracker:
+    """YouTube Data API quota units spent today against a daily budget.
+
+    The day rolls over at midnight Pacific time, when Google resets the quota. Searches should stop
+    calling the API once spending more would eat into reserve_units, which are left for the details
+    calls of searches already in flight.
+
+    Without a store, counts are per process and start over on restart, so with several workers each
+    one should get its share of the project budget. With a store attached, every process sharing it
+    counts against one node-wide total that survives restarts; if the store cannot be reached, the
+    last total seen plus this process's own spending stands in.
+    """
+
+    def __init__(self, daily_units: int, reserve_units: int):
+        self.daily_units = daily_units
+        self.reserve_units = reserve_units
+        self._day: Optional[date] = None
+        self._used = 0
+        self._store: Optional[SharedCache] = None
+        self.units_by_endpoint: Dict[str, int] = {}
+
+    def attach_store(self, store: SharedCache, daily_units: int, reserve_units: int) -> None:
+        """Count against a total kept in store, and against the node-wide budget from now on."""
+        self._store = store
+        self.daily_units = daily_units
+        self.reserve_units = reserve_units
+        self._day = None
+
+    def detach_store(self, daily_units: int, reserve_units: int) -> None:
+        self._store = None
+        self.daily_units = daily_units
+        self.reserve_units = reserve_units
+
+    def _roll_over(self) -> None:
+        today = datetime.now(QUOTA_TIMEZONE).date()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+            if self._store is not None:
+                self._store.evict(STORE_NAMESPACE_QUOTA)
+
+    def used(self) -> int:
+        self._roll_over()
+        if self._store is not None:
+            hit = self._store.get(STORE_NAMESPACE_QUOTA, self._day.isoformat())
+            if hit is not None:
+                self._used = max(self._used, int(hit[0]))
+        return self._used
+
+    def remaining(self) -> int:
+        return max(0, self.daily_units - self.used())
+
+    def can_spend(self, units: int, use_reserve: bool = False) -> bool:
+        return self.remaining() - units >= (0 if use_reserve else self.reserve_units)
+
+    def charge(self, endpoint: str, units: int) -> None:
+        self._roll_over()
+        self._used += units
+        if self._store is not None:
+            total = self._store.add(STORE_NAMESPACE_QUOTA, self._day.isoformat(), units, QUOTA_RECORD_TTL_SECONDS)
+            if total is not None:
+                self._used = max(self._used, total)
+        self.units_by_endpoint[endpoint] = self.units_by_endpoint.get(endpoint, 0) + units
+
+    def stats(self) -> Dict[str, object]:
+        return {"day": str(self._day or datetime.now(QUOTA_TIMEZONE).date()), "daily_units": self.daily_units,
+                "reserve_units": self.reserve_units, "shared": self._store is not None,
+                "used_units": self.used(), "remaining_units": self.remaining(),
+                "cache_only": not self.can_spend(SEARCH_LIST_UNITS),
+                "units_by_endpoint_since_start": dict(self.units_by_endpoint)}